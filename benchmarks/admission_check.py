@@ -0,0 +1,65 @@
+"""
+Verificação de regressão: vaga repassada no mesmo instante em que a espera vence.
+
+Com uma vaga ocupada, um pedido entra na fila de admissão. O loop é travado
+até passar o prazo da fila e, no mesmo passo do loop, `release()` repassa a
+vaga pouco antes de o timeout disparar. Seja qual for o resultado do pedido,
+a vaga não pode se perder: depois de devolvida, `in_flight` volta a zero e o
+próximo `acquire()` é atendido na hora. Repete `--rounds` vezes; sai com
+código 1 se sobrar vaga presa.
+
+    python -m benchmarks.admission_check
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/admission_check.db"
+
+from src import rate_limit  # noqa: E402
+
+
+async def race(target: float) -> list:
+    admission = rate_limit.AdmissionControl(max_concurrency=1, target=target)
+    # avg_service zero: a estimativa nunca recusa, o pedido sempre entra na fila.
+    assert await admission.acquire() is None
+    waiting = asyncio.create_task(admission.acquire())
+    await asyncio.sleep(0)  # o pedido está na fila, com o prazo agendado
+    # O release vence antes do prazo; travando o loop, os dois rodam no mesmo passo.
+    asyncio.get_running_loop().call_later(target / 2, admission.release, 0.0)
+    time.sleep(target * 2)
+    result = await waiting
+    if result is None:
+        admission.release(0.0)  # o pedido recebeu a vaga e a devolve
+    errors = []
+    if admission.in_flight != 0:
+        errors.append(f"pedido terminou com {result!r} e deixou in_flight={admission.in_flight}")
+    elif await admission.acquire() is not None:
+        errors.append("acquire() recusado com todas as vagas livres")
+    return errors
+
+
+async def run(rounds: int, target: float) -> int:
+    errors = []
+    for _ in range(rounds):
+        errors += await race(target)
+    for error in errors:
+        print("ERRO: " + error)
+    print(f"{'falhou' if errors else 'ok'} ({rounds} rodadas)")
+    return 1 if errors else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--target-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    return asyncio.run(run(args.rounds, args.target_ms / 1000))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+Verificação de regressão: login e cadastro não seguram conexões durante o bcrypt.
+
+Com SQLITE_TUNING o pool de escrita tem uma única conexão. Dispara
+`--logins` logins e `--registers` cadastros ao mesmo tempo (hash com
+BCRYPT_ROUNDS=13, centenas de ms cada) e espera todos chegarem ao pool do
+bcrypt. Nesse momento nenhuma conexão de escrita ou leitura pode estar em uso,
+e um POST /posts/ feito em paralelo não pode esperar pelos hashes. Sai com
+código 1 se algum pedido não chega ao bcrypt (está preso esperando uma
+conexão), se sobra conexão em uso ou se a escrita paralela demora mais que
+`--max-write-ms`.
+
+    python -m benchmarks.auth_concurrency_check
+    DATABASE_URL=sqlite+aiosqlite:////tmp/check.db python -m benchmarks.auth_concurrency_check
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp_dir}/auth_concurrency_check.db")
+os.environ["BCRYPT_ROUNDS"] = "13"
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx  # noqa: E402
+
+from src import auth, database, membership, migrations, models  # noqa: E402
+from src.main import app  # noqa: E402
+
+
+def seed(logins: int) -> tuple:
+    migrations.upgrade()
+    password = auth.hash_password("senha123")
+    with database.SessionLocal() as db:
+        users = [models.Author(username=f"autor{i}", email=f"autor{i}@example.com", password=password) for i in range(logins)]
+        db.add_all(users)
+        db.flush()
+        group = models.Group(name="Auth", description="Grupo da verificação", creator_id=users[0].id)
+        db.add(group)
+        db.flush()
+        membership.add_member(db, users[0].id, group.id)
+        db.commit()
+        token = auth.create_token({"sub": users[0].username, "uid": users[0].id, "mv": users[0].membership_version})
+        return [user.username for user in users], group.id, {"Authorization": f"Bearer {token}"}
+
+
+async def run(args) -> int:
+    usernames, group_id, headers = seed(args.logins)
+    transport = httpx.ASGITransport(app=app)
+    errors = []
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://check", timeout=120) as client:
+            (await client.get("/users/me/", headers=headers)).raise_for_status()
+            requests = [
+                client.post("/login/", json={"username": username, "password": "senha123"}) for username in usernames
+            ] + [
+                client.post("/register/", json={"username": f"novo{i}", "email": f"novo{i}@example.com", "password": "senha123"})
+                for i in range(args.registers)
+            ]
+            tasks = [asyncio.create_task(request) for request in requests]
+
+            expected = len(tasks)
+            deadline = time.perf_counter() + args.timeout
+            while auth._hash_pending < expected and time.perf_counter() < deadline:
+                await asyncio.sleep(0.005)
+            if auth._hash_pending < expected:
+                errors.append(f"só {auth._hash_pending} de {expected} pedidos chegaram ao bcrypt (presos esperando conexão?)")
+            in_use = {"escrita": database.engine.pool.checkedout(), "leitura": database.read_engine.pool.checkedout()}
+            for pool, count in in_use.items():
+                if count:
+                    errors.append(f"{count} conexão(ões) de {pool} em uso durante o bcrypt")
+
+            started = time.perf_counter()
+            response = await client.post("/posts/", json={"title": "t", "text": "x", "group_id": group_id}, headers=headers)
+            write_ms = (time.perf_counter() - started) * 1000
+            if response.status_code != 201:
+                errors.append(f"POST /posts/ durante o bcrypt: status {response.status_code}")
+            elif write_ms > args.max_write_ms:
+                errors.append(f"POST /posts/ durante o bcrypt levou {write_ms:.0f} ms")
+
+            for response in await asyncio.gather(*tasks):
+                if response.status_code not in (200, 201):
+                    errors.append(f"{response.request.url.path}: status {response.status_code}")
+
+    for error in errors:
+        print("ERRO: " + error)
+    print(f"{'falhou' if errors else 'ok'} (escrita paralela: {write_ms:.0f} ms)")
+    return 1 if errors else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--logins", type=int, default=4)
+    parser.add_argument("--registers", type=int, default=2)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--max-write-ms", type=float, default=250.0)
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
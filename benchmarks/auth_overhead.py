@@ -0,0 +1,67 @@
+"""
+Benchmark: custo por requisição da autenticação, em microssegundos.
+
+Compara, para o mesmo token, a verificação completa (`jwt.decode`: HMAC e parse
+dos claims, o que toda requisição fazia antes do cache de tokens verificados)
+com `auth.decode_token` em cache, e mede a dependência `get_current_active_user`
+inteira com o principal em cache (verificação, lista de revogação e cache).
+
+    python -m benchmarks.auth_overhead --iterations 100000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/auth_overhead.db"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import jwt  # noqa: E402
+from fastapi.security import HTTPAuthorizationCredentials  # noqa: E402
+
+from src import auth, migrations, models  # noqa: E402
+from src.database import ReadSessionLocal, SessionLocal  # noqa: E402
+
+
+def microseconds(func, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return round((time.perf_counter() - start) / iterations * 1e6, 2)
+
+
+def run(args) -> int:
+    migrations.upgrade()
+    with SessionLocal() as db:
+        author = models.Author(username="autor", email="autor@example.com", password=auth.hash_password("senha"))
+        db.add(author)
+        db.commit()
+        token = auth.create_token({"sub": author.username, "uid": author.id, "mv": author.membership_version})
+    key = auth.JWT_KEYS[auth.JWT_ACTIVE_KID] if auth.JWT_ACTIVE_KID else auth.SECRET_KEY
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+    with ReadSessionLocal() as db:
+        auth.get_current_active_user(credentials, db)
+        results = {
+            "iterations": args.iterations,
+            "us_per_call": {
+                "jwt_decode": microseconds(lambda: jwt.decode(token, key, algorithms=[auth.ALGORITHM]), args.iterations),
+                "decode_token_cached": microseconds(lambda: auth.decode_token(token), args.iterations),
+                "current_user_cached": microseconds(lambda: auth.get_current_active_user(credentials, db), args.iterations),
+            },
+        }
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--iterations", type=int, default=100000)
+    return run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
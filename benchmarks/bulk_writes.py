@@ -0,0 +1,124 @@
+"""
+Benchmark: linhas por segundo das rotas em lote contra as rotas de um item.
+
+Roda a API em processo contra um banco SQLite temporário e insere a mesma
+quantidade de posts, comentários e membros pelos dois caminhos: uma requisição
+por item (POST /posts/, POST /posts/{id}/comments/, POST /groups/{id}/join) e
+lotes de `--batch` itens (POST /posts/bulk, POST /comments/bulk,
+POST /groups/{id}/members/bulk). Antes de medir, confere que cada id devolvido
+pelo lote corresponde ao item da mesma posição.
+
+    python -m benchmarks.bulk_writes --rows 2000 --batch 500
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bulk_writes.db"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from src import auth, migrations, models  # noqa: E402
+from src.database import SessionLocal  # noqa: E402
+from src.main import app  # noqa: E402
+
+
+def create_authors(prefix: str, count: int) -> list:
+    """Autores criados direto no banco (o registro pela API mediria o bcrypt)."""
+    password = auth.hash_password("senha")
+    with SessionLocal() as db:
+        db.add_all([
+            models.Author(username=f"{prefix}{i}", email=f"{prefix}{i}@example.com", password=password)
+            for i in range(count)
+        ])
+        db.commit()
+    return [f"{prefix}{i}" for i in range(count)]
+
+def bearer(username: str) -> dict:
+    return {"Authorization": f"Bearer {auth.create_token({'sub': username})}"}
+
+def rows_per_second(rows: int, func) -> float:
+    start = time.perf_counter()
+    func()
+    return round(rows / (time.perf_counter() - start), 1)
+
+def batches(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def post_bulk(client: TestClient, path: str, items: list, headers: dict, size: int) -> None:
+    for batch in batches(items, size):
+        response = client.post(path, json=batch, headers=headers)
+        assert response.status_code == 200 and response.json()["failed"] == 0, response.text
+
+
+def check_ids_match_items(client: TestClient, headers: dict, group_id: int) -> bool:
+    items = [{"title": f"ordem {i}", "text": "x", "group_id": group_id} for i in range(50)]
+    results = client.post("/posts/bulk", json=items, headers=headers).json()["results"]
+    return all(
+        client.get(f"/posts/{result['id']}").json()["title"] == items[result["index"]]["title"]
+        for result in results
+    )
+
+
+def run(args) -> int:
+    migrations.upgrade()
+    client = TestClient(app)
+    owner = create_authors("dono", 1)[0]
+    headers = bearer(owner)
+    group_id = client.post("/groups/", json={"name": "Importação"}, headers=headers).json()["id"]
+
+    if not check_ids_match_items(client, headers, group_id):
+        print("Os ids devolvidos pelo lote não correspondem aos itens")
+        return 1
+
+    posts = [{"title": f"Post {i}", "text": "Texto importado", "group_id": group_id} for i in range(args.rows)]
+    post_id = client.post("/posts/", json=posts[0], headers=headers).json()["id"]
+    comments = [{"title": "Comentário", "text": f"Comentário {i}", "post_id": post_id} for i in range(args.rows)]
+    single_members = create_authors("um", args.rows)
+    bulk_members = create_authors("lote", args.rows)
+
+    results = {"rows": args.rows, "batch": args.batch, "rows_per_second": {}}
+    # Grupo separado: os membros novos não multiplicam o fan-out dos posts medidos abaixo.
+    members_group_id = client.post("/groups/", json={"name": "Integração"}, headers=headers).json()["id"]
+    results["rows_per_second"]["members"] = {
+        "single": rows_per_second(args.rows, lambda: [
+            client.post(f"/groups/{members_group_id}/join", headers=bearer(username)) for username in single_members
+        ]),
+        "bulk": rows_per_second(args.rows, lambda: [
+            client.post(f"/groups/{members_group_id}/members/bulk", json={"usernames": batch}, headers=headers)
+            for batch in batches(bulk_members, args.batch)
+        ]),
+    }
+    results["rows_per_second"]["posts"] = {
+        "single": rows_per_second(args.rows, lambda: [client.post("/posts/", json=post, headers=headers) for post in posts]),
+        "bulk": rows_per_second(args.rows, lambda: post_bulk(client, "/posts/bulk", posts, headers, args.batch)),
+    }
+    results["rows_per_second"]["comments"] = {
+        "single": rows_per_second(args.rows, lambda: [
+            client.post(f"/posts/{post_id}/comments/", json={"title": item["title"], "text": item["text"]}, headers=headers)
+            for item in comments
+        ]),
+        "bulk": rows_per_second(args.rows, lambda: post_bulk(client, "/comments/bulk", comments, headers, args.batch)),
+    }
+    for kind in results["rows_per_second"].values():
+        kind["speedup"] = round(kind["bulk"] / kind["single"], 1)
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=500)
+    return run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Benchmark: latência de GET /posts/{id} conforme o tamanho da thread.
+
+Cria num banco SQLite temporário um post para cada tamanho em `--sizes` e mede
+a latência (cache HTTP desligado) de GET /posts/{id}, que traz só a primeira
+página de comentários, contra GET /posts/{id}?comments=all, e de uma página do
+meio da thread por GET /posts/{id}/comments.
+
+    python -m benchmarks.comment_threads --sizes 10,1000,20000
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/comment_threads.db"
+os.environ["HTTP_CACHE_ENABLED"] = "false"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from src import database, migrations, models, timeline  # noqa: E402
+from src.main import app  # noqa: E402
+
+
+def seed(sizes: list) -> dict:
+    """Um post por tamanho de thread; retorna {tamanho: post_id}."""
+    migrations.upgrade()
+    start = datetime.datetime(2024, 1, 1)
+    with database.engine.begin() as connection:
+        connection.execute(insert(models.Author), [{"username": "autor", "email": "autor@example.com", "password": "x"}])
+        connection.execute(insert(models.Group), [{"name": "Threads", "creator_id": 1, "member_count": 1}])
+        post_ids = {}
+        for size in sizes:
+            post_ids[size] = connection.execute(insert(models.Post).values(
+                title=f"Thread de {size}", text="Texto", author_id=1, group_id=1, date=start, comment_count=size,
+            )).inserted_primary_key[0]
+            connection.execute(insert(models.Comment), [
+                {
+                    "title": "Comentário", "text": f"Comentário {i}", "post_id": post_ids[size],
+                    "commenter_id": 1, "date": start + datetime.timedelta(seconds=i + 1),
+                }
+                for i in range(size)
+            ])
+    return post_ids
+
+def latency_ms(client: TestClient, path: str, iterations: int) -> float:
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        response = client.get(path)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.text
+    return round(statistics.median(timings), 2)
+
+
+def run(args) -> int:
+    sizes = [int(size) for size in args.sizes.split(",")]
+    post_ids = seed(sizes)
+    client = TestClient(app)
+    results = {"iterations": args.iterations, "p50_ms": {}}
+    for size, post_id in post_ids.items():
+        middle = timeline.encode_cursor(datetime.datetime(2024, 1, 1) + datetime.timedelta(seconds=size // 2), 0)
+        results["p50_ms"][size] = {
+            "first_page": latency_ms(client, f"/posts/{post_id}", args.iterations),
+            "middle_page": latency_ms(client, f"/posts/{post_id}/comments?cursor={middle}", args.iterations),
+            "all_comments": latency_ms(client, f"/posts/{post_id}?comments=all", max(1, args.iterations // 10)),
+        }
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="10,1000,20000")
+    parser.add_argument("--iterations", type=int, default=50)
+    return run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""
+Benchmark: compressão das respostas e envio em partes das threads grandes.
+
+Mede, para uma thread com `--comments` comentários, GET /posts/{id}?comments=all
+montada inteira na memória e codificada em partes (COMMENTS_STREAM_THRESHOLD),
+chamando o app ASGI direto: tempo até o primeiro byte, tempo total e pico de
+memória alocada (tracemalloc). Antes confere que os dois caminhos produzem o
+mesmo JSON. Depois compara o tamanho e o custo de cada codificação disponível
+(identity, gzip e, se instalados, br e zstd) na thread e numa página do feed.
+
+    python -m benchmarks.compression --comments 20000 --posts 100
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/compression.db"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ["HTTP_CACHE_ENABLED"] = "false"
+
+from sqlalchemy import insert  # noqa: E402
+
+from src import auth, compression, membership, migrations, models, timeline  # noqa: E402
+from src import main as api  # noqa: E402
+from src.database import SessionLocal, engine  # noqa: E402
+
+
+def seed(posts: int, comments: int) -> tuple:
+    migrations.upgrade()
+    with SessionLocal() as db:
+        author = models.Author(username="autor", email="autor@example.com", password=auth.hash_password("senha"))
+        db.add(author)
+        db.flush()
+        group = models.Group(name="Benchmark", description="Grupo do benchmark", creator_id=author.id)
+        db.add(group)
+        db.flush()
+        membership.add_member(db, author.id, group.id)
+        db.commit()
+        author_id, group_id, version = author.id, group.id, author.membership_version
+
+    start = datetime.datetime(2024, 1, 1, 12, 0, 0)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Post), [
+            {"title": f"Post {i}", "text": "Texto com acentuação " * 5, "date": start + datetime.timedelta(minutes=i),
+             "author_id": author_id, "group_id": group_id, "comment_count": comments if i == 0 else 0}
+            for i in range(posts)
+        ])
+        thread_id = conn.execute(models.Post.__table__.select().where(models.Post.title == "Post 0")).first().id
+        conn.execute(insert(models.Comment), [
+            {"title": "Comentário", "text": f"Comentário número {j} da thread", "post_id": thread_id,
+             "commenter_id": author_id, "date": start + datetime.timedelta(seconds=j + 1)}
+            for j in range(comments)
+        ])
+    with SessionLocal() as db:
+        timeline.rebuild(db)
+        db.commit()
+    token = auth.create_token({"sub": "autor", "uid": author_id, "mv": version})
+    return thread_id, token
+
+
+async def call(path: str, headers: dict) -> dict:
+    """Uma requisição direto no app ASGI, marcando a chegada do primeiro corpo."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path.split("?")[0], "raw_path": path.split("?")[0].encode(),
+        "query_string": path.partition("?")[2].encode(), "root_path": "",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        "client": ("127.0.0.1", 1234), "server": ("testserver", 80),
+    }
+    result = {"status": None, "headers": {}, "body": bytearray(), "first_byte": None}
+    requested = asyncio.Event()
+
+    async def receive():
+        # A primeira chamada entrega o corpo vazio; as seguintes esperam um
+        # desconectar que nunca vem, como um cliente que segue conectado.
+        if requested.is_set():
+            await asyncio.Event().wait()
+        requested.set()
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+            result["headers"] = {k.decode(): v.decode() for k, v in message["headers"]}
+        elif message["type"] == "http.response.body":
+            if result["first_byte"] is None and message.get("body"):
+                result["first_byte"] = time.perf_counter()
+            result["body"] += message.get("body", b"")
+
+    start = time.perf_counter()
+    await api.app(scope, receive, send)
+    end = time.perf_counter()
+    result["ttfb_ms"] = round((result["first_byte"] - start) * 1000, 2)
+    result["total_ms"] = round((end - start) * 1000, 2)
+    return result
+
+
+def measure_thread(path: str, threshold: int, iterations: int) -> dict:
+    api.COMMENTS_STREAM_THRESHOLD = threshold
+    headers = {"accept-encoding": "identity"}
+    asyncio.run(call(path, headers))
+    ttfb, total = [], []
+    for _ in range(iterations):
+        result = asyncio.run(call(path, headers))
+        ttfb.append(result["ttfb_ms"])
+        total.append(result["total_ms"])
+    tracemalloc.start()
+    result = asyncio.run(call(path, headers))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "ttfb_ms": sorted(ttfb)[len(ttfb) // 2],
+        "total_ms": sorted(total)[len(total) // 2],
+        "peak_alloc_mb": round(peak / 2**20, 2),
+        "bytes": len(result["body"]),
+        "_body": bytes(result["body"]),
+    }
+
+
+def measure_encodings(body: bytes, iterations: int) -> dict:
+    sizes = {"identity": {"bytes": len(body)}}
+    for name in compression.PREFERENCE:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            compressed = compression.compress(body, name)
+        sizes[name] = {
+            "bytes": len(compressed),
+            "ratio": round(len(body) / len(compressed), 1),
+            "ms": round((time.perf_counter() - start) / iterations * 1000, 2),
+        }
+    return sizes
+
+
+def run(args) -> int:
+    thread_id, token = seed(args.posts, args.comments)
+    path = f"/posts/{thread_id}?comments=all"
+
+    buffered = measure_thread(path, 10**9, args.iterations)
+    streamed = measure_thread(path, 0, args.iterations)
+    if json.loads(buffered["_body"]) != json.loads(streamed["_body"]):
+        print("ERRO: a thread em partes difere da montada inteira", file=sys.stderr)
+        return 1
+    feed = asyncio.run(call(f"/posts/?limit={min(args.posts, 100)}",
+                            {"authorization": f"Bearer {token}", "accept-encoding": "identity"}))
+
+    results = {
+        "comments": args.comments,
+        "thread": {name: {k: v for k, v in r.items() if not k.startswith("_")}
+                   for name, r in (("buffered", buffered), ("streamed", streamed))},
+        "encodings": {
+            "thread": measure_encodings(streamed["_body"], args.iterations),
+            "feed": measure_encodings(bytes(feed["body"]), args.iterations),
+        },
+    }
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--comments", type=int, default=20000)
+    parser.add_argument("--posts", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=5)
+    return run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Mede requisições/segundo de uma API já em execução sob N conexões simultâneas.
+
+Uso (com a API rodando em outro terminal, em modo síncrono ou assíncrono):
+
+    python -m benchmarks.concurrency --url http://127.0.0.1:8000 \
+        --concurrency 500 --duration 20 --username ana --password senha
+
+Sem --username, mede apenas rotas públicas (GET /groups/). O resultado sai em JSON.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+
+async def _login(client: httpx.AsyncClient, username: str, password: str) -> dict:
+    response = await client.post("/login/", json={"username": username, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def _worker(client, paths, headers, deadline, latencies, errors):
+    index = 0
+    while time.perf_counter() < deadline:
+        path = paths[index % len(paths)]
+        index += 1
+        started = time.perf_counter()
+        try:
+            response = await client.get(path, headers=headers)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+                continue
+        except httpx.HTTPError as exc:
+            errors.append(type(exc).__name__)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(url, concurrency, duration, username=None, password=None, paths=None):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        headers = await _login(client, username, password) if username else {}
+        paths = paths or (["/posts/", "/groups/"] if username else ["/groups/"])
+        latencies, errors = [], []
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            _worker(client, paths, headers, deadline, latencies, errors) for _ in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+    return {
+        "url": url,
+        "paths": paths,
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 3),
+        "requests": len(latencies),
+        "errors": len(errors),
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies) * 1000, 2) if latencies else None,
+            "p50": round(_percentile(latencies, 50) * 1000, 2) if latencies else None,
+            "p95": round(_percentile(latencies, 95) * 1000, 2) if latencies else None,
+            "p99": round(_percentile(latencies, 99) * 1000, 2) if latencies else None,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--path", action="append", dest="paths", help="Rota a medir (pode repetir)")
+    args = parser.parse_args()
+    result = asyncio.run(run(args.url, args.concurrency, args.duration, args.username, args.password, args.paths))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Gerador de dados sintéticos para os benchmarks.
+
+Preenche um banco vazio, pelos modelos de `src.models` e com INSERTs em lote,
+com autores, grupos de participação enviesada (a popularidade dos grupos segue
+uma lei de Zipf com expoente `--skew`), posts escritos por membros nos próprios
+grupos e comentários. Os contadores desnormalizados (`member_count`,
+`post_count`, `comment_count`) já saem corretos e a timeline é reconstruída no
+fim, de modo que o banco fica igual ao que a API teria produzido.
+
+Com a mesma `--seed` e os mesmos parâmetros, o conteúdo gerado é idêntico.
+Todos os autores usam a senha `senha` (username `autor<n>`).
+
+Cuidado com a escala: a timeline é fan-out na escrita, então `feed_entries`
+cresce com a soma de (membros x posts) de cada grupo, muito mais rápido que o
+número de posts. O resumo impresso no final traz a contagem.
+
+    python -m benchmarks.datagen --database-url sqlite:///bench.db --scale medium
+    python -m benchmarks.datagen --database-url sqlite:///bench.db --scale large --posts 2000000
+"""
+import argparse
+import bisect
+import datetime
+import itertools
+import json
+import os
+import random
+import sys
+import time
+
+# Os expoentes caem com a escala para a timeline caber em disco: ~0,6 milhão de
+# entradas em "small", ~6 milhões em "medium" e ~50 milhões em "large".
+SCALES = {
+    "small": {"authors": 1000, "groups": 100, "memberships": 2, "posts": 10000, "comments": 2.0, "skew": 0.8},
+    "medium": {"authors": 10000, "groups": 1000, "memberships": 2, "posts": 100000, "comments": 3.0, "skew": 0.6},
+    "large": {"authors": 100000, "groups": 10000, "memberships": 2, "posts": 1000000, "comments": 2.0, "skew": 0.5},
+}
+PASSWORD = "senha"
+START_DATE = datetime.datetime(2024, 1, 1)
+
+
+def username(author_id: int) -> str:
+    return f"autor{author_id}"
+
+def zipf_weights(count: int, skew: float) -> list:
+    """Pesos acumulados de uma distribuição de Zipf (o grupo 1 é o mais popular)."""
+    return list(itertools.accumulate(1 / rank ** skew for rank in range(1, count + 1)))
+
+def choose_groups(rng: random.Random, cumulative: list, count: int) -> list:
+    """`count` grupos distintos (ids a partir de 1) sorteados pelos pesos acumulados."""
+    count = min(count, len(cumulative))
+    chosen = set()
+    while len(chosen) < count:
+        chosen.add(bisect.bisect_left(cumulative, rng.random() * cumulative[-1]) + 1)
+    return sorted(chosen)
+
+def chunks(total: int, size: int):
+    for offset in range(0, total, size):
+        yield offset, min(size, total - offset)
+
+
+def generate(authors: int, groups: int, memberships: int, posts: int, comments: float,
+             skew: float = 1.0, seed: int = 42, days: int = 365, chunk: int = 20000, log=print) -> dict:
+    """
+    Gera o conjunto de dados no banco de `DATABASE_URL` e retorna um resumo.
+    O banco precisa estar vazio (as tabelas são criadas pelas migrações).
+    """
+    # Importado aqui: src.database lê DATABASE_URL no import.
+    from sqlalchemy import func, insert, select
+
+    from src import auth, database, migrations, models, timeline
+
+    migrations.upgrade()
+    with database.SessionLocal() as db:
+        if db.execute(select(func.count()).select_from(models.Author)).scalar():
+            raise RuntimeError("O banco já tem dados; o gerador precisa de um banco vazio")
+
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    span_seconds = days * 86400
+
+    # --- Autores e grupos ---
+    password = auth.hash_password(PASSWORD)
+    with database.engine.begin() as connection:
+        for offset, count in chunks(authors, chunk):
+            connection.execute(insert(models.Author), [
+                {"id": i, "username": username(i), "email": f"{username(i)}@example.com", "password": password}
+                for i in range(offset + 1, offset + count + 1)
+            ])
+    log(f"autores: {authors}")
+
+    cumulative = zipf_weights(groups, skew)
+    members = [[] for _ in range(groups + 1)]
+    groups_of = [()] * (authors + 1)
+    for author_id in range(1, authors + 1):
+        groups_of[author_id] = choose_groups(rng, cumulative, memberships)
+        for group_id in groups_of[author_id]:
+            members[group_id].append(author_id)
+    # O criador é o primeiro membro; grupos que ninguém sorteou ganham um membro aleatório.
+    for group_id in range(1, groups + 1):
+        if not members[group_id]:
+            author_id = rng.randint(1, authors)
+            members[group_id].append(author_id)
+            groups_of[author_id] = sorted((*groups_of[author_id], group_id))
+
+    # Posts: autor uniforme, grupo entre os dele; as datas crescem com o id.
+    post_groups = [0] * (posts + 1)
+    post_authors = [0] * (posts + 1)
+    post_counts = [0] * (groups + 1)
+    for post_id in range(1, posts + 1):
+        author_id = rng.randint(1, authors)
+        group_id = rng.choice(groups_of[author_id])
+        post_authors[post_id], post_groups[post_id] = author_id, group_id
+        post_counts[group_id] += 1
+    comment_counts = [0] * (posts + 1)
+    for _ in range(int(posts * comments)):
+        comment_counts[rng.randint(1, posts)] += 1
+
+    with database.engine.begin() as connection:
+        connection.execute(insert(models.Group), [
+            {
+                "id": group_id, "name": f"Grupo {group_id}", "description": f"Grupo sintético {group_id}",
+                "creator_id": members[group_id][0], "member_count": len(members[group_id]),
+                "post_count": post_counts[group_id],
+            }
+            for group_id in range(1, groups + 1)
+        ])
+        rows = [{"author_id": a, "group_id": g} for g in range(1, groups + 1) for a in members[g]]
+        for offset, count in chunks(len(rows), chunk):
+            connection.execute(insert(models.group_membership_table), rows[offset:offset + count])
+    log(f"grupos: {groups}, participações: {len(rows)}")
+    del rows
+
+    # --- Posts e comentários ---
+    def post_date(post_id: int) -> datetime.datetime:
+        return START_DATE + datetime.timedelta(seconds=post_id * span_seconds // (posts + 1))
+
+    comment_id = 0
+    for offset, count in chunks(posts, chunk):
+        with database.engine.begin() as connection:
+            connection.execute(insert(models.Post), [
+                {
+                    "id": post_id, "title": f"Post {post_id}", "text": f"Texto sintético do post {post_id}",
+                    "author_id": post_authors[post_id], "group_id": post_groups[post_id],
+                    "date": post_date(post_id), "comment_count": comment_counts[post_id],
+                }
+                for post_id in range(offset + 1, offset + count + 1)
+            ])
+            batch = []
+            for post_id in range(offset + 1, offset + count + 1):
+                group_members = members[post_groups[post_id]]
+                for k in range(comment_counts[post_id]):
+                    comment_id += 1
+                    batch.append({
+                        "id": comment_id, "post_id": post_id, "commenter_id": rng.choice(group_members),
+                        "title": "Comentário", "text": f"Comentário {comment_id}",
+                        "date": post_date(post_id) + datetime.timedelta(seconds=k + 1),
+                    })
+            if batch:
+                connection.execute(insert(models.Comment), batch)
+        log(f"posts: {offset + count}/{posts}")
+
+    with database.SessionLocal() as db:
+        timeline.rebuild(db)
+        db.commit()
+        feed_entries = db.execute(select(func.count()).select_from(models.FeedEntry)).scalar()
+    log(f"timeline: {feed_entries} entradas")
+
+    return {
+        "authors": authors,
+        "groups": groups,
+        "memberships_per_author": memberships,
+        "posts": posts,
+        "comments": comment_id,
+        "feed_entries": feed_entries,
+        "largest_group_members": max(len(group_members) for group_members in members),
+        "skew": skew,
+        "seed": seed,
+        "seconds": round(time.perf_counter() - started, 1),
+    }
+
+def dataset_args(parser: argparse.ArgumentParser) -> None:
+    """Opções do gerador, também aceitas por benchmarks.load."""
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--authors", type=int)
+    parser.add_argument("--groups", type=int)
+    parser.add_argument("--memberships", type=int, help="Grupos por autor")
+    parser.add_argument("--posts", type=int)
+    parser.add_argument("--comments", type=float, help="Comentários por post, em média")
+    parser.add_argument("--skew", type=float, help="Expoente de Zipf da popularidade dos grupos")
+    parser.add_argument("--seed", type=int, default=42)
+
+def dataset_params(args) -> dict:
+    params = dict(SCALES[args.scale])
+    params.update({name: getattr(args, name) for name in params if getattr(args, name) is not None})
+    params["seed"] = args.seed
+    return params
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", required=True)
+    dataset_args(parser)
+    args = parser.parse_args()
+    os.environ["DATABASE_URL"] = args.database_url
+    summary = generate(**dataset_params(args), log=lambda message: print(message, file=sys.stderr))
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+Benchmark: exclusão de um grupo grande em segundo plano.
+
+Gera num banco SQLite temporário um grupo com `--posts` posts, `--comments`
+comentários por post e `--members` membros (com as entradas de timeline
+correspondentes), exclui o grupo pela API e mede:
+
+- a latência do DELETE /groups/{id} (que só esconde o grupo e enfileira o job);
+- quanto tempo o job leva até remover tudo;
+- a latência de POST /posts/ em outro grupo enquanto o job roda, que mostra se
+  os lotes do job deixam o lock de escrita livre para as rotas.
+
+Ao final confere que não sobrou nenhuma linha do grupo e que o outro grupo
+ficou intacto.
+
+    python -m benchmarks.deletion --posts 20000 --comments 2 --members 20
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/deletion.db"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import func, insert, select  # noqa: E402
+
+from src import auth, database, migrations, models, timeline  # noqa: E402
+from src.database import SessionLocal  # noqa: E402
+from src.main import app  # noqa: E402
+
+
+def seed(posts: int, comments: int, members: int, chunk: int = 20000) -> None:
+    """Autor 1 cria os grupos 1 (a excluir) e 2 (controle); os membros entram nos dois."""
+    migrations.upgrade()
+    password = auth.hash_password("senha")
+    start = datetime.datetime(2024, 1, 1)
+    with database.engine.begin() as connection:
+        connection.execute(insert(models.Author), [
+            {"username": f"autor{i}", "email": f"autor{i}@example.com", "password": password} for i in range(members)])
+        connection.execute(insert(models.Group), [
+            {"name": "Grande", "creator_id": 1, "member_count": members, "post_count": posts},
+            {"name": "Controle", "creator_id": 1, "member_count": members, "post_count": 0},
+        ])
+        connection.execute(insert(models.group_membership_table), [
+            {"author_id": author_id, "group_id": group_id}
+            for author_id in range(1, members + 1) for group_id in (1, 2)])
+    for offset in range(0, posts, chunk):
+        count = min(chunk, posts - offset)
+        with database.engine.begin() as connection:
+            connection.execute(insert(models.Post), [
+                {
+                    "title": f"Post {offset + i}", "text": "Texto", "group_id": 1,
+                    "author_id": (offset + i) % members + 1, "date": start + datetime.timedelta(seconds=offset + i),
+                }
+                for i in range(count)
+            ])
+            connection.execute(insert(models.Comment), [
+                {
+                    "title": "Comentário", "text": "Texto", "post_id": offset + i + 1,
+                    "commenter_id": (offset + i + k) % members + 1,
+                    "date": start + datetime.timedelta(seconds=offset + i, milliseconds=k + 1),
+                }
+                for i in range(count) for k in range(comments)
+            ])
+    with SessionLocal() as db:
+        timeline.rebuild(db)
+        db.commit()
+
+def remaining_rows(group_id: int) -> dict:
+    group_posts = select(models.Post.id).where(models.Post.group_id == group_id)
+    queries = {
+        "groups": select(func.count()).where(models.Group.id == group_id),
+        "posts": select(func.count()).select_from(models.Post).where(models.Post.group_id == group_id),
+        "comments": select(func.count()).select_from(models.Comment).where(models.Comment.post_id.in_(group_posts)),
+        "feed_entries": select(func.count()).select_from(models.FeedEntry).where(models.FeedEntry.group_id == group_id),
+        "group_memberships": select(func.count()).select_from(models.group_membership_table)
+        .where(models.group_membership_table.c.group_id == group_id),
+    }
+    with SessionLocal() as db:
+        return {name: db.execute(query).scalar() for name, query in queries.items()}
+
+def wait_for_job(client: TestClient, location: str, headers: dict, on_tick) -> dict:
+    while True:
+        job = client.get(location, headers=headers).json()
+        if job["status"] in ("done", "failed"):
+            return job
+        on_tick()
+
+
+def run(args) -> int:
+    start = time.perf_counter()
+    seed(args.posts, args.comments, args.members)
+    seeded_in = time.perf_counter() - start
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {auth.create_token({'sub': 'autor0'})}"}
+
+    start = time.perf_counter()
+    response = client.delete("/groups/1", headers=headers)
+    delete_ms = (time.perf_counter() - start) * 1000
+    assert response.status_code == 202, response.text
+    hidden = client.get("/groups/1/details").status_code == 404
+
+    write_ms = []
+    def write_during_job():
+        started = time.perf_counter()
+        client.post("/posts/", json={"title": "Durante", "text": "x", "group_id": 2}, headers=headers)
+        write_ms.append((time.perf_counter() - started) * 1000)
+
+    job = wait_for_job(client, response.headers["location"], headers, write_during_job)
+    write_ms.sort()
+    leftovers = remaining_rows(1)
+    control = client.get("/groups/2/details").json()
+    results = {
+        "posts": args.posts,
+        "comments": args.posts * args.comments,
+        "members": args.members,
+        "chunk_size": int(os.getenv("DELETE_CHUNK_SIZE", "500")),
+        "seed_seconds": round(seeded_in, 1),
+        "delete_request_ms": round(delete_ms, 1),
+        "hidden_immediately": hidden,
+        "job": {key: job[key] for key in ("status", "total", "deleted")},
+        "job_seconds": round((datetime.datetime.fromisoformat(job["finished_at"])
+                              - datetime.datetime.fromisoformat(job["created_at"])).total_seconds(), 2),
+        "writes_during_job": {
+            "count": len(write_ms),
+            "p50_ms": round(statistics.median(write_ms), 2) if write_ms else None,
+            "max_ms": round(write_ms[-1], 2) if write_ms else None,
+        },
+        "leftover_rows": leftovers,
+        "control_group": {"member_count": control["member_count"], "post_count": control["post_count"]},
+    }
+    print(json.dumps(results, indent=2))
+    ok = (
+        job["status"] == "done" and hidden and not any(leftovers.values())
+        and control["member_count"] == args.members and control["post_count"] == len(write_ms)
+    )
+    return 0 if ok else 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--posts", type=int, default=20000)
+    parser.add_argument("--comments", type=int, default=2)
+    parser.add_argument("--members", type=int, default=20)
+    return run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
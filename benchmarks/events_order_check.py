@@ -0,0 +1,51 @@
+"""
+Verificação de regressão: o buffer de eventos fica na ordem dos ids.
+
+`--threads` threads publicam `--events` eventos cada uma no mesmo Hub, com o
+broker local e com o fake do compartilhado (`memory://`). A retomada por
+Last-Event-ID supõe que o buffer está em ordem crescente de id; sai com código
+1 se algum evento chegou ao buffer antes de um de id menor.
+
+    python -m benchmarks.events_order_check
+"""
+import argparse
+import sys
+import threading
+
+from src import events
+
+
+def check(broker, threads: int, count: int) -> list:
+    hub = events.Hub(broker, buffer_size=threads * count)
+
+    def publisher():
+        for index in range(count):
+            hub.publish("post.created", {"index": index}, group_id=1)
+
+    workers = [threading.Thread(target=publisher) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    ids = [event.id for event in hub._buffer]
+    out_of_order = sum(1 for previous, current in zip(ids, ids[1:]) if current < previous)
+    name = type(broker).__name__
+    return [f"{name}: {out_of_order} evento(s) fora de ordem no buffer"] if out_of_order else []
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--events", type=int, default=2000)
+    args = parser.parse_args()
+    errors = []
+    for broker in (events.LocalBroker(), events.InMemoryBroker()):
+        errors += check(broker, args.threads, args.events)
+    for error in errors:
+        print("ERRO: " + error)
+    print(f"{'falhou' if errors else 'ok'} ({args.threads * args.events} eventos por broker)")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+Verificação de regressão: plano de execução das consultas das rotas quentes.
+
+Roda a API em processo contra um banco SQLite temporário, captura os SELECTs
+emitidos por cada rota e passa cada um por EXPLAIN QUERY PLAN. Sai com código 1
+se algum plano varrer uma tabela inteira ("SCAN <tabela>" sem índice), ordenar
+fora de índice ("USE TEMP B-TREE FOR ORDER BY") ou se uma rota GET carregar o
+hash de senha dos autores. As consultas do worker de exclusão (src/deletion.py)
+entram como "deletion worker".
+
+    python -m benchmarks.explain_check
+"""
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/explain_check.db"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+# As consultas que remontam as listas de hot_posts também precisam de índice.
+os.environ.setdefault("HOT_POSTS_ENABLED", "true")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from src import database, migrations, models  # noqa: E402
+from src.main import app  # noqa: E402
+
+FULL_SCAN = re.compile(r"\bSCAN (\w+)$")
+TEMP_SORT = "USE TEMP B-TREE FOR ORDER BY"
+PASSWORD_COLUMN = "authors.password"
+
+
+class SelectRecorder:
+    def __init__(self, *engines):
+        self.route = None
+        self.selects = []
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        route = "deletion worker" if threading.current_thread().name == "deletion-worker" else self.route
+        if route and not executemany and statement.lstrip().upper().startswith("SELECT"):
+            self.selects.append((route, statement, parameters))
+
+    def call(self, route, request):
+        self.route = route
+        response = request()
+        self.route = None
+        assert response.status_code < 400, (route, response.text)
+        return response
+
+
+def _plan(connection, statement, parameters):
+    rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+    return [row[-1] for row in rows]
+
+def _problems(plan):
+    for step in plan:
+        scan = FULL_SCAN.search(step)
+        if (scan and scan.group(1) in database.Base.metadata.tables) or TEMP_SORT in step:
+            yield step
+
+
+def wait_for_job(job_id: int, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    with database.SessionLocal() as db:
+        while time.monotonic() < deadline:
+            status = db.get(models.DeletionJob, job_id, populate_existing=True).status
+            if status in ("done", "failed"):
+                break
+            time.sleep(0.05)
+    assert status == "done", (job_id, status)
+
+def exercise(recorder, client):
+    def register(username):
+        client.post("/register/", json={"username": username, "email": f"{username}@example.com", "password": "senha"})
+        token = client.post("/login/", json={"username": username, "password": "senha"}).json()["access_token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    owner, member = register("dono"), register("membro")
+    group_id = client.post("/groups/", json={"name": "Planos"}, headers=owner).json()["id"]
+    client.post(f"/groups/{group_id}/join", headers=member)
+    post_ids = [
+        client.post("/posts/", json={"title": f"p{i}", "text": "x", "group_id": group_id}, headers=owner).json()["id"]
+        for i in range(3)
+    ]
+    client.post(f"/posts/{post_ids[0]}/comments/", json={"title": "c", "text": "x"}, headers=member)
+    author_id = client.get("/users/me/", headers=owner).json()["id"]
+
+    recorder.call("GET /posts/", lambda: client.get("/posts/?limit=2", headers=member))
+    recorder.call("GET /authors/{id}/posts/", lambda: client.get(f"/authors/{author_id}/posts/", headers=owner))
+    recorder.call("GET /posts/{id}", lambda: client.get(f"/posts/{post_ids[0]}", headers=owner))
+    recorder.call("GET /posts/{id}/comments", lambda: client.get(
+        f"/posts/{post_ids[0]}/comments", params={"cursor": "2000-01-01T00:00:00,0", "limit": 5}))
+    recorder.call("GET /groups/", lambda: client.get("/groups/?q=Pla", headers=owner))
+    recorder.call("GET /groups/{id}/details", lambda: client.get(f"/groups/{group_id}/details", headers=owner))
+    recorder.call("GET /groups/{id}/members", lambda: client.get(f"/groups/{group_id}/members", headers=owner))
+    recorder.call("POST /posts/", lambda: client.post(
+        "/posts/", json={"title": "n", "text": "x", "group_id": group_id}, headers=member))
+    recorder.call("POST /posts/{id}/comments/", lambda: client.post(
+        f"/posts/{post_ids[1]}/comments/", json={"title": "c", "text": "x"}, headers=owner))
+    recorder.call("PUT /posts/{id}", lambda: client.put(f"/posts/{post_ids[0]}", json={"title": "t"}, headers=owner))
+    recorder.call("POST /groups/{id}/leave", lambda: client.post(f"/groups/{group_id}/leave", headers=member))
+    recorder.call("POST /groups/{id}/join", lambda: client.post(f"/groups/{group_id}/join", headers=member))
+    recorder.call("DELETE /posts/{id}", lambda: client.delete(f"/posts/{post_ids[2]}", headers=owner))
+    recorder.call("POST /posts/bulk", lambda: client.post(
+        "/posts/bulk", json=[{"title": "b", "text": "x", "group_id": group_id}] * 3, headers=owner))
+    recorder.call("POST /comments/bulk", lambda: client.post(
+        "/comments/bulk", json=[{"title": "c", "text": "x", "post_id": post_id} for post_id in post_ids[:2]], headers=owner))
+    register("novato")
+    recorder.call("POST /groups/{id}/members/bulk", lambda: client.post(
+        f"/groups/{group_id}/members/bulk", json={"usernames": ["novato", "membro"]}, headers=owner))
+
+    # Exclusões: a rota só esconde e enfileira; o worker apaga em lotes.
+    leaving = register("saindo")
+    client.post(f"/groups/{group_id}/join", headers=leaving)
+    own_group = client.post("/groups/", json={"name": "Efêmero"}, headers=leaving).json()["id"]
+    leaving_post = client.post("/posts/", json={"title": "s", "text": "x", "group_id": group_id}, headers=leaving).json()["id"]
+    client.post(f"/posts/{leaving_post}/comments/", json={"title": "c", "text": "x"}, headers=owner)
+    client.post("/posts/", json={"title": "e", "text": "x", "group_id": own_group}, headers=leaving)
+    client.post(f"/posts/{post_ids[0]}/comments/", json={"title": "c", "text": "x"}, headers=leaving)
+    jobs = [
+        recorder.call("DELETE /groups/{id}", lambda: client.delete(f"/groups/{group_id}", headers=owner)),
+        recorder.call("DELETE /users/me/", lambda: client.delete("/users/me/", headers=leaving)),
+    ]
+    recorder.call("GET /jobs/{id}", lambda: client.get(jobs[0].headers["location"], headers=owner))
+    for response in jobs:
+        wait_for_job(response.json()["id"])
+
+
+def run():
+    migrations.upgrade()
+    recorder = SelectRecorder(database.engine, database.read_engine)
+    exercise(recorder, TestClient(app))
+
+    failed = False
+    with database.engine.connect() as connection:
+        for route, statement, parameters in recorder.selects:
+            problems = list(_problems(_plan(connection, statement, parameters)))
+            if route.startswith("GET") and PASSWORD_COLUMN in statement:
+                problems.append(f"lê {PASSWORD_COLUMN}")
+            if problems:
+                failed = True
+                print(f"{route}: {' | '.join(problems)}")
+                print("    " + " ".join(statement.split())[:200])
+    print(f"{len(recorder.selects)} consultas verificadas: {'FALHOU' if failed else 'ok'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,69 @@
+"""
+Verificação de regressão: rotas que dividem uma chave do cache HTTP.
+
+GET /posts/{id} e GET /posts/{id}/comments usam a mesma chave (`post:{id}`).
+Busca as duas em sequência, nas duas ordens, e confere o formato de cada
+resposta: um objeto com `comments` para o post, uma lista para os comentários.
+Sai com código 1 se uma delas voltar com o corpo guardado pela outra.
+
+    python -m benchmarks.http_cache_check
+    DATABASE_URL=sqlite+aiosqlite:////tmp/check.db python -m benchmarks.http_cache_check
+"""
+import os
+import sys
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp_dir}/http_cache_check.db")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ["HTTP_CACHE_ENABLED"] = "true"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from src import http_cache  # noqa: E402
+from src.main import app  # noqa: E402
+
+
+def check_shapes(client: TestClient, post_id: int, order: tuple) -> list:
+    errors = []
+    for path in order:
+        for attempt in ("miss", "hit"):
+            response = client.get(path)
+            body = response.json()
+            if response.status_code != 200:
+                errors.append(f"{path} ({attempt}): status {response.status_code}")
+            elif path.endswith("/comments") and not isinstance(body, list):
+                errors.append(f"{path} ({attempt}): esperava uma lista, veio {type(body).__name__}")
+            elif not path.endswith("/comments") and not (isinstance(body, dict) and body.get("id") == post_id):
+                errors.append(f"{path} ({attempt}): esperava o post {post_id}")
+    return errors
+
+
+def run() -> int:
+    with TestClient(app) as client:
+        client.post("/register/", json={"username": "autor", "email": "autor@example.com", "password": "senha123"})
+        token = client.post("/login/", json={"username": "autor", "password": "senha123"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        group_id = client.post("/groups/", json={"name": "Cache", "description": "d"}, headers=headers).json()["id"]
+        post_ids = [
+            client.post("/posts/", json={"title": f"Post {i}", "text": "t", "group_id": group_id}, headers=headers).json()["id"]
+            for i in range(2)
+        ]
+        for post_id in post_ids:
+            client.post(f"/posts/{post_id}/comments/", json={"title": "c", "text": "x"}, headers=headers)
+
+        errors = []
+        first, second = post_ids
+        errors += check_shapes(client, first, (f"/posts/{first}", f"/posts/{first}/comments"))
+        errors += check_shapes(client, second, (f"/posts/{second}/comments", f"/posts/{second}"))
+
+    hits = http_cache.responses.stats()["hits"]
+    for error in errors:
+        print("ERRO: " + error)
+    print(f"{'falhou' if errors else 'ok'} ({hits} respostas do cache)")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
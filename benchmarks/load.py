@@ -0,0 +1,397 @@
+"""
+Teste de carga reprodutível: gera (ou reaproveita) um conjunto de dados e
+dirige a API com uma mistura realista de operações.
+
+Cada usuário virtual é um autor do conjunto de dados que faz login e depois
+sorteia, pelos pesos de `--mix`, entre:
+
+- login       POST /login/
+- feed        GET /posts/ (primeira página; às vezes segue o X-Next-Cursor)
+- post        GET /posts/{id} (80% entre o 1% de posts mais recentes)
+- create_post POST /posts/ num grupo do qual é membro
+- join        POST /groups/{id}/join num grupo do qual ainda não é membro
+
+`--target inprocess` chama o app ASGI direto pelo httpx (sem rede);
+`--target uvicorn` sobe a API com `run.py --prod --workers N` num subprocesso
+e mede por HTTP. O relatório em JSON traz p50/p95/p99 por operação, vazão,
+erros, pico de RSS (somado entre os processos que rodam o app) e o commit medido. Os sorteios usam `--seed`, então
+dois commits medidos com os mesmos parâmetros recebem a mesma sequência de
+operações.
+
+Com `--baseline`, compara com um relatório anterior e sai com código 1 se o p95
+de alguma operação piorar, ou a vazão cair, mais que `--max-regression`:
+
+    python -m benchmarks.load --scale small --duration 30 --output base.json
+    python -m benchmarks.load --scale small --duration 30 --baseline base.json
+
+Sem `--database-url`, o conjunto é gerado por benchmarks.datagen num diretório
+temporário (aceita as mesmas opções de escala). Para reaproveitar um banco já
+gerado, passe `--database-url` junto com as mesmas opções usadas na geração.
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from . import datagen
+
+OPERATIONS = ("login", "feed", "post", "create_post", "join")
+DEFAULT_MIX = "login=1,feed=10,post=6,create_post=2,join=1"
+# Variáveis que mudam o comportamento da API e por isso vão para o relatório.
+REPORTED_ENV = (
+    "DATABASE_URL", "FAST_SERIALIZATION", "HTTP_CACHE_ENABLED", "METRICS_ENABLED",
+    "SQLITE_TUNING", "BCRYPT_ROUNDS", "DB_POOL_SIZE", "HOT_POSTS_ENABLED", "RATE_LIMIT_ENABLED",
+    "ADMISSION_ENABLED", "MAX_CONCURRENCY", "WRITE_BATCH_ENABLED",
+)
+# Abaixo disso o p95 de uma operação é ruído demais para barrar um merge.
+MIN_COMPARED_SAMPLES = 100
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Operação desconhecida: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def percentile(ordered: list, pct: float):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def latency_summary(latencies: list) -> dict:
+    if not latencies:
+        return {}
+    ordered = sorted(latencies)
+    return {
+        "mean": round(statistics.fmean(ordered) * 1000, 2),
+        "p50": round(percentile(ordered, 50) * 1000, 2),
+        "p95": round(percentile(ordered, 95) * 1000, 2),
+        "p99": round(percentile(ordered, 99) * 1000, 2),
+        "max": round(ordered[-1] * 1000, 2),
+    }
+
+def git_revision() -> dict:
+    def git(*args):
+        result = subprocess.run(["git", *args], capture_output=True, text=True, cwd=os.path.dirname(__file__))
+        return result.stdout.strip() if result.returncode == 0 else None
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(status) if status is not None else None}
+
+def rss_peak_mb(pid=None):
+    """
+    Pico de RSS (VmHWM no Linux) do processo `pid` somado ao dos descendentes
+    vivos, isto é, do mestre e dos workers; sem pid, o do próprio processo.
+    """
+    if pid is None:
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    total_kb, pending = 0, [pid]
+    try:
+        while pending:
+            current = pending.pop()
+            with open(f"/proc/{current}/status") as status:
+                total_kb += next(int(line.split()[1]) for line in status if line.startswith("VmHWM:"))
+            with open(f"/proc/{current}/task/{current}/children") as children:
+                pending += [int(child) for child in children.read().split()]
+    except (OSError, StopIteration):
+        if not total_kb:
+            return None
+    return round(total_kb / 1024, 1)
+
+
+# --- Conjunto de dados ---
+
+def prepare_dataset(args, params: dict) -> dict:
+    """Gera o banco num subprocesso (o RSS da geração não entra no relatório)."""
+    if args.database_url:
+        return {"params": params, "generated": False}
+    path = os.path.join(tempfile.mkdtemp(), "load.db")
+    args.database_url = f"sqlite:///{path}"
+    command = [sys.executable, "-m", "benchmarks.datagen", "--database-url", args.database_url, "--seed", str(params["seed"])]
+    for name in ("authors", "groups", "memberships", "posts", "comments", "skew"):
+        command += [f"--{name}", str(params[name])]
+    result = subprocess.run(command, capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return {"params": params, "generated": True, "summary": json.loads(result.stdout)}
+
+def load_users(count: int, seed: int) -> list:
+    """Sorteia os autores dos usuários virtuais e os grupos de cada um, direto no banco."""
+    from sqlalchemy import func, select
+
+    from src import database, models
+
+    with database.SessionLocal() as db:
+        authors = db.execute(select(func.max(models.Author.id))).scalar()
+        groups = db.execute(select(func.max(models.Group.id))).scalar()
+        posts = db.execute(select(func.max(models.Post.id))).scalar()
+        author_ids = random.Random(seed).sample(range(1, authors + 1), min(count, authors))
+        rows = db.execute(
+            select(models.group_membership_table.c.author_id, models.group_membership_table.c.group_id)
+            .where(models.group_membership_table.c.author_id.in_(author_ids))
+        )
+        member_of = {author_id: set() for author_id in author_ids}
+        for author_id, group_id in rows:
+            member_of[author_id].add(group_id)
+    return [
+        VirtualUser(datagen.username(author_id), member_of[author_id], groups, posts, seed + index)
+        for index, author_id in enumerate(author_ids)
+    ]
+
+
+# --- Usuários virtuais ---
+
+class VirtualUser:
+    def __init__(self, username: str, groups: set, group_count: int, post_count: int, seed: int):
+        self.username = username
+        self.groups = groups
+        self.group_count = group_count
+        self.post_count = post_count
+        self.rng = random.Random(seed)
+        self.headers = {}
+        self.next_cursor = None
+
+    async def login(self, client: httpx.AsyncClient) -> httpx.Response:
+        response = await client.post("/login/", json={"username": self.username, "password": datagen.PASSWORD})
+        if response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return response
+
+    async def feed(self, client: httpx.AsyncClient) -> httpx.Response:
+        path = "/posts/"
+        if self.next_cursor and self.rng.random() < 0.3:
+            path += f"?before={self.next_cursor}"
+        response = await client.get(path, headers=self.headers)
+        self.next_cursor = response.headers.get("x-next-cursor")
+        return response
+
+    async def post(self, client: httpx.AsyncClient) -> httpx.Response:
+        recent = max(1, self.post_count // 100)
+        if self.rng.random() < 0.8:
+            post_id = self.rng.randint(self.post_count - recent + 1, self.post_count)
+        else:
+            post_id = self.rng.randint(1, self.post_count)
+        return await client.get(f"/posts/{post_id}")
+
+    async def create_post(self, client: httpx.AsyncClient) -> httpx.Response:
+        group_id = self.rng.choice(sorted(self.groups))
+        return await client.post(
+            "/posts/", headers=self.headers,
+            json={"title": "Post de carga", "text": "Texto gerado pelo teste de carga", "group_id": group_id},
+        )
+
+    async def join(self, client: httpx.AsyncClient) -> httpx.Response:
+        group_id = self.rng.randint(1, self.group_count)
+        while group_id in self.groups and len(self.groups) < self.group_count:
+            group_id = self.rng.randint(1, self.group_count)
+        response = await client.post(f"/groups/{group_id}/join", headers=self.headers)
+        if response.status_code == 200:
+            self.groups.add(group_id)
+        return response
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {name: [] for name in OPERATIONS}
+        self.errors = {name: {} for name in OPERATIONS}
+        self.recording = False
+
+    def record(self, operation: str, seconds: float, outcome) -> None:
+        if not self.recording:
+            return
+        if outcome is None:
+            self.latencies[operation].append(seconds)
+        else:
+            self.errors[operation][str(outcome)] = self.errors[operation].get(str(outcome), 0) + 1
+
+
+async def run_user(user: VirtualUser, client: httpx.AsyncClient, mix: dict, deadline: float, recorder: Recorder):
+    names, weights = list(mix), list(mix.values())
+    operation = "login"
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await getattr(user, operation)(client)
+            outcome = response.status_code if response.status_code >= 400 else None
+        except httpx.HTTPError as exc:
+            outcome = type(exc).__name__
+        recorder.record(operation, time.perf_counter() - started, outcome)
+        operation = user.rng.choices(names, weights)[0]
+
+async def drive(client: httpx.AsyncClient, users: list, mix: dict, warmup: float, duration: float) -> tuple:
+    recorder = Recorder()
+    deadline = time.perf_counter() + warmup + duration
+
+    async def start_recording():
+        await asyncio.sleep(warmup)
+        recorder.recording = True
+
+    started = time.perf_counter()
+    await asyncio.gather(start_recording(), *(run_user(user, client, mix, deadline, recorder) for user in users))
+    return recorder, time.perf_counter() - started - warmup
+
+
+# --- Alvos ---
+
+async def run_inprocess(users, mix, args) -> tuple:
+    from src.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            recorder, elapsed = await drive(client, users, mix, args.warmup, args.duration)
+    return recorder, elapsed, {"app": rss_peak_mb()}
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def run_uvicorn(users, mix, args) -> tuple:
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "run.py", "--prod", "--host", "127.0.0.1", "--port", str(port), "--workers", str(args.workers)],
+        env={**os.environ, "DATABASE_URL": args.database_url},
+        stdout=subprocess.DEVNULL,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    url = f"http://127.0.0.1:{port}"
+    limits = httpx.Limits(max_connections=len(users), max_keepalive_connections=len(users))
+    try:
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+            for _ in range(600):
+                with contextlib.suppress(httpx.HTTPError):
+                    if (await client.get("/groups/?limit=1")).status_code == 200:
+                        break
+                if server.poll() is not None:
+                    raise RuntimeError("A API terminou antes de aceitar conexões")
+                await asyncio.sleep(0.1)
+            recorder, elapsed = await drive(client, users, mix, args.warmup, args.duration)
+        # Lido antes do terminate, enquanto os workers ainda existem.
+        return recorder, elapsed, {"app": rss_peak_mb(server.pid), "client": rss_peak_mb()}
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+# --- Relatório ---
+
+def build_report(args, dataset, mix, recorder: Recorder, elapsed: float, rss: dict) -> dict:
+    operations = {}
+    for name in OPERATIONS:
+        latencies = recorder.latencies[name]
+        if not latencies and not recorder.errors[name]:
+            continue
+        operations[name] = {
+            "requests": len(latencies),
+            "errors": recorder.errors[name],
+            "requests_per_s": round(len(latencies) / elapsed, 1),
+            "latency_ms": latency_summary(latencies),
+        }
+    every = [latency for latencies in recorder.latencies.values() for latency in latencies]
+    return {
+        "benchmark": "load",
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "env": {name: os.environ[name] for name in REPORTED_ENV if name in os.environ},
+        "config": {
+            "target": args.target,
+            "workers": args.workers if args.target == "uvicorn" else None,
+            "users": args.users,
+            "warmup_s": args.warmup,
+            "duration_s": args.duration,
+            "mix": mix,
+        },
+        "dataset": dataset,
+        "elapsed_s": round(elapsed, 2),
+        "requests": len(every),
+        "errors": sum(sum(errors.values()) for errors in recorder.errors.values()),
+        "requests_per_s": round(len(every) / elapsed, 1),
+        "latency_ms": latency_summary(every),
+        "operations": operations,
+        "peak_rss_mb": rss,
+    }
+
+def compare(report: dict, baseline: dict, tolerance: float) -> dict:
+    """Regressões de p95 por operação e de vazão total em relação ao `baseline`."""
+    if report["config"] != baseline["config"] or report["dataset"]["params"] != baseline["dataset"]["params"]:
+        return {"comparable": False, "regressions": []}
+    regressions = []
+
+    def check(metric: str, current, previous, higher_is_worse: bool = True):
+        if current is None or not previous:
+            return
+        change = (current - previous) / previous
+        if (change if higher_is_worse else -change) > tolerance:
+            regressions.append({"metric": metric, "baseline": previous, "current": current, "change": round(change, 3)})
+
+    check("requests_per_s", report["requests_per_s"], baseline["requests_per_s"], higher_is_worse=False)
+    for name, current in report["operations"].items():
+        previous = baseline["operations"].get(name)
+        if previous and min(current["requests"], previous["requests"]) >= MIN_COMPARED_SAMPLES:
+            check(f"{name}.p95_ms", current["latency_ms"].get("p95"), previous["latency_ms"].get("p95"))
+    return {
+        "comparable": True,
+        "baseline_commit": baseline["revision"]["commit"],
+        "max_regression": tolerance,
+        "regressions": regressions,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Banco já gerado por benchmarks.datagen")
+    datagen.dataset_args(parser)
+    parser.add_argument("--target", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--workers", type=int, default=1, help="Workers do run.py --prod (alvo uvicorn)")
+    parser.add_argument("--users", type=int, default=32, help="Usuários virtuais simultâneos")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--output", help="Grava o relatório JSON neste arquivo")
+    parser.add_argument("--baseline", help="Relatório anterior para comparar")
+    parser.add_argument("--max-regression", type=float, default=0.10)
+    args = parser.parse_args()
+
+    dataset = prepare_dataset(args, datagen.dataset_params(args))
+    # Só depois de definido o banco: src.database lê DATABASE_URL no import.
+    os.environ["DATABASE_URL"] = args.database_url
+    # Todos os usuários virtuais saem do mesmo IP: o limite por IP mediria o gerador, não a API.
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    users = load_users(args.users, dataset["params"]["seed"])
+    runner = run_inprocess if args.target == "inprocess" else run_uvicorn
+    recorder, elapsed, rss = asyncio.run(runner(users, args.mix, args))
+    report = build_report(args, dataset, args.mix, recorder, elapsed, rss)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            report["comparison"] = compare(report, json.load(baseline_file), args.max_regression)
+        if not report["comparison"]["comparable"]:
+            print("O baseline usa outra configuração ou outro conjunto de dados; nada comparado.", file=sys.stderr)
+            exit_code = 2
+        elif report["comparison"]["regressions"]:
+            exit_code = 1
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output + "\n")
+    print(output)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Verificação de regressão: quantas instruções SQL cada rota executa.
+
+Roda a API em processo contra um banco SQLite temporário, aquece o cache do
+usuário autenticado e conta os statements de cada chamada. Sai com código 1
+se alguma rota passar do orçamento em QUERY_BUDGETS.
+
+    python -m benchmarks.query_counts
+"""
+import os
+import sys
+import tempfile
+import threading
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/query_counts.db"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+# A releitura periódica dos tokens revogados não faz parte do custo de uma rota.
+os.environ.setdefault("REVOCATION_REFRESH", "3600")
+# Um processo só: as listas de hot_posts podem ficar locais (o orçamento do feed quente conta com elas).
+os.environ.setdefault("HOT_POSTS_ENABLED", "true")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from src import database, migrations  # noqa: E402
+from src.main import app  # noqa: E402
+
+# Máximo de statements por chamada, com o usuário já em cache.
+QUERY_BUDGETS = {
+    "create_post": 4,
+    "update_post": 3,
+    "create_comment_for_post": 3,
+    # Lotes de BULK_ITEMS itens: o número de statements não cresce com o lote.
+    "create_posts_bulk": 4,
+    "create_comments_bulk": 3,
+    # Inclui o incremento de Author.membership_version dos novos membros.
+    "add_group_members_bulk": 7,
+    # Só esconde o grupo e enfileira o job, qualquer que seja o tamanho dele.
+    "delete_group": 5,
+    # Com as listas dos grupos já em hot_posts o feed não consulta o banco.
+    "get_user_feed_warm": 0,
+}
+BULK_ITEMS = 20
+
+
+class StatementCounter:
+    def __init__(self, *engines):
+        self.count = 0
+        self.statements = []
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.current_thread().name == "deletion-worker":
+            return  # o job roda depois da resposta; não conta para a rota
+        self.count += 1
+        self.statements.append(statement)
+
+    def measure(self, call):
+        self.count = 0
+        self.statements = []
+        response = call()
+        assert response.status_code < 400, response.text
+        return self.count, list(self.statements), response
+
+
+def run():
+    migrations.upgrade()
+    counter = StatementCounter(database.engine, database.read_engine)
+    client = TestClient(app)
+
+    client.post("/register/", json={"username": "medidor", "email": "medidor@example.com", "password": "senha"})
+    token = client.post("/login/", json={"username": "medidor", "password": "senha"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    group_id = client.post("/groups/", json={"name": "Medições"}, headers=headers).json()["id"]
+    client.get("/users/me/", headers=headers)  # aquece o cache do principal
+
+    results = {}
+    count, statements, response = counter.measure(
+        lambda: client.post("/posts/", json={"title": "t", "text": "x", "group_id": group_id}, headers=headers))
+    results["create_post"] = (count, statements)
+    post_id = response.json()["id"]
+
+    count, statements, _ = counter.measure(
+        lambda: client.post(f"/posts/{post_id}/comments/", json={"title": "c", "text": "x"}, headers=headers))
+    results["create_comment_for_post"] = (count, statements)
+
+    count, statements, _ = counter.measure(
+        lambda: client.put(f"/posts/{post_id}", json={"title": "novo"}, headers=headers))
+    results["update_post"] = (count, statements)
+
+    count, statements, _ = counter.measure(lambda: client.post(
+        "/posts/bulk", json=[{"title": f"t{i}", "text": "x", "group_id": group_id} for i in range(BULK_ITEMS)], headers=headers))
+    results["create_posts_bulk"] = (count, statements)
+
+    count, statements, _ = counter.measure(lambda: client.post(
+        "/comments/bulk", json=[{"title": f"c{i}", "text": "x", "post_id": post_id} for i in range(BULK_ITEMS)], headers=headers))
+    results["create_comments_bulk"] = (count, statements)
+
+    usernames = [f"membro{i}" for i in range(BULK_ITEMS)]
+    for username in usernames:
+        client.post("/register/", json={"username": username, "email": f"{username}@example.com", "password": "senha"})
+    count, statements, _ = counter.measure(lambda: client.post(
+        f"/groups/{group_id}/members/bulk", json={"usernames": usernames}, headers=headers))
+    results["add_group_members_bulk"] = (count, statements)
+
+    client.get("/posts/", headers=headers)
+    count, statements, _ = counter.measure(lambda: client.get("/posts/", headers=headers))
+    results["get_user_feed_warm"] = (count, statements)
+
+    doomed_id = client.post("/groups/", json={"name": "Descartável"}, headers=headers).json()["id"]
+    client.post("/posts/bulk", json=[{"title": f"d{i}", "text": "x", "group_id": doomed_id} for i in range(BULK_ITEMS)], headers=headers)
+    client.get("/users/me/", headers=headers)
+    count, statements, _ = counter.measure(lambda: client.delete(f"/groups/{doomed_id}", headers=headers))
+    results["delete_group"] = (count, statements)
+
+    failed = False
+    for name, (count, statements) in results.items():
+        budget = QUERY_BUDGETS[name]
+        status = "ok" if count <= budget else "EXCEDEU"
+        print(f"{name:28} {count:3} / {budget:<3} {status}")
+        if count > budget:
+            failed = True
+            for statement in statements:
+                print("    " + " ".join(statement.split())[:160])
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,78 @@
+"""
+Benchmark: custo por requisição do limite de taxa e do controle de admissão, em microssegundos.
+
+Mede os dois baldes de uma rota sozinhos (`buckets.take`), a dependência de uma rota com
+limite por usuário e por IP (o token já verificado, como nas requisições
+seguintes ao login) e o middleware de admissão em volta de um app vazio,
+comparado ao mesmo app sem ele.
+
+    python -m benchmarks.rate_limit_overhead --iterations 100000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/rate_limit_overhead.db"
+# Baldes grandes o bastante para nenhuma chamada medida ser recusada.
+os.environ["RATE_LIMITS"] = "medida=user:1000000000/1,ip:1000000000/1"
+
+from starlette.requests import Request  # noqa: E402
+
+from src import auth, rate_limit  # noqa: E402
+
+
+def microseconds(func, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return round((time.perf_counter() - start) / iterations * 1e6, 2)
+
+async def async_microseconds(func, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await func()
+    return round((time.perf_counter() - start) / iterations * 1e6, 2)
+
+
+async def empty_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+async def ignore(message):
+    pass
+
+
+async def measure(iterations: int) -> dict:
+    token = auth.create_token({"sub": "autor", "uid": 1})
+    scope = {
+        "type": "http", "method": "POST", "path": "/medida", "client": ("10.0.0.1", 1234),
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+    }
+    request = Request(scope)
+    check = rate_limit.limit("medida")
+    middleware = rate_limit.AdmissionMiddleware(empty_app)
+    checks = [("medida:user:autor", rate_limit.LIMITS["medida"][0]), ("medida:ip:10.0.0.1", rate_limit.LIMITS["medida"][1])]
+    await check(request)
+    return {
+        "buckets_take": microseconds(lambda: rate_limit.buckets.take(checks), iterations),
+        "route_dependency": await async_microseconds(lambda: check(request), iterations),
+        "app_without_admission": await async_microseconds(lambda: empty_app(scope, None, ignore), iterations),
+        "app_with_admission": await async_microseconds(lambda: middleware(scope, None, ignore), iterations),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+    print(json.dumps({"iterations": args.iterations, "us_per_call": asyncio.run(measure(args.iterations))}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""
+Benchmark: latência da busca textual com muitos posts.
+
+Gera `--posts` posts (e um comentário a cada dez) num banco SQLite temporário,
+com um vocabulário de frequência zipfiana, e mede a latência de
+`search.search` para termos raros, médios e comuns, como os vê um usuário
+que participa de `--groups` grupos de um total de 50.
+
+    python -m benchmarks.search --posts 1000000 --iterations 50
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/search.db"
+
+from sqlalchemy import insert  # noqa: E402
+
+from src import database, migrations, models, search  # noqa: E402
+from src.database import SessionLocal  # noqa: E402
+
+TOTAL_GROUPS = 50
+VOCABULARY = [f"termo{i}" for i in range(20000)]
+
+
+def words(rng: random.Random, count: int) -> str:
+    # Zipf aproximado: a palavra de posição k aparece com frequência ~1/k.
+    return " ".join(VOCABULARY[min(int(rng.paretovariate(1.0)) - 1, len(VOCABULARY) - 1)] for _ in range(count))
+
+def seed(posts: int, chunk: int = 20000) -> None:
+    migrations.upgrade()
+    rng = random.Random(42)
+    start = datetime.datetime(2024, 1, 1)
+    with database.engine.begin() as connection:
+        connection.execute(insert(models.Author), [{"username": "autor", "email": "autor@example.com", "password": "x"}])
+        connection.execute(insert(models.Group), [
+            {"name": f"Grupo {i}", "creator_id": 1} for i in range(TOTAL_GROUPS)])
+    for offset in range(0, posts, chunk):
+        count = min(chunk, posts - offset)
+        with database.engine.begin() as connection:
+            connection.execute(insert(models.Post), [
+                {
+                    "title": words(rng, 4), "text": words(rng, 30), "author_id": 1,
+                    "group_id": (offset + i) % TOTAL_GROUPS + 1,
+                    "date": start + datetime.timedelta(seconds=offset + i),
+                }
+                for i in range(count)
+            ])
+            connection.execute(insert(models.Comment), [
+                {
+                    "title": "Comentário", "text": words(rng, 12), "post_id": offset + i + 1,
+                    "commenter_id": 1, "date": start + datetime.timedelta(seconds=offset + i, milliseconds=1),
+                }
+                for i in range(0, count, 10)
+            ])
+
+
+def latency_ms(query: str, group_ids: list, iterations: int) -> dict:
+    timings = []
+    with SessionLocal() as db:
+        hits = len(search.search(db, query, group_ids, search.SEARCH_DEFAULT_LIMIT))
+        for _ in range(iterations):
+            start = time.perf_counter()
+            search.search(db, query, group_ids, search.SEARCH_DEFAULT_LIMIT)
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "hits": hits,
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 2),
+    }
+
+
+def run(args) -> int:
+    start = time.perf_counter()
+    seed(args.posts)
+    seeded_in = time.perf_counter() - start
+    group_ids = list(range(1, args.groups + 1))
+    queries = {
+        "raro": "termo15000",
+        "medio": "termo300",
+        "comum": "termo5",
+        "dois_termos": "termo40 termo90",
+        "raro_e_comum": "termo5 termo3000",
+    }
+    results = {
+        "posts": args.posts,
+        "groups": args.groups,
+        "seed_seconds": round(seeded_in, 1),
+        "queries": {name: latency_ms(query, group_ids, args.iterations) for name, query in queries.items()},
+    }
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--posts", type=int, default=100000)
+    parser.add_argument("--groups", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=50)
+    return run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+Micro-benchmark: custo de CPU da serialização de uma página do feed.
+
+Compara o caminho padrão (modelos Pydantic com from_attributes, como o
+response_model faz) com o modo rápido de `src/serializers.py`, medindo só a
+etapa de serialização e também a rota GET /posts/ inteira. Antes de medir,
+confere que os dois modos produzem exatamente o mesmo JSON nas rotas de leitura.
+
+    python -m benchmarks.serialization --posts 100 --comments 5 --iterations 200
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/serialization.db"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ["HTTP_CACHE_ENABLED"] = "false"
+os.environ["HOT_POSTS_ENABLED"] = "false"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from typing import List  # noqa: E402
+
+from src import auth, membership, migrations, models, read_models, schemas, serializers, timeline  # noqa: E402
+from src.database import SessionLocal  # noqa: E402
+from src.main import app  # noqa: E402
+
+
+def seed(posts: int, comments: int) -> None:
+    migrations.upgrade()
+    with SessionLocal() as db:
+        password = auth.hash_password("senha")
+        authors = [
+            models.Author(username=f"autor{i}", email=f"autor{i}@example.com", password=password)
+            for i in range(10)
+        ]
+        db.add_all(authors)
+        db.flush()
+        group = models.Group(name="Benchmark", description="Grupo do benchmark", creator_id=authors[0].id)
+        db.add(group)
+        db.flush()
+        for author in authors:
+            membership.add_member(db, author.id, group.id)
+        start = datetime.datetime(2024, 1, 1, 12, 0, 0)
+        for i in range(posts):
+            post = models.Post(
+                title=f"Post {i}", text="Texto com acentuação " * 5, date=start + datetime.timedelta(minutes=i),
+                author_id=authors[i % len(authors)].id, group_id=group.id, comment_count=comments,
+            )
+            db.add(post)
+            db.flush()
+            for j in range(comments):
+                db.add(models.Comment(
+                    title="Comentário", text=f"Comentário {j}", date=post.date + datetime.timedelta(seconds=j + 1),
+                    post_id=post.id, commenter_id=authors[j % len(authors)].id,
+                ))
+        group.post_count = posts
+        timeline.rebuild(db)
+        db.commit()
+
+
+def load_feed(author_id: int):
+    with SessionLocal() as db:
+        posts = timeline.read_page(db, author_id, None, timeline.FEED_MAX_LIMIT)
+        latest = read_models.latest_comments(db, [post.id for post in posts], timeline.FEED_LATEST_COMMENTS)
+        return posts, latest
+
+
+def cpu_per_call(func, iterations: int) -> float:
+    func()  # aquece caches (TypeAdapters, schemas)
+    start = time.process_time()
+    for _ in range(iterations):
+        func()
+    return (time.process_time() - start) / iterations * 1000
+
+
+def default_serialization(posts, latest) -> bytes:
+    # Piso do caminho padrão: os modelos montados pela rota e um único dump_json
+    # (o response_model ainda revalida a lista antes de serializar).
+    items = [
+        schemas.FeedPostRead(
+            id=post.id, title=post.title, text=post.text, date=post.date,
+            author_id=post.author_id, author=post.author, group=post.group,
+            comment_count=post.comment_count, comments=latest[post.id],
+        )
+        for post in posts
+    ]
+    return _feed_adapter.dump_json(items)
+
+def fast_serialization(posts, latest) -> bytes:
+    return serializers.dumps([serializers.dump_feed_post(post, latest[post.id]) for post in posts])
+
+_feed_adapter = TypeAdapter(List[schemas.FeedPostRead])
+
+
+def check_same_json(client: TestClient, headers: dict) -> list:
+    """Rotas cujo JSON difere entre os modos (deve ser vazia)."""
+    me = client.get("/users/me/", headers=headers).json()
+    post_id = client.get("/posts/?limit=1", headers=headers).json()[0]["id"]
+    group_id = me["groups"][0]["id"]
+    paths = [
+        "/posts/?limit=100", f"/posts/{post_id}", f"/posts/{post_id}?comments=all", f"/posts/{post_id}/comments",
+        f"/authors/{me['id']}/posts/",
+        "/groups/", f"/groups/{group_id}/details",
+    ]
+    different = []
+    for path in paths:
+        bodies = []
+        for fast in (False, True):
+            serializers.FAST_SERIALIZATION = fast
+            response = client.get(path, headers=headers)
+            bodies.append((response.content, response.headers.get("x-next-cursor")))
+        if bodies[0] != bodies[1]:
+            different.append(path)
+    return different
+
+
+def run(args) -> int:
+    seed(args.posts, args.comments)
+    client = TestClient(app)
+    token = client.post("/login/", json={"username": "autor0", "password": "senha"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    different = check_same_json(client, headers)
+    if different:
+        print("JSON diferente entre os modos em: " + ", ".join(different))
+        return 1
+
+    posts, latest = load_feed(client.get("/users/me/", headers=headers).json()["id"])
+    results = {
+        "posts": len(posts),
+        "comments_per_post": args.comments,
+        "serialization_ms": {
+            "default": round(cpu_per_call(lambda: default_serialization(posts, latest), args.iterations), 3),
+            "fast": round(cpu_per_call(lambda: fast_serialization(posts, latest), args.iterations), 3),
+        },
+        "route_cpu_ms": {},
+    }
+    for fast in (False, True):
+        serializers.FAST_SERIALIZATION = fast
+        results["route_cpu_ms"]["fast" if fast else "default"] = round(
+            cpu_per_call(lambda: client.get("/posts/?limit=100", headers=headers), max(1, args.iterations // 4)), 3)
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--posts", type=int, default=100)
+    parser.add_argument("--comments", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=200)
+    return run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
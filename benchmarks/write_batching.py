@@ -0,0 +1,140 @@
+"""
+Benchmark: escritas por segundo e latência de POST /posts/ e
+POST /posts/{id}/comments/ com e sem a escrita agrupada (write_batch).
+
+Roda a API em processo (httpx + ASGITransport: as rotas síncronas no
+threadpool, como num worker do uvicorn) contra um banco SQLite temporário.
+Para cada nível de `--concurrency`, N clientes alternam posts e comentários
+durante `--duration` segundos, primeiro com um commit por requisição e depois
+com WRITE_BATCH_ENABLED. Relata escritas/s, latência (p50, p99) e o tamanho
+médio dos lotes.
+
+    python -m benchmarks.write_batching --concurrency 1,16,64 --duration 5
+
+O SQLite usa o perfil de produção (WAL, synchronous=NORMAL). Para o custo de
+um fsync por commit, rode com SQLITE_SYNCHRONOUS=FULL.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/write_batching.db"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+# Com muitos clientes a fila de admissão recusaria requisições em vez de medi-las.
+os.environ.setdefault("ADMISSION_ENABLED", "false")
+
+import httpx  # noqa: E402
+
+from src import auth, database, membership, migrations, models, write_batch  # noqa: E402
+from src.database import SessionLocal  # noqa: E402
+from src.main import app  # noqa: E402
+
+
+def seed(authors: int) -> tuple:
+    """Autores (direto no banco, sem medir o bcrypt), um grupo com todos e um post para os comentários."""
+    migrations.upgrade()
+    password = auth.hash_password("senha")
+    with SessionLocal() as db:
+        users = [models.Author(username=f"autor{i}", email=f"autor{i}@example.com", password=password) for i in range(authors)]
+        db.add_all(users)
+        db.flush()
+        group = models.Group(name="Benchmark", description="Grupo do benchmark", creator_id=users[0].id)
+        db.add(group)
+        db.flush()
+        membership.add_members(db, group.id, [user.id for user in users])
+        post = models.Post(title="Thread", text="Post dos comentários", author_id=users[0].id, group_id=group.id)
+        db.add(post)
+        db.commit()
+        headers = [{"Authorization": f"Bearer {auth.create_token({'sub': user.username, 'uid': user.id})}"} for user in users]
+        return headers, group.id, post.id
+
+
+def percentile(ordered: list, pct: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def writer(client, headers, group_id, post_id, deadline, latencies, errors):
+    index = 0
+    while time.perf_counter() < deadline:
+        index += 1
+        started = time.perf_counter()
+        if index % 2:
+            response = await client.post("/posts/", json={"title": "Post", "text": "Texto", "group_id": group_id}, headers=headers)
+        else:
+            response = await client.post(f"/posts/{post_id}/comments/", json={"title": "Comentário", "text": "Texto"}, headers=headers)
+        if response.status_code != 201:
+            errors.append(response.status_code)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+async def measure(client, users, group_id, post_id, concurrency: int, duration: float, batched: bool) -> dict:
+    write_batch.WRITE_BATCH_ENABLED = batched
+    before = write_batch.committer.stats()
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        writer(client, users[i % len(users)], group_id, post_id, deadline, latencies, errors)
+        for i in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - started
+    after = write_batch.committer.stats()
+    ordered = sorted(latencies)
+    result = {
+        "writes": len(latencies),
+        "errors": len(errors),
+        "writes_per_s": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "mean": round(statistics.fmean(ordered) * 1000, 2),
+            "p50": round(percentile(ordered, 50) * 1000, 2),
+            "p99": round(percentile(ordered, 99) * 1000, 2),
+        } if ordered else {},
+    }
+    if batched:
+        batches = after["batches"] - before["batches"]
+        result["avg_batch"] = round((after["items"] - before["items"]) / batches, 2) if batches else 0.0
+    return result
+
+
+async def run(args) -> dict:
+    users, group_id, post_id = seed(max(args.concurrency))
+    transport = httpx.ASGITransport(app=app)
+    results = []
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            # Principals em cache antes de medir: o que se mede é a escrita, não a autenticação.
+            for headers in users:
+                (await client.get("/users/me/", headers=headers)).raise_for_status()
+            for concurrency in args.concurrency:
+                row = {"concurrency": concurrency}
+                for name, batched in (("per_request", False), ("batched", True)):
+                    row[name] = await measure(client, users, group_id, post_id, concurrency, args.duration, batched)
+                results.append(row)
+    return {
+        "duration_s": args.duration,
+        "sqlite_synchronous": database.SQLITE_PRAGMAS["synchronous"],
+        "max_items": write_batch.committer.max_items,
+        "max_delay_ms": write_batch.committer.max_delay * 1000,
+        "results": results,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", type=lambda value: [int(n) for n in value.split(",")], default=[1, 16, 64])
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,18 @@
+// src/api/events.js
+import api from './api';
+
+// Abre o stream de eventos ao vivo (/events) e chama handlers[tipo](dados).
+// O EventSource reconecta sozinho enviando Last-Event-ID; o evento 'reset'
+// avisa que eventos se perderam e os dados da página devem ser recarregados.
+// Retorna a função que fecha a conexão.
+export const subscribeToEvents = (handlers) => {
+  const token = localStorage.getItem('token');
+  if (!token || typeof EventSource === 'undefined') {
+    return () => {};
+  }
+  const source = new EventSource(`${api.defaults.baseURL}/events?token=${encodeURIComponent(token)}`);
+  Object.entries(handlers).forEach(([type, handler]) => {
+    source.addEventListener(type, (event) => handler(JSON.parse(event.data)));
+  });
+  return () => source.close();
+};
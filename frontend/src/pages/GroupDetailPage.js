@@ -2,6 +2,7 @@
 import React, { useState, useEffect, useCallback } from 'react';
 import { useParams, Link, useNavigate } from 'react-router-dom';
 import api from '../api/api';
+import { subscribeToEvents } from '../api/events';
 import { useAuth } from '../context/AuthContext';
 
 const GroupDetailPage = () => {
@@ -15,6 +16,19 @@ const GroupDetailPage = () => {
   const [error, setError] = useState('');
   const [isMember, setIsMember] = useState(false);
   const [isCreator, setIsCreator] = useState(false);
+  // Membros vêm paginados de /groups/{id}/members
+  const [members, setMembers] = useState([]);
+  const [membersCursor, setMembersCursor] = useState(null);
+
+  const fetchMembers = useCallback(async (after = null) => {
+    try {
+      const response = await api.get(`/groups/${groupId}/members`, { params: after ? { after } : {} });
+      setMembers(current => (after ? [...current, ...response.data] : response.data));
+      setMembersCursor(response.headers['x-next-cursor'] || null);
+    } catch (err) {
+      console.error("Erro em fetchMembers:", err);
+    }
+  }, [groupId]);
 
   const fetchGroupDetails = useCallback(() => {
     setLoading(true);
@@ -25,12 +39,8 @@ const GroupDetailPage = () => {
         setGroup(groupData);
 
         if (isAuthenticated && user) {
-          if (groupData.members && Array.isArray(groupData.members)) {
-            const memberCheck = groupData.members.some(member => member.id === user.id);
-            setIsMember(memberCheck);
-          } else {
-            setIsMember(false);
-          }
+          const memberCheck = (user.groups || []).some(userGroup => userGroup.id === groupData.id);
+          setIsMember(memberCheck);
           if (groupData.creator && groupData.creator.id === user.id) {
             setIsCreator(true);
           } else {
@@ -53,7 +63,21 @@ const GroupDetailPage = () => {
 
   useEffect(() => {
     fetchGroupDetails();
-  }, [fetchGroupDetails]);
+    fetchMembers();
+  }, [fetchGroupDetails, fetchMembers]);
+
+  // Se o criador excluir o fórum enquanto um membro está com a página aberta, volta para a lista.
+  useEffect(() => {
+    if (!isAuthenticated) return undefined;
+    return subscribeToEvents({
+      'group.deleted': async (data) => {
+        if (isCreator || String(data.id) !== String(groupId)) return;
+        alert('Este fórum foi excluído.');
+        await refreshUser();
+        navigate('/');
+      },
+    });
+  }, [isAuthenticated, isCreator, groupId]);
 
   const handleJoinGroup = async () => {
     if (!group) return;
@@ -63,6 +87,7 @@ const GroupDetailPage = () => {
       // >>> ATUALIZA O USUÁRIO GLOBAL <<<
       await refreshUser();
       fetchGroupDetails();
+      fetchMembers();
     } catch (err) {
       const errorMessage = err.response?.data?.detail || "Erro ao tentar entrar no fórum.";
       alert(errorMessage);
@@ -78,6 +103,7 @@ const GroupDetailPage = () => {
       // >>> ATUALIZA O USUÁRIO GLOBAL <<<
       await refreshUser();
       fetchGroupDetails();
+      fetchMembers();
     } catch (err) {
       const errorMessage = err.response?.data?.detail || "Erro ao tentar sair do fórum.";
       alert(errorMessage);
@@ -227,15 +253,20 @@ const GroupDetailPage = () => {
         </div>
 
         <div style={styles.column}>
-          <h2 style={styles.columnTitle}>Membros ({group.members?.length || 0})</h2>
+          <h2 style={styles.columnTitle}>Membros ({group.member_count || 0})</h2>
           <ul style={styles.memberList}>
-            {group.members && group.members.map(member => (
+            {members.map(member => (
               <li key={member.id} style={styles.memberItem}>
                 <div style={styles.memberAvatar}>{member.username.charAt(0).toUpperCase()}</div>
                 <span>{member.username}{group.creator && group.creator.id === member.id ? ' (Criador)' : ''}</span>
               </li>
             ))}
           </ul>
+          {membersCursor && (
+            <button onClick={() => fetchMembers(membersCursor)} style={{ ...styles.actionButton, marginTop: '10px', backgroundColor: '#e5e7eb', color: '#111827' }}>
+              Ver mais membros
+            </button>
+          )}
 
           <div style={{ marginTop: '30px' }}>
             {!isAuthenticated && (
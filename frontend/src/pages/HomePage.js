@@ -7,6 +7,8 @@ const HomePage = () => {
   const [groups, setGroups] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  // Cursor da próxima página de fóruns (cabeçalho X-Next-Cursor)
+  const [nextCursor, setNextCursor] = useState(null);
 
   useEffect(() => {
     // Busca a lista de todos os grupos da API quando o componente é montado.
@@ -14,6 +16,7 @@ const HomePage = () => {
     api.get('/groups/')
       .then(response => {
         setGroups(response.data);
+        setNextCursor(response.headers['x-next-cursor'] || null);
       })
       .catch(err => {
         console.error("Erro ao buscar grupos:", err);
@@ -24,6 +27,17 @@ const HomePage = () => {
       });
   }, []); // O array vazio [] garante que isso rode apenas uma vez.
 
+  const loadMoreGroups = () => {
+    api.get('/groups/', { params: { after: nextCursor } })
+      .then(response => {
+        setGroups(current => [...current, ...response.data]);
+        setNextCursor(response.headers['x-next-cursor'] || null);
+      })
+      .catch(err => {
+        console.error("Erro ao buscar mais grupos:", err);
+      });
+  };
+
   // --- Estilos para os cartões dos grupos ---
   const styles = {
     container: {
@@ -116,6 +130,10 @@ const HomePage = () => {
           <p>Nenhum fórum foi criado ainda. Seja o primeiro! (após fazer login)</p>
         )}
       </div>
+
+      {nextCursor && (
+        <button onClick={loadMoreGroups} style={{ marginTop: '30px' }}>Carregar mais fóruns</button>
+      )}
     </div>
   );
 };
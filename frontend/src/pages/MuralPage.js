@@ -2,6 +2,7 @@
 
 import React, { useState, useEffect } from 'react';
 import api from '../api/api';
+import { subscribeToEvents } from '../api/events';
 import { Link } from 'react-router-dom';
 import { useAuth } from '../context/AuthContext';
 import editIcon from '../edit.png'; // Certifique-se que este ícone existe na pasta src
@@ -11,6 +12,9 @@ const MuralPage = () => {
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState('');
     const [commentText, setCommentText] = useState({});
+    // Cursor da próxima página do feed (vem no cabeçalho X-Next-Cursor)
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const { user } = useAuth();
 
     // >>> A ÚNICA ALTERAÇÃO LÓGICA ESTÁ AQUI DENTRO <<<
@@ -45,6 +49,7 @@ const MuralPage = () => {
             });
             
             setGroupedPosts(initialGroups);
+            setNextCursor(response.headers['x-next-cursor'] || null);
         } catch (err) {
             console.error("Erro ao carregar o feed:", err);
             setError('Não foi possível carregar o seu feed.');
@@ -53,6 +58,30 @@ const MuralPage = () => {
         }
     };
 
+    // Busca a próxima página do feed e acrescenta aos grupos já carregados
+    const loadMorePosts = async () => {
+        if (!nextCursor) return;
+        setLoadingMore(true);
+        try {
+            const response = await api.get('/posts/', { params: { before: nextCursor } });
+            setGroupedPosts(currentGroups => {
+                const newGroups = { ...currentGroups };
+                response.data.forEach(post => {
+                    const group = newGroups[post.group?.id];
+                    if (group) {
+                        newGroups[post.group.id] = { ...group, posts: [...group.posts, post] };
+                    }
+                });
+                return newGroups;
+            });
+            setNextCursor(response.headers['x-next-cursor'] || null);
+        } catch (err) {
+            alert('Erro ao carregar mais posts.');
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     // O resto das suas funções permanece exatamente igual
     useEffect(() => {
         if (user) {
@@ -62,13 +91,69 @@ const MuralPage = () => {
         }
     }, [user]);
 
+    // --- Atualizações locais (usadas pelas respostas da API e pelos eventos ao vivo) ---
+    // Todas são idempotentes: o mesmo post/comentário pode chegar pela resposta e pelo evento.
+    const updateAllPosts = (change) => {
+        setGroupedPosts(currentGroups => {
+            const newGroups = {};
+            Object.entries(currentGroups).forEach(([groupId, group]) => {
+                newGroups[groupId] = { ...group, posts: change(group.posts) };
+            });
+            return newGroups;
+        });
+    };
+
+    const addPost = (post) => {
+        setGroupedPosts(currentGroups => {
+            const group = currentGroups[post.group?.id];
+            if (!group || group.posts.some(p => p.id === post.id)) return currentGroups;
+            const newPost = { comments: [], comment_count: 0, ...post };
+            return { ...currentGroups, [post.group.id]: { ...group, posts: [newPost, ...group.posts] } };
+        });
+    };
+
+    const patchPost = (changes) => {
+        updateAllPosts(posts => posts.map(p => (p.id === changes.id ? { ...p, ...changes } : p)));
+    };
+
+    const removePost = (postId) => {
+        updateAllPosts(posts => posts.filter(p => p.id !== postId));
+    };
+
+    const addComment = (comment) => {
+        updateAllPosts(posts => posts.map(p => {
+            if (p.id !== comment.post_id || p.comments.some(c => c.id === comment.id)) return p;
+            return { ...p, comments: [...p.comments, comment], comment_count: (p.comment_count || p.comments.length) + 1 };
+        }));
+    };
+
+    const removeComment = (commentId) => {
+        updateAllPosts(posts => posts.map(p => {
+            if (!p.comments.some(c => c.id === commentId)) return p;
+            return { ...p, comments: p.comments.filter(c => c.id !== commentId), comment_count: Math.max(0, (p.comment_count || p.comments.length) - 1) };
+        }));
+    };
+
+    // Eventos ao vivo dos grupos do usuário: substituem o recarregamento do feed inteiro.
+    useEffect(() => {
+        if (!user) return undefined;
+        return subscribeToEvents({
+            'post.created': addPost,
+            'post.updated': patchPost,
+            'post.deleted': data => removePost(data.id),
+            'comment.created': addComment,
+            'comment.deleted': data => removeComment(data.id),
+            'reset': () => fetchAndGroupPosts(),
+        });
+    }, [user]);
+
     const handleCommentSubmit = async (e, postId) => {
         e.preventDefault();
         if (!commentText[postId]?.trim()) return;
         try {
-            await api.post(`/posts/${postId}/comments/`, { title: "Comentário", text: commentText[postId] });
+            const response = await api.post(`/posts/${postId}/comments/`, { title: "Comentário", text: commentText[postId] });
             setCommentText(prev => ({ ...prev, [postId]: '' }));
-            fetchAndGroupPosts();
+            addComment(response.data);
         } catch (err) { alert('Erro ao enviar comentário.'); }
     };
 
@@ -76,7 +161,7 @@ const MuralPage = () => {
         if (window.confirm('Tem certeza que deseja excluir este post?')) {
             try {
                 await api.delete(`/posts/${postId}`);
-                fetchAndGroupPosts();
+                removePost(postId);
             } catch (err) { alert('Erro ao excluir o post.'); }
         }
     };
@@ -85,7 +170,7 @@ const MuralPage = () => {
         if (window.confirm('Tem certeza que deseja excluir este comentário?')) {
             try {
                 await api.delete(`/comments/${commentId}`);
-                fetchAndGroupPosts();
+                removeComment(commentId);
             } catch (err) { alert('Erro ao excluir o comentário.'); }
         }
     };
@@ -218,7 +303,9 @@ const MuralPage = () => {
                                             </div>
                                             {post.comments.length > 0 && (
                                                 <div style={{ backgroundColor: '#f9fafb', borderTop: '1px solid #e5e7eb', padding: '20px' }}>
-                                                    <h4 style={{ marginTop: 0, marginBottom: '15px', color: '#4b5563' }}>Comentários</h4>
+                                                    <h4 style={{ marginTop: 0, marginBottom: '15px', color: '#4b5563' }}>
+                                                        Comentários{post.comment_count > post.comments.length ? ` (últimos ${post.comments.length} de ${post.comment_count})` : ''}
+                                                    </h4>
                                                     {post.comments.map(comment => (
                                                         <div key={comment.id} style={{ borderLeft: '3px solid #d1d5db', paddingLeft: '15px', marginBottom: '15px' }}>
                                                             <div style={{ display: 'flex', justifyContent: 'space-between', alignItems: 'flex-start', gap: '10px' }}>
@@ -285,6 +372,14 @@ const MuralPage = () => {
                     </Link>
                 </div>
             )}
+
+            {nextCursor && (
+                <div style={{ textAlign: 'center', marginBottom: '40px' }}>
+                    <button onClick={loadMorePosts} disabled={loadingMore} style={{ ...headerButtonStyle, backgroundColor: '#3b82f6', color: 'white', border: 'none' }}>
+                        {loadingMore ? 'Carregando...' : 'Carregar mais'}
+                    </button>
+                </div>
+            )}
         </div>
     );
 };
@@ -1,35 +1,127 @@
-import uvicorn
+"""
+Inicia a API.
+
+    python run.py            # desenvolvimento: um processo com reload, em 127.0.0.1
+    python run.py --prod     # produção: vários workers (ou APP_ENV=production)
+
+No modo de produção o processo mestre aplica as migrações uma única vez e só
+então sobe os workers do uvicorn, que iniciam com MIGRATE_ON_STARTUP=false. O
+uvicorn usa uvloop e httptools quando estão instalados. Configuração (variável
+de ambiente ou opção de linha de comando):
+
+- HOST / --host                  padrão 0.0.0.0
+- PORT / --port                  padrão 8000
+- WEB_CONCURRENCY / --workers    padrão: um por núcleo
+- MAX_REQUESTS / --max-requests  recicla o worker depois de N requisições (0 desliga)
+- MAX_REQUESTS_JITTER            variação aleatória de MAX_REQUESTS, para os
+                                 workers não reciclarem todos ao mesmo tempo
+- GRACEFUL_TIMEOUT               segundos para terminar as requisições em
+                                 andamento depois do SIGTERM
+
+No SIGTERM o mestre repassa o sinal aos workers, que param de aceitar conexões
+e terminam as requisições em andamento. Conexões de /events (SSE) só terminam
+no GRACEFUL_TIMEOUT; o navegador reconecta com Last-Event-ID.
+
+Com mais de um worker, caches, eventos e limites de taxa precisam de um backend
+compartilhado (PRINCIPAL_CACHE_URL, HTTP_CACHE_URL, HOT_POSTS_CACHE_URL,
+EVENTS_BROKER_URL e RATE_LIMIT_URL apontando para o Redis); sem isso cada
+worker enxerga só as próprias invalidações. Os caches de respostas que outro
+worker não teria como invalidar (cache HTTP e posts quentes) são desligados
+nos workers quando falta o backend deles.
+"""
+import argparse
+import inspect
 import os
 import sys
 
-if __name__ == "__main__":
-    project_root = os.path.dirname(os.path.abspath(__file__))
-    
-    if project_root not in sys.path:
-        sys.path.insert(0, project_root)
-
-    
-    src_path_check = os.path.join(project_root, "src")
-    if not os.path.isdir(src_path_check):
-        print(f"ERRO: Diretório 'src' não encontrado em '{project_root}'")
-        sys.exit(1)
-    if not os.path.exists(os.path.join(src_path_check, "__init__.py")):
-        print(f"ERRO: Arquivo '__init__.py' não encontrado em '{src_path_check}'")
-       
+import uvicorn
 
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+SHARED_BACKENDS = (
+    "PRINCIPAL_CACHE_URL", "HTTP_CACHE_URL", "HOT_POSTS_CACHE_URL", "EVENTS_BROKER_URL", "RATE_LIMIT_URL",
+)
+# Sem o backend compartilhado, estes caches serviriam corpos velhos depois de
+# uma escrita feita em outro worker: com vários workers ficam desligados.
+LOCAL_ONLY_CACHES = {"HTTP_CACHE_URL": "HTTP_CACHE_ENABLED", "HOT_POSTS_CACHE_URL": "HOT_POSTS_ENABLED"}
 
-    print(f"--- Iniciando Uvicorn a partir de run.py ---")
-    print(f"--- Raiz do Projeto (para app_dir e PYTHONPATH): {project_root} ---")
-    print(f"--- sys.path atual ---")
-    for p_idx, p_val in enumerate(sys.path):
-        print(f"{p_idx}: {p_val}")
-    print(f"--- Fim sys.path atual ---")
 
+def run_dev(args) -> None:
     uvicorn.run(
-        "src.main:app",  
-        host="127.0.0.1",
-        port=8000,
+        "src.main:app",
+        host=args.host or "127.0.0.1",
+        port=args.port,
         reload=True,
-        reload_dirs=[os.path.join(project_root, "src")], 
-        app_dir=project_root 
-    )
\ No newline at end of file
+        reload_dirs=[os.path.join(PROJECT_ROOT, "src")],
+        app_dir=PROJECT_ROOT,
+    )
+
+def migrate() -> None:
+    """Aplica as migrações no mestre, antes de existir qualquer worker."""
+    from src import database, migrations
+
+    applied = migrations.upgrade()
+    print(f"--- Migrações aplicadas: {', '.join(applied) or 'nenhuma pendente'} ---")
+    # Os workers são processos novos (spawn) e abrem as próprias conexões.
+    database.engine.dispose()
+    database.read_engine.dispose()
+
+def run_prod(args) -> None:
+    migrate()
+    os.environ["MIGRATE_ON_STARTUP"] = "false"
+
+    missing = [name for name in SHARED_BACKENDS if not os.getenv(name)]
+    if args.workers > 1 and missing:
+        print(f"AVISO: {args.workers} workers sem backend compartilhado em {', '.join(missing)}; "
+              "caches, eventos e limites de taxa ficam restritos a cada worker.", file=sys.stderr)
+        for url, flag in LOCAL_ONLY_CACHES.items():
+            if url in missing:
+                # Os workers herdam o ambiente do mestre.
+                os.environ[flag] = "false"
+                print(f"AVISO: {flag}=false nos workers (falta {url}).", file=sys.stderr)
+
+    options = {}
+    if args.max_requests:
+        options["limit_max_requests"] = args.max_requests
+        # O jitter só existe nas versões mais novas do uvicorn.
+        if "limit_max_requests_jitter" in inspect.signature(uvicorn.Config).parameters:
+            options["limit_max_requests_jitter"] = args.max_requests_jitter
+    uvicorn.run(
+        "src.main:app",
+        host=args.host or "0.0.0.0",
+        port=args.port,
+        workers=args.workers,
+        app_dir=PROJECT_ROOT,
+        loop="auto",
+        http="auto",
+        timeout_graceful_shutdown=args.graceful_timeout,
+        proxy_headers=True,
+        forwarded_allow_ips=os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        access_log=os.getenv("ACCESS_LOG", "false").lower() in ("1", "true", "yes"),
+        **options,
+    )
+
+
+def main() -> None:
+    if not os.path.isdir(os.path.join(PROJECT_ROOT, "src")):
+        print(f"ERRO: Diretório 'src' não encontrado em '{PROJECT_ROOT}'")
+        sys.exit(1)
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prod", action="store_true", default=os.getenv("APP_ENV") == "production")
+    parser.add_argument("--host", default=os.getenv("HOST"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))))
+    parser.add_argument("--max-requests", type=int, default=int(os.getenv("MAX_REQUESTS", "10000")))
+    parser.add_argument("--max-requests-jitter", type=int, default=int(os.getenv("MAX_REQUESTS_JITTER", "1000")))
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("GRACEFUL_TIMEOUT", "30")))
+    args = parser.parse_args()
+    if args.prod:
+        run_prod(args)
+    else:
+        run_dev(args)
+
+
+if __name__ == "__main__":
+    main()
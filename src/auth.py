@@ -1,16 +1,28 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import secrets
+import threading
+import time
 import jwt
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 import bcrypt
 from fastapi import HTTPException, Security, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session, selectinload # <<< PASSO 1: Importar selectinload
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
 import os
-from typing import Optional
+from typing import Dict, FrozenSet, Optional, Tuple
 from dotenv import load_dotenv
 from pathlib import Path
 
 from . import models
 from . import dependencies
+from . import cache
+from . import read_models
 
 # --- Configurações de Ambiente ---
 current_dir = Path(__file__).resolve().parent
@@ -22,73 +34,361 @@ if env_file_path.exists():
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 
+def _parse_keys(value: str) -> Dict[str, str]:
+    keys = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        kid, separator, secret = item.partition(":")
+        if not separator or not kid or not secret:
+            raise ValueError("JWT_KEYS deve ter o formato 'kid:segredo,kid:segredo'.")
+        keys[kid] = secret
+    return keys
+
+# Rotação de chaves: JWT_KEYS="2025b:segredo-novo,2025a:segredo-antigo". A primeira
+# (ou JWT_ACTIVE_KID) assina os tokens novos, com o `kid` no cabeçalho; todas continuam
+# valendo para verificar, até os tokens da chave antiga expirarem e ela ser retirada.
+# Tokens sem `kid`, emitidos antes da rotação, são verificados com a SECRET_KEY.
+JWT_KEYS = _parse_keys(os.getenv("JWT_KEYS", ""))
+JWT_ACTIVE_KID = os.getenv("JWT_ACTIVE_KID") or next(iter(JWT_KEYS), None)
+# Tokens já verificados, por digest, até expirarem: a repetição não refaz o HMAC.
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+# Intervalo (s) em que cada processo relê a tabela de tokens revogados.
+REVOCATION_REFRESH = float(os.getenv("REVOCATION_REFRESH", "5"))
+
 ACCESS_TOKEN_EXPIRE_HOURS_STR = os.getenv("ACCESS_TOKEN_EXPIRE_HOURS", "2")
 try:
     ACCESS_TOKEN_EXPIRE_HOURS = int(ACCESS_TOKEN_EXPIRE_HOURS_STR)
 except ValueError:
     ACCESS_TOKEN_EXPIRE_HOURS = 2
 
-if not SECRET_KEY:
+# Custo do bcrypt (log2 das iterações). Hashes com custo diferente são refeitos no login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Processos dedicados ao bcrypt e quantas operações podem esperar por eles antes de recusar.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 8)))
+PASSWORD_HASH_RETRY_AFTER = os.getenv("PASSWORD_HASH_RETRY_AFTER", "1")
+
+# Cache do usuário autenticado (principal). PRINCIPAL_CACHE_URL vazio = cache local
+# do processo; 'redis://...' compartilha entre workers; 'memory://' é o fake de testes.
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_URL = os.getenv("PRINCIPAL_CACHE_URL")
+
+if not SECRET_KEY and not JWT_KEYS:
     raise ValueError("Nenhuma SECRET_KEY configurada. A aplicação não pode iniciar de forma segura.")
+if JWT_ACTIVE_KID is not None and JWT_ACTIVE_KID not in JWT_KEYS:
+    raise ValueError(f"JWT_ACTIVE_KID '{JWT_ACTIVE_KID}' não está em JWT_KEYS.")
 
 
 # --- Configuração de Segurança ---
 oauth2_scheme = HTTPBearer()
+optional_oauth2_scheme = HTTPBearer(auto_error=False)
 
 
 # --- Funções de Token ---
+@dataclass(frozen=True)
+class TokenClaims:
+    username: str
+    author_id: Optional[int]  # ausente em tokens emitidos antes do claim `uid`
+    membership_version: int
+    jti: Optional[str]
+    expires_at: float  # epoch
+
 def create_token(data: dict, expires_delta: Optional[timedelta] = None):
+    """`data` traz `sub` (username) e, no login, `uid` (id do autor) e `mv` (Author.membership_version)."""
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS)
-    to_encode.update({"exp": expire})
-    token = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return token
+    to_encode.update({"exp": expire, "jti": secrets.token_urlsafe(12)})
+    if JWT_ACTIVE_KID is not None:
+        return jwt.encode(to_encode, JWT_KEYS[JWT_ACTIVE_KID], algorithm=ALGORITHM, headers={"kid": JWT_ACTIVE_KID})
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def verify_token(token: str, credentials_exception: HTTPException) -> str:
+def _signing_key(token: str) -> str:
+    kid = jwt.get_unverified_header(token).get("kid")
+    if kid is None and SECRET_KEY:
+        return SECRET_KEY
+    if kid not in JWT_KEYS:
+        raise jwt.InvalidTokenError("kid desconhecido")
+    return JWT_KEYS[kid]
+
+_verified_tokens = cache.LocalBackend(max_items=TOKEN_CACHE_SIZE)
+
+def decode_token(token: str) -> TokenClaims:
+    """
+    Confere assinatura e expiração. O resultado fica em cache pelo digest do
+    token até o `exp`, então só a primeira chamada paga o HMAC e o parse.
+    Levanta jwt.InvalidTokenError (ou ExpiredSignatureError).
+    """
+    digest = hashlib.sha256(token.encode()).digest()
+    claims = _verified_tokens.get(digest)
+    if claims is not None:
+        return claims
+    payload = jwt.decode(token, _signing_key(token), algorithms=[ALGORITHM])
+    username = payload.get("sub")
+    if username is None:
+        raise jwt.InvalidTokenError("Token sem sub")
+    claims = TokenClaims(
+        username=username, author_id=payload.get("uid"), membership_version=payload.get("mv", 0),
+        jti=payload.get("jti"), expires_at=payload["exp"],
+    )
+    ttl = claims.expires_at - time.time()
+    if ttl > 0:
+        _verified_tokens.set(digest, claims, ttl=ttl)
+    return claims
+
+def verify_claims(token: str, credentials_exception: HTTPException) -> TokenClaims:
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: Optional[str] = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        return username
+        claims = decode_token(token)
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expirado, faça login novamente", headers={"WWW-Authenticate": "Bearer"})
-    except jwt.InvalidTokenError:
+    except (jwt.InvalidTokenError, KeyError):
         raise credentials_exception
+    if claims.jti is not None and revocations.is_revoked(claims.jti):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revogado, faça login novamente", headers={"WWW-Authenticate": "Bearer"})
+    return claims
+
+def verify_token(token: str, credentials_exception: HTTPException) -> str:
+    return verify_claims(token, credentials_exception).username
+
+
+# --- Tokens Revogados ---
+def _utc_naive(epoch: float) -> datetime:
+    return datetime.fromtimestamp(epoch, timezone.utc).replace(tzinfo=None)
+
+class RevocationList:
+    """
+    `jti` revogados e ainda não expirados, num dict em memória: a consulta por
+    requisição é O(1). Cada processo relê a tabela `revoked_tokens` a cada
+    REVOCATION_REFRESH segundos, então uma revogação feita em outro worker vale
+    em todos depois de no máximo esse intervalo; no próprio worker, na hora.
+    """
+
+    def __init__(self):
+        self._expires_at: Dict[str, float] = {}
+        self._loaded_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def is_revoked(self, jti: str) -> bool:
+        return jti in self._expires_at
+
+    def refresh(self, db: Session, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._loaded_at < REVOCATION_REFRESH:
+            return
+        self._loaded_at = now
+        rows = db.execute(
+            select(models.RevokedToken.jti, models.RevokedToken.expires_at)
+            .where(models.RevokedToken.expires_at > _utc_naive(time.time()))
+        )
+        loaded = {jti: expires_at.replace(tzinfo=timezone.utc).timestamp() for jti, expires_at in rows}
+        with self._lock:
+            # Troca o dict inteiro: quem lê sem o lock vê o antigo ou o novo, nunca um parcial.
+            self._expires_at = loaded
+
+    def revoke(self, db: Session, claims: TokenClaims) -> None:
+        """Grava a revogação na transação de `db` (o commit é de quem chama) e limpa as expiradas."""
+        if claims.jti is None:
+            return
+        db.execute(delete(models.RevokedToken).where(models.RevokedToken.expires_at <= _utc_naive(time.time())))
+        db.merge(models.RevokedToken(jti=claims.jti, expires_at=_utc_naive(claims.expires_at)))
+        with self._lock:
+            self._expires_at = {**self._expires_at, claims.jti: claims.expires_at}
+
+revocations = RevocationList()
+
+
+# --- Cache do Usuário Autenticado ---
+@dataclass(frozen=True)
+class GroupRef:
+    id: int
+    name: str
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    O usuário autenticado como as rotas o enxergam: dados básicos e os grupos
+    dos quais participa. Não é uma entidade ORM, então pode ficar em cache.
+    """
+    id: int
+    username: str
+    email: str
+    groups: Tuple[GroupRef, ...] = ()
+    membership_version: int = 0
+
+    @property
+    def group_ids(self) -> FrozenSet[int]:
+        return frozenset(group.id for group in self.groups)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id, "username": self.username, "email": self.email,
+            "groups": [[group.id, group.name] for group in self.groups],
+            "membership_version": self.membership_version,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Principal":
+        groups = tuple(GroupRef(id=group_id, name=name) for group_id, name in data["groups"])
+        return cls(
+            id=data["id"], username=data["username"], email=data["email"], groups=groups,
+            membership_version=data.get("membership_version", 0),
+        )
+
+principal_cache = cache.Cache(
+    "principal",
+    cache.backend_from_url(PRINCIPAL_CACHE_URL, max_items=PRINCIPAL_CACHE_SIZE),
+    ttl=PRINCIPAL_CACHE_TTL,
+    dumps=lambda principal: json.dumps(principal.to_dict()).encode(),
+    loads=lambda raw: Principal.from_dict(json.loads(raw)),
+)
+
+def invalidate_principals(*usernames: str) -> None:
+    """Deve ser chamada sempre que os grupos de um usuário mudarem."""
+    principal_cache.delete(*usernames)
 
 
 # --- Dependência Principal de Autenticação ---
-def get_current_active_user(
-    credentials: HTTPAuthorizationCredentials = Security(oauth2_scheme),
-    db: Session = Depends(dependencies.get_db)
-) -> models.Author:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Não foi possível validar as credenciais",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    username = verify_token(credentials.credentials, credentials_exception)
-    
-    # <<< PASSO 2: Modificar a query para forçar o carregamento da relação 'groups' >>>
-    user = db.query(models.Author).options(
-        selectinload(models.Author.groups)
-    ).filter(models.Author.username == username).first()
-    
+
+@dependencies.db_endpoint
+def get_current_active_user(
+    credentials: HTTPAuthorizationCredentials = Security(oauth2_scheme),
+    db: Session = Depends(dependencies.get_read_db)
+) -> Principal:
+    return _principal_for_token(db, credentials.credentials)
+
+def get_token_claims(credentials: HTTPAuthorizationCredentials = Security(oauth2_scheme)) -> TokenClaims:
+    """Só confere o token, sem carregar o usuário: vale também para contas em exclusão."""
+    return verify_claims(credentials.credentials, _credentials_exception())
+
+def get_token_username(claims: TokenClaims = Depends(get_token_claims)) -> str:
+    return claims.username
+
+@dependencies.db_endpoint
+def get_stream_user(
+    token: Optional[str] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Security(optional_oauth2_scheme),
+    db: Session = Depends(dependencies.get_read_db)
+) -> Principal:
+    """
+    Como get_current_active_user, mas também aceita `?token=`: o EventSource
+    do navegador não permite enviar o cabeçalho Authorization.
+    """
+    if credentials is not None:
+        token = credentials.credentials
+    if not token:
+        raise _credentials_exception()
+    return _principal_for_token(db, token)
+
+def _principal_for_token(db: Session, token: str) -> Principal:
+    revocations.refresh(db)
+    claims = verify_claims(token, _credentials_exception())
+    username = claims.username
+
+    principal = principal_cache.get(username)
+    # Um principal anterior à versão de grupos que o próprio token já conhece está velho
+    # (por exemplo, em cache num worker que não viu a invalidação).
+    if principal is not None and principal.membership_version >= claims.membership_version:
+        return principal
+
+    # Só as colunas públicas do autor e os grupos: o hash da senha não é carregado.
+    # Tokens com `uid` buscam pela chave primária; os antigos, pelo username.
+    if claims.author_id is not None:
+        lookup = models.Author.id == claims.author_id
+    else:
+        lookup = models.Author.username == username
+    user = db.execute(
+        select(*read_models.author_columns(), models.Author.membership_version)
+        .where(lookup, models.Author.deleted_at.is_(None))
+    ).first()
     if user is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuário associado ao token não encontrado")
-    return user
+    groups = db.execute(
+        select(models.Group.id, models.Group.name)
+        .join(models.group_membership_table, models.group_membership_table.c.group_id == models.Group.id)
+        .where(models.group_membership_table.c.author_id == user.id, models.Group.deleted_at.is_(None))
+    )
+    principal = Principal(
+        id=user.id, username=user.username, email=user.email,
+        groups=tuple(GroupRef(id=group_id, name=name) for group_id, name in groups),
+        membership_version=user.membership_version,
+    )
+    principal_cache.set(username, principal)
+    return principal
 
 
 # --- Funções de Senha ---
-def hash_password(password: str) -> str:
-    salt = bcrypt.gensalt()
+def hash_password(password: str, rounds: Optional[int] = None) -> str:
+    salt = bcrypt.gensalt(rounds=rounds or BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     if not hashed_password or not isinstance(hashed_password, str):
         return False
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
\ No newline at end of file
+    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Verdadeiro quando o hash foi gerado com um custo diferente de BCRYPT_ROUNDS."""
+    try:
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (AttributeError, IndexError, ValueError):
+        return False
+
+
+# --- Pool de Processos do bcrypt ---
+# O bcrypt consome centenas de ms de CPU. Rodá-lo em processos separados evita
+# que uma rajada de logins ocupe o threadpool do Starlette e trave as demais rotas.
+_hash_pool: Optional[ProcessPoolExecutor] = None
+_hash_pending = 0
+_hash_lock = threading.Lock()
+# O pool nasce no primeiro login, com o threadpool e as threads de fundo já
+# rodando: um fork copiaria locks presos por elas. O forkserver (ou spawn,
+# onde ele não existe) cria os processos a partir de um estado limpo. Em troca,
+# cada processo reimporta o script principal: scripts que usam o app direto
+# (TestClient, benchmarks) precisam do `if __name__ == "__main__"`.
+_HASH_POOL_CONTEXT = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+def _get_hash_pool() -> ProcessPoolExecutor:
+    global _hash_pool
+    with _hash_lock:
+        if _hash_pool is None:
+            _hash_pool = ProcessPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context(_HASH_POOL_CONTEXT))
+        return _hash_pool
+
+def shutdown_hash_pool() -> None:
+    global _hash_pool
+    with _hash_lock:
+        pool, _hash_pool = _hash_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+async def _run_in_hash_pool(func, *args):
+    global _hash_pending
+    with _hash_lock:
+        if _hash_pending >= PASSWORD_HASH_MAX_PENDING:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servidor ocupado, tente novamente em instantes",
+                headers={"Retry-After": PASSWORD_HASH_RETRY_AFTER},
+            )
+        _hash_pending += 1
+    try:
+        return await asyncio.wrap_future(_get_hash_pool().submit(func, *args))
+    finally:
+        with _hash_lock:
+            _hash_pending -= 1
+
+async def hash_password_async(password: str) -> str:
+    return await _run_in_hash_pool(hash_password, password, BCRYPT_ROUNDS)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_in_hash_pool(verify_password, plain_password, hashed_password)
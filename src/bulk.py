@@ -0,0 +1,211 @@
+"""
+Escritas em lote: posts, comentários e membros.
+
+Cada lote é validado com consultas por conjunto (uma para todos os grupos ou
+posts citados, não uma por item) e os itens válidos entram num único
+executemany, na mesma transação da rota. Itens inválidos não derrubam o lote:
+cada um recebe seu próprio resultado, com o status HTTP que a rota de um item
+só devolveria.
+
+As funções daqui não fazem commit. Elas devolvem um `BulkOutcome` com o que a
+rota precisa fazer depois dele (invalidar caches e publicar eventos).
+"""
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.orm import Session
+
+from . import membership, models, read_models, schemas, timeline
+
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "500"))
+
+
+@dataclass
+class BulkOutcome:
+    results: List[Optional[schemas.BulkItemResult]]
+    cache_keys: set = field(default_factory=set)
+    # (tipo, dados, argumentos de events.hub.publish)
+    events: List[Tuple[str, dict, dict]] = field(default_factory=list)
+    usernames: List[str] = field(default_factory=list)  # principals a invalidar
+    hot_posts: Dict[int, Set[int]] = field(default_factory=dict)  # grupo -> posts a reler em hot_posts
+    # índice -> o PostRead/CommentRead criado, a resposta da rota de um item (ver write_batch)
+    records: Dict[int, Union[schemas.PostRead, schemas.CommentRead]] = field(default_factory=dict)
+
+    def fail(self, index: int, status: int, detail: str) -> None:
+        self.results[index] = schemas.BulkItemResult(index=index, status=status, detail=detail)
+
+    def created(self, index: int, item_id: int) -> None:
+        self.results[index] = schemas.BulkItemResult(index=index, status=201, id=item_id)
+
+    def response(self) -> schemas.BulkResult:
+        created = sum(1 for result in self.results if result.status == 201)
+        return schemas.BulkResult(created=created, failed=len(self.results) - created, results=self.results)
+
+
+def _insert_returning_ids(db: Session, model, rows: List[dict]) -> List[int]:
+    """INSERT de várias linhas; os ids voltam na ordem de `rows`."""
+    if db.get_bind().dialect.name == "sqlite":
+        # Sem sentinela o SQLAlchemy faria um INSERT por linha para garantir a ordem.
+        # No SQLite cada linha recebe max(rowid) + 1 na ordem do VALUES (a
+        # conexão de escrita é única), então basta ordenar os ids devolvidos.
+        return sorted(db.execute(insert(model).returning(model.id), rows).scalars())
+    statement = insert(model).returning(model.id, sort_by_parameter_order=True)
+    return list(db.execute(statement, rows).scalars())
+
+def add_to_counts(db: Session, model, column: str, deltas: Dict[int, int]) -> None:
+    """Soma `deltas[id]` ao contador `column` de cada linha, num único executemany."""
+    table = model.__table__
+    statement = (
+        update(table)
+        .where(table.c.id == bindparam("row_key"))
+        .values({column: table.c[column] + bindparam("delta")})
+    )
+    db.execute(statement, [{"row_key": row_id, "delta": delta} for row_id, delta in deltas.items()])
+
+
+# --- Posts ---
+
+def create_posts(db: Session, author, items: List[schemas.PostCreate]) -> BulkOutcome:
+    """Posts de `author` (o Principal da rota), em qualquer grupo do qual ele participa."""
+    return create_posts_by_authors(db, [(author, item) for item in items])
+
+def create_posts_by_authors(db: Session, entries: List[Tuple[object, schemas.PostCreate]]) -> BulkOutcome:
+    """Como `create_posts`, com o autor de cada item (ver write_batch); as mesmas consultas para qualquer número de autores."""
+    outcome = BulkOutcome(results=[None] * len(entries))
+    rows = db.execute(
+        select(models.Group.id, models.Group.name, models.group_membership_table.c.author_id.label("member_id"))
+        .outerjoin(
+            models.group_membership_table,
+            membership.members_among_clause(models.Group.id, {author.id for author, _ in entries}),
+        )
+        .where(models.Group.id.in_({item.group_id for _, item in entries}), models.Group.deleted_at.is_(None))
+    )
+    groups, members = {}, set()
+    for row in rows:
+        groups[row.id] = row
+        members.add((row.member_id, row.id))
+
+    accepted = []
+    for index, (author, item) in enumerate(entries):
+        group = groups.get(item.group_id)
+        if group is None:
+            outcome.fail(index, 404, "Grupo não encontrado")
+        elif (author.id, group.id) not in members:
+            outcome.fail(index, 403, "Você não tem permissão para postar neste grupo")
+        else:
+            accepted.append(index)
+    if not accepted:
+        return outcome
+
+    post_ids = _insert_returning_ids(
+        db, models.Post, [{**entries[index][1].model_dump(), "author_id": entries[index][0].id} for index in accepted])
+    timeline.fan_out_posts(db, post_ids)
+    add_to_counts(db, models.Group, "post_count", Counter(entries[index][1].group_id for index in accepted))
+
+    for index, post_id in zip(accepted, post_ids):
+        author, item = entries[index]
+        group = groups[item.group_id]
+        outcome.created(index, post_id)
+        outcome.cache_keys.update((f"group:{group.id}", f"author_posts:{author.id}"))
+        outcome.hot_posts.setdefault(group.id, set()).add(post_id)
+        post = schemas.PostRead(
+            id=post_id, title=item.title, text=item.text, date=item.date,
+            author_id=author.id, author=author, group=schemas.GroupInDB(id=group.id, name=group.name),
+        )
+        outcome.records[index] = post
+        outcome.events.append(("post.created", post.model_dump(mode="json", exclude={"comments"}), {"group_id": group.id}))
+    return outcome
+
+
+# --- Comentários ---
+
+def create_comments(db: Session, author, items: List[schemas.BulkCommentCreate]) -> BulkOutcome:
+    """Comentários de `author` em posts de grupos dos quais ele participa."""
+    return create_comments_by_authors(db, [(author, item) for item in items])
+
+def create_comments_by_authors(db: Session, entries: List[Tuple[object, schemas.BulkCommentCreate]]) -> BulkOutcome:
+    """Como `create_comments`, com o autor de cada item."""
+    outcome = BulkOutcome(results=[None] * len(entries))
+    rows = db.execute(
+        select(
+            models.Post.id, models.Post.group_id, models.Post.author_id,
+            models.group_membership_table.c.author_id.label("member_id"),
+        )
+        .outerjoin(
+            models.group_membership_table,
+            membership.members_among_clause(models.Post.group_id, {author.id for author, _ in entries}),
+        )
+        .where(models.Post.id.in_({item.post_id for _, item in entries}), read_models.is_visible_post())
+    )
+    posts, members = {}, set()
+    for row in rows:
+        posts[row.id] = row
+        members.add((row.member_id, row.group_id))
+
+    accepted = []
+    for index, (author, item) in enumerate(entries):
+        post = posts.get(item.post_id)
+        if post is None:
+            outcome.fail(index, 404, "Post não encontrado para adicionar comentário")
+        elif (author.id, post.group_id) not in members:
+            outcome.fail(index, 403, "Você não pode comentar em posts de grupos dos quais não faz parte.")
+        else:
+            accepted.append(index)
+    if not accepted:
+        return outcome
+
+    comment_ids = _insert_returning_ids(
+        db, models.Comment, [{**entries[index][1].model_dump(), "commenter_id": entries[index][0].id} for index in accepted])
+    add_to_counts(db, models.Post, "comment_count", Counter(entries[index][1].post_id for index in accepted))
+
+    for index, comment_id in zip(accepted, comment_ids):
+        author, item = entries[index]
+        post = posts[item.post_id]
+        outcome.created(index, comment_id)
+        outcome.cache_keys.update((f"post:{post.id}", f"author_posts:{post.author_id}"))
+        outcome.hot_posts.setdefault(post.group_id, set()).add(post.id)
+        comment = schemas.CommentRead(
+            id=comment_id, title=item.title, text=item.text, date=item.date,
+            post_id=post.id, commenter_id=author.id, commenter=author,
+        )
+        outcome.records[index] = comment
+        outcome.events.append(("comment.created", comment.model_dump(mode="json"), {"group_id": post.group_id}))
+    return outcome
+
+
+# --- Membros ---
+
+def add_members(db: Session, group_id: int, usernames: List[str]) -> BulkOutcome:
+    """Adiciona autores existentes ao grupo. A permissão é conferida pela rota."""
+    outcome = BulkOutcome(results=[None] * len(usernames))
+    rows = db.execute(
+        select(models.Author.id, models.Author.username)
+        .where(models.Author.username.in_(set(usernames)), models.Author.deleted_at.is_(None))
+    )
+    author_ids = {username: author_id for author_id, username in rows}
+    already = membership.existing_members(db, group_id, author_ids.values())
+
+    accepted: Dict[int, int] = {}  # author_id -> index
+    for index, username in enumerate(usernames):
+        author_id = author_ids.get(username)
+        if author_id is None:
+            outcome.fail(index, 404, "Autor não encontrado")
+        elif author_id in already or author_id in accepted:
+            outcome.fail(index, 400, "O autor já é membro deste grupo")
+        else:
+            accepted[author_id] = index
+    if not accepted:
+        return outcome
+
+    membership.add_members(db, group_id, list(accepted))
+    timeline.add_group_for_authors(db, list(accepted), group_id)
+
+    outcome.cache_keys.update(("groups", f"group:{group_id}"))
+    for author_id, index in accepted.items():
+        outcome.created(index, author_id)
+        outcome.usernames.append(usernames[index])
+        outcome.events.append(("membership", {"group_id": group_id, "joined": True}, {"author_id": author_id}))
+    return outcome
@@ -0,0 +1,178 @@
+"""
+Caches em memória usados pela API.
+
+`LocalBackend` é um LRU com TTL dentro do processo. Quando a API roda com vários
+workers, um backend compartilhado (`redis://...`) mantém todos consistentes;
+`memory://` é um fake local do backend compartilhado, útil em testes, que
+serializa os valores exatamente como o Redis faria.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+
+class LocalBackend:
+    """LRU limitado por quantidade de itens, com expiração por item."""
+
+    shared = False
+
+    def __init__(self, max_items: int = 10000):
+        self.max_items = max_items
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self, prefix: str = "") -> None:
+        with self._lock:
+            if not prefix:
+                self._data.clear()
+                return
+            for key in [key for key in self._data if key.startswith(prefix)]:
+                del self._data[key]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class InMemorySharedBackend(LocalBackend):
+    """Fake do backend compartilhado: guarda bytes, sem limite de itens."""
+
+    shared = True
+
+    def __init__(self):
+        super().__init__(max_items=float("inf"))
+
+
+class RedisBackend:
+    """Backend compartilhado entre workers. Requer o pacote opcional `redis`."""
+
+    shared = True
+    evictions = 0
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("O backend de cache 'redis://' requer o pacote 'redis' instalado.") from exc
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self._client.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self._client.delete(*keys)
+
+    def clear(self, prefix: str = "") -> None:
+        # Só as chaves do cache: o mesmo Redis guarda versões, listas, baldes e eventos.
+        for key in self._client.scan_iter(f"{prefix}*"):
+            self._client.delete(key)
+
+    def __len__(self) -> int:
+        return self._client.dbsize()
+
+
+def backend_from_url(url: Optional[str], max_items: int = 10000):
+    """Escolhe o backend pela URL: vazio = local, 'memory://' = fake compartilhado, 'redis://' = Redis."""
+    if not url:
+        return LocalBackend(max_items=max_items)
+    if url.startswith("memory://"):
+        return InMemorySharedBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError(f"Backend de cache desconhecido: {url}")
+
+
+class Cache:
+    """
+    Fachada com prefixo de chave, TTL padrão e métricas de acerto/erro.
+    Em backends compartilhados os valores passam por `dumps`/`loads`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        backend,
+        ttl: Optional[float] = None,
+        dumps: Callable[[Any], bytes] = lambda value: json.dumps(value).encode(),
+        loads: Callable[[bytes], Any] = json.loads,
+    ):
+        self.name = name
+        self.backend = backend
+        self.ttl = ttl
+        self._dumps = dumps
+        self._loads = loads
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        CACHES[name] = self
+
+    def _key(self, key: Any) -> str:
+        return f"{self.name}:{key}"
+
+    def get(self, key: Any) -> Optional[Any]:
+        value = self.backend.get(self._key(key))
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._loads(value) if self.backend.shared else value
+
+    def set(self, key: Any, value: Any, ttl: Optional[float] = None) -> None:
+        stored = self._dumps(value) if self.backend.shared else value
+        self.backend.set(self._key(key), stored, ttl if ttl is not None else self.ttl)
+
+    def delete(self, *keys: Any) -> None:
+        if keys:
+            self.invalidations += len(keys)
+            self.backend.delete(*(self._key(key) for key in keys))
+
+    def clear(self) -> None:
+        self.backend.clear(self._key(""))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "size": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.backend.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+# Todos os caches criados, por nome, para o endpoint de métricas.
+CACHES: Dict[str, Cache] = {}
@@ -0,0 +1,175 @@
+"""
+Compressão das respostas negociada pelo `Accept-Encoding`.
+
+Oferece zstd e brotli quando os pacotes opcionais `zstandard` e `brotli` estão
+instalados, e gzip sempre. Entre as codificações aceitas com o mesmo peso (q),
+a preferência é zstd, br, gzip. Respostas menores que COMPRESSION_MIN_SIZE
+saem como estão; as em partes (StreamingResponse) são comprimidas parte a parte,
+com flush a cada uma, para o cliente receber os primeiros bytes sem esperar o
+fim. Server-Sent Events, respostas já codificadas e tipos que não são texto
+(imagens, por exemplo) nunca são comprimidos.
+
+O ETag de uma resposta comprimida vira fraco (W/"..."): os bytes mudam com a
+codificação, mas o conteúdo é o mesmo, e o cache HTTP compara os ETags pela
+forma fraca.
+"""
+import os
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # opcional: sem ele, br não é oferecido
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # opcional: sem ele, zstd não é oferecido
+    zstandard = None
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() in ("1", "true", "yes")
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "3"))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/plain", "text/html", "text/css", "application/javascript")
+
+
+# --- Codificadores ---
+
+class _Gzip:
+    name = "gzip"
+
+    def __init__(self):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class _Brotli:
+    name = "br"
+
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._compressor.process(data)
+        return out + (self._compressor.finish() if final else self._compressor.flush())
+
+class _Zstd:
+    name = "zstd"
+
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(
+            zstandard.COMPRESSOBJ_FLUSH_FINISH if final else zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+ENCODERS = {"gzip": _Gzip}
+if brotli is not None:
+    ENCODERS["br"] = _Brotli
+if zstandard is not None:
+    ENCODERS["zstd"] = _Zstd
+PREFERENCE = [name for name in ("zstd", "br", "gzip") if name in ENCODERS]
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """A codificação disponível de maior q em `accept_encoding`; empate vai para PREFERENCE."""
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, *params = (part.strip() for part in item.split(";"))
+        weight = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    weight = float(param[2:])
+                except ValueError:
+                    weight = 0.0
+        weights[name.lower()] = weight
+    best, best_weight = None, 0.0
+    for name in PREFERENCE:
+        weight = weights.get(name, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = name, weight
+    return best
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Comprime um corpo inteiro, como o middleware faria."""
+    return ENCODERS[encoding]().compress(data, final=True)
+
+
+# --- Middleware ---
+
+def _is_compressible(headers: Headers) -> bool:
+    content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    return "content-encoding" not in headers and content_type in COMPRESSIBLE_TYPES
+
+def _weak_etag(headers: MutableHeaders) -> None:
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["etag"] = f"W/{etag}"
+
+class CompressionMiddleware:
+    """Middleware ASGI puro; segura só o `http.response.start` até ver o primeiro corpo."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        encoder = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, encoder, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start_message = message
+                if message["status"] < 200 or message["status"] in (204, 304) or not _is_compressible(Headers(raw=message["headers"])):
+                    passthrough = True
+                    await send(message)
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                headers.add_vary_header("Accept-Encoding")
+                if not more_body and len(body) < COMPRESSION_MIN_SIZE:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                encoder = ENCODERS[encoding]()
+                headers["Content-Encoding"] = encoding
+                _weak_etag(headers)
+                if more_body:
+                    del headers["Content-Length"]
+                    await send(start_message)
+                else:
+                    body = encoder.compress(body, final=True)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+            await send({"type": "http.response.body", "body": encoder.compress(body, final=not more_body), "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
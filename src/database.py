@@ -1,13 +1,15 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 from pathlib import Path
 
+from . import instrumentation
+
 
 current_dir = Path(__file__).resolve().parent
-env_file_path = current_dir / "app_config.env" 
+env_file_path = current_dir / "app_config.env"
 
 if env_file_path.exists():
     load_dotenv(dotenv_path=env_file_path)
@@ -15,17 +17,118 @@ if env_file_path.exists():
 DATABASE_URL = os.getenv("DATABASE_URL")
 
 if not DATABASE_URL:
-    DATABASE_URL = "sqlite:///./blog.db" 
+    DATABASE_URL = "sqlite:///./blog.db"
+
+# --- Pool de Conexões ---
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() in ("1", "true", "yes")
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+
+# --- Modo Assíncrono ---
+# Um DATABASE_URL com driver assíncrono (ex.: "sqlite+aiosqlite:///./blog.db" ou
+# "postgresql+asyncpg://...") liga o modo assíncrono: as rotas viram corrotinas e
+# usam AsyncSession, sem ocupar o threadpool. Criação de tabelas e tarefas de
+# manutenção continuam usando um engine síncrono equivalente.
+ASYNC_DRIVERS = {"+aiosqlite": "", "+asyncpg": "+psycopg2"}
+IS_ASYNC = any(driver in DATABASE_URL for driver in ASYNC_DRIVERS)
+
+# --- Leitura x Escrita ---
+# GETs usam um pool de leitura separado. READ_DATABASE_URL aponta para uma réplica
+# (ex.: Postgres); sem ela, o pool de leitura usa o mesmo banco.
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL") or DATABASE_URL
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", str(max(4, os.cpu_count() or 1))))
+
+# --- Perfil de Produção do SQLite ---
+# WAL deixa leitores e o escritor trabalharem ao mesmo tempo; com um único
+# escritor no pool, os commits fazem fila no pool em vez de disputar o lock
+# do arquivo. SQLITE_TUNING=false volta ao comportamento padrão do SQLite.
+IS_SQLITE = DATABASE_URL.startswith("sqlite") and ":memory:" not in DATABASE_URL
+SQLITE_TUNING = IS_SQLITE and os.getenv("SQLITE_TUNING", "true").lower() in ("1", "true", "yes")
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": os.getenv("SQLITE_BUSY_TIMEOUT", "5000"),
+    "cache_size": os.getenv("SQLITE_CACHE_SIZE", "-64000"),  # negativo = KiB (64 MB)
+    "mmap_size": os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+    # O SQLite só aplica chaves estrangeiras (e ON DELETE CASCADE) com este pragma.
+    "foreign_keys": os.getenv("SQLITE_FOREIGN_KEYS", "ON"),
+}
+
+
+def _to_sync_url(url: str) -> str:
+    for async_driver, sync_driver in ASYNC_DRIVERS.items():
+        url = url.replace(async_driver, sync_driver)
+    return url
 
+def _engine_options(url: str, read_only: bool = False) -> dict:
+    options = {"connect_args": {"check_same_thread": False} if "sqlite" in url else {}}
+    if ":memory:" not in url:
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_pre_ping=DB_POOL_PRE_PING,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+        if SQLITE_TUNING:
+            # Um único escritor; os leitores escalam com os núcleos.
+            options.update(pool_size=DB_READ_POOL_SIZE if read_only else 1, max_overflow=0)
+    return options
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-)
+def _apply_sqlite_pragmas(engine, read_only: bool = False) -> None:
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            if read_only and name == "journal_mode":
+                continue  # trocar o journal é uma escrita; o escritor já deixou o arquivo em WAL
+            cursor.execute(f"PRAGMA {name} = {value}")
+        if read_only:
+            cursor.execute("PRAGMA query_only = ON")
+        cursor.close()
+
+def _build_engine(url: str, read_only: bool = False, asynchronous: bool = False):
+    if asynchronous:
+        from sqlalchemy.ext.asyncio import create_async_engine
+        built = create_async_engine(url, **_engine_options(url, read_only))
+        sync_engine = built.sync_engine
+    else:
+        built = sync_engine = create_engine(url, **_engine_options(url, read_only))
+    if SQLITE_TUNING:
+        _apply_sqlite_pragmas(sync_engine, read_only)
+    if instrumentation.METRICS_ENABLED:
+        instrumentation.instrument_engine(sync_engine)
+    return built
+
+
+SYNC_DATABASE_URL = os.getenv("SYNC_DATABASE_URL") or _to_sync_url(DATABASE_URL)
+
+engine = _build_engine(SYNC_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+read_engine = _build_engine(_to_sync_url(READ_DATABASE_URL), read_only=True)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+async_engine = None
+AsyncSessionLocal = None
+async_read_engine = None
+AsyncReadSessionLocal = None
+if IS_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    async_engine = _build_engine(DATABASE_URL, asynchronous=True)
+    async_read_engine = _build_engine(READ_DATABASE_URL, read_only=True, asynchronous=True)
+    # expire_on_commit=False: depois do commit não é possível fazer lazy load
+    # fora do greenlet da sessão, então os objetos precisam continuar carregados.
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
 def create_tables():
-    """Cria todas as tabelas no banco de dados se elas não existirem."""
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    """
+    Cria todas as tabelas no banco de dados se elas não existirem.
+    Mudanças em tabelas existentes ficam em `migrations.py`.
+    """
+    Base.metadata.create_all(bind=engine)
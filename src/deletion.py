@@ -0,0 +1,304 @@
+"""
+Exclusão de grupos e autores em segundo plano.
+
+A rota só marca o alvo como excluído (`deleted_at`), o que o tira de todas as
+leituras na hora, e registra um `DeletionJob`. Um worker remove depois os
+filhos em lotes de `DELETE_CHUNK_SIZE` linhas, cada lote na sua transação
+curta: comentários, entradas da timeline, posts, participações e por fim a
+própria linha. Entre um lote e outro o lock de escrita fica livre para as
+rotas. O `ON DELETE CASCADE` das chaves estrangeiras é a rede de segurança,
+não o caminho principal: um único DELETE em cascata voltaria a ser uma
+transação do tamanho do grupo.
+
+O progresso fica na tabela `deletion_jobs` (GET /jobs/{id}). Um job cujo
+worker parou de dar sinal por `DELETE_JOB_LEASE` segundos é retomado por
+outro processo ou no próximo boot.
+"""
+import datetime
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, func, or_, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from . import bulk, database, http_cache, models
+
+DELETE_CHUNK_SIZE = int(os.getenv("DELETE_CHUNK_SIZE", "500"))
+DELETE_CHUNK_PAUSE = float(os.getenv("DELETE_CHUNK_PAUSE", "0.01"))
+DELETE_JOB_LEASE = int(os.getenv("DELETE_JOB_LEASE", "60"))
+
+logger = logging.getLogger(__name__)
+
+membership = models.group_membership_table.c
+
+
+# --- Pedido de exclusão (dentro da transação da rota) ---
+
+def hide_group(db: Session, group_id: int, requested_by: int) -> models.DeletionJob:
+    db.execute(update(models.Group).where(models.Group.id == group_id).values(deleted_at=datetime.datetime.now()))
+    job = models.DeletionJob(kind="group", target_id=group_id, requested_by=requested_by)
+    db.add(job)
+    db.flush()
+    return job
+
+def hide_author(db: Session, author_id: int) -> Tuple[models.DeletionJob, List[int]]:
+    """Esconde o autor e os grupos que ele criou. Retorna o job e os ids desses grupos."""
+    now = datetime.datetime.now()
+    db.execute(update(models.Author).where(models.Author.id == author_id).values(deleted_at=now))
+    group_ids = list(db.execute(
+        select(models.Group.id).where(models.Group.creator_id == author_id, models.Group.deleted_at.is_(None))
+    ).scalars())
+    if group_ids:
+        db.execute(update(models.Group).where(models.Group.id.in_(group_ids)).values(deleted_at=now))
+    job = models.DeletionJob(kind="author", target_id=author_id, requested_by=author_id)
+    db.add(job)
+    db.flush()
+    return job, group_ids
+
+
+# --- Etapas ---
+
+@dataclass
+class Step:
+    """Uma tabela a esvaziar: `count` estima o total, `chunk` remove até N linhas."""
+    name: str
+    count: object
+    # Recebe (sessão, limite) e devolve (linhas removidas, chaves do cache HTTP a invalidar).
+    chunk: Callable[[Session, int], Tuple[int, Set[str]]]
+
+
+def _delete_by_ids(id_column, where) -> Callable[[Session, int], Tuple[int, Set[str]]]:
+    def chunk(db: Session, limit: int) -> Tuple[int, Set[str]]:
+        ids = list(db.execute(select(id_column).where(where).limit(limit)).scalars())
+        if ids:
+            db.execute(delete(id_column.table).where(id_column.in_(ids)))
+        return len(ids), set()
+    return chunk
+
+def _delete_feed_entries(where) -> Callable[[Session, int], Tuple[int, Set[str]]]:
+    key = (models.FeedEntry.author_id, models.FeedEntry.post_id)
+    def chunk(db: Session, limit: int) -> Tuple[int, Set[str]]:
+        keys = [tuple(row) for row in db.execute(select(*key).where(where).limit(limit))]
+        if keys:
+            db.execute(delete(models.FeedEntry).where(tuple_(*key).in_(keys)))
+        return len(keys), set()
+    return chunk
+
+def _delete_posts(where, adjust_post_counts: bool) -> Callable[[Session, int], Tuple[int, Set[str]]]:
+    def chunk(db: Session, limit: int) -> Tuple[int, Set[str]]:
+        rows = db.execute(
+            select(models.Post.id, models.Post.author_id, models.Post.group_id).where(where).limit(limit)
+        ).all()
+        if not rows:
+            return 0, set()
+        db.execute(delete(models.Post).where(models.Post.id.in_([row.id for row in rows])))
+        if adjust_post_counts:
+            bulk.add_to_counts(db, models.Group, "post_count", {
+                group_id: -count for group_id, count in Counter(row.group_id for row in rows).items()})
+        keys = {f"post:{row.id}" for row in rows} | {f"author_posts:{row.author_id}" for row in rows}
+        if adjust_post_counts:
+            keys |= {f"group:{row.group_id}" for row in rows}
+        return len(rows), keys
+    return chunk
+
+def _delete_comments_by(author_id: int) -> Callable[[Session, int], Tuple[int, Set[str]]]:
+    def chunk(db: Session, limit: int) -> Tuple[int, Set[str]]:
+        rows = db.execute(
+            select(models.Comment.id, models.Comment.post_id, models.Post.author_id)
+            .join(models.Post, models.Post.id == models.Comment.post_id)
+            .where(models.Comment.commenter_id == author_id)
+            .limit(limit)
+        ).all()
+        if rows:
+            db.execute(delete(models.Comment).where(models.Comment.id.in_([row.id for row in rows])))
+            bulk.add_to_counts(db, models.Post, "comment_count", {
+                post_id: -count for post_id, count in Counter(row.post_id for row in rows).items()})
+        return len(rows), {f"post:{row.post_id}" for row in rows} | {f"author_posts:{row.author_id}" for row in rows}
+    return chunk
+
+def _delete_memberships_of(author_id: int) -> Callable[[Session, int], Tuple[int, Set[str]]]:
+    def chunk(db: Session, limit: int) -> Tuple[int, Set[str]]:
+        group_ids = list(db.execute(
+            select(membership.group_id).where(membership.author_id == author_id).limit(limit)
+        ).scalars())
+        if not group_ids:
+            return 0, set()
+        db.execute(delete(models.group_membership_table).where(
+            membership.author_id == author_id, membership.group_id.in_(group_ids)))
+        bulk.add_to_counts(db, models.Group, "member_count", {group_id: -1 for group_id in group_ids})
+        return len(group_ids), {"groups", *(f"group:{group_id}" for group_id in group_ids)}
+    return chunk
+
+def _delete_memberships_in(group_id: int) -> Callable[[Session, int], Tuple[int, Set[str]]]:
+    def chunk(db: Session, limit: int) -> Tuple[int, Set[str]]:
+        author_ids = list(db.execute(
+            select(membership.author_id).where(membership.group_id == group_id).limit(limit)
+        ).scalars())
+        if author_ids:
+            db.execute(delete(models.group_membership_table).where(
+                membership.group_id == group_id, membership.author_id.in_(author_ids)))
+        return len(author_ids), set()
+    return chunk
+
+def _delete_row(model, row_id: int, keys: Set[str]) -> Step:
+    def chunk(db: Session, limit: int) -> Tuple[int, Set[str]]:
+        deleted = db.execute(delete(model).where(model.id == row_id)).rowcount
+        return deleted, keys if deleted else set()
+    return Step(model.__tablename__, select(func.count()).where(model.id == row_id), chunk)
+
+def _count(model_or_column, where):
+    return select(func.count()).select_from(model_or_column).where(where)
+
+
+def group_steps(group_id: int) -> List[Step]:
+    group_posts = select(models.Post.id).where(models.Post.group_id == group_id)
+    comments = models.Comment.post_id.in_(group_posts)
+    feed = models.FeedEntry.group_id == group_id
+    posts = models.Post.group_id == group_id
+    members = membership.group_id == group_id
+    return [
+        Step("comments", _count(models.Comment, comments), _delete_by_ids(models.Comment.id, comments)),
+        Step("feed_entries", _count(models.FeedEntry, feed), _delete_feed_entries(feed)),
+        Step("posts", _count(models.Post, posts), _delete_posts(posts, adjust_post_counts=False)),
+        Step("group_memberships", _count(models.group_membership_table, members), _delete_memberships_in(group_id)),
+        _delete_row(models.Group, group_id, {"groups", f"group:{group_id}"}),
+    ]
+
+def author_steps(db: Session, author_id: int) -> List[Step]:
+    steps: List[Step] = []
+    created_groups = db.execute(select(models.Group.id).where(models.Group.creator_id == author_id)).scalars()
+    for group_id in created_groups:
+        steps.extend(group_steps(group_id))
+    own_posts = select(models.Post.id).where(models.Post.author_id == author_id)
+    comments_on_posts = models.Comment.post_id.in_(own_posts)
+    feed_of_posts = models.FeedEntry.post_id.in_(own_posts)
+    posts = models.Post.author_id == author_id
+    timeline = models.FeedEntry.author_id == author_id
+    steps += [
+        Step("comments", _count(models.Comment, models.Comment.commenter_id == author_id), _delete_comments_by(author_id)),
+        Step("comments", _count(models.Comment, comments_on_posts), _delete_by_ids(models.Comment.id, comments_on_posts)),
+        Step("feed_entries", _count(models.FeedEntry, feed_of_posts), _delete_feed_entries(feed_of_posts)),
+        Step("posts", _count(models.Post, posts), _delete_posts(posts, adjust_post_counts=True)),
+        Step("feed_entries", _count(models.FeedEntry, timeline), _delete_feed_entries(timeline)),
+        Step("group_memberships", _count(models.group_membership_table, membership.author_id == author_id),
+             _delete_memberships_of(author_id)),
+        _delete_row(models.Author, author_id, set()),
+    ]
+    return steps
+
+
+# --- Execução ---
+
+def _claim(db: Session, job_id: int) -> bool:
+    """Marca o job como em execução, se ninguém mais o estiver processando."""
+    now = datetime.datetime.now()
+    stale = now - datetime.timedelta(seconds=DELETE_JOB_LEASE)
+    claimed = db.execute(
+        update(models.DeletionJob)
+        .where(
+            models.DeletionJob.id == job_id,
+            or_(
+                models.DeletionJob.status == "pending",
+                (models.DeletionJob.status == "running") & (models.DeletionJob.heartbeat_at < stale),
+            ),
+        )
+        .values(status="running", heartbeat_at=now)
+    ).rowcount
+    db.commit()
+    return bool(claimed)
+
+def _set_status(job_id: int, **values) -> None:
+    with database.SessionLocal() as db:
+        db.execute(update(models.DeletionJob).where(models.DeletionJob.id == job_id).values(**values))
+        db.commit()
+
+def run_job(job_id: int, stopping: Optional[threading.Event] = None) -> str:
+    """Processa o job até o fim (ou até `stopping`). Retorna o status final."""
+    with database.SessionLocal() as db:
+        if not _claim(db, job_id):
+            return "skipped"
+        job = db.get(models.DeletionJob, job_id)
+        steps = group_steps(job.target_id) if job.kind == "group" else author_steps(db, job.target_id)
+        if job.total is None:
+            job.total = sum(db.execute(step.count).scalar() for step in steps)
+            db.commit()
+    try:
+        for step in steps:
+            while True:
+                if stopping is not None and stopping.is_set():
+                    _set_status(job_id, status="pending")  # outro boot retoma sem esperar o lease
+                    return "pending"
+                with database.SessionLocal() as db:
+                    deleted, cache_keys = step.chunk(db, DELETE_CHUNK_SIZE)
+                    db.execute(
+                        update(models.DeletionJob)
+                        .where(models.DeletionJob.id == job_id)
+                        .values(deleted=models.DeletionJob.deleted + deleted, heartbeat_at=datetime.datetime.now())
+                    )
+                    db.commit()
+                if cache_keys:
+                    http_cache.bump(*cache_keys)
+                if deleted < DELETE_CHUNK_SIZE:
+                    break
+                time.sleep(DELETE_CHUNK_PAUSE)
+    except Exception as exc:
+        logger.exception("Falha no job de exclusão %s", job_id)
+        _set_status(job_id, status="failed", error=str(exc), finished_at=datetime.datetime.now())
+        return "failed"
+    _set_status(job_id, status="done", finished_at=datetime.datetime.now())
+    return "done"
+
+
+class DeletionWorker:
+    """Uma thread por processo que executa os jobs em ordem de chegada."""
+
+    def __init__(self):
+        self._queue: "queue.Queue[Optional[int]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def submit(self, job_id: int) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._loop, name="deletion-worker", daemon=True)
+                self._thread.start()
+        self._queue.put(job_id)
+
+    def resume(self) -> None:
+        """Reenfileira jobs pendentes e os que ficaram sem worker (lease vencido)."""
+        stale = datetime.datetime.now() - datetime.timedelta(seconds=DELETE_JOB_LEASE)
+        with database.SessionLocal() as db:
+            job_ids = db.execute(
+                select(models.DeletionJob.id)
+                .where(or_(
+                    models.DeletionJob.status == "pending",
+                    (models.DeletionJob.status == "running") & (models.DeletionJob.heartbeat_at < stale),
+                ))
+                .order_by(models.DeletionJob.id)
+            ).scalars().all()
+        for job_id in job_ids:
+            self.submit(job_id)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stopping.set()
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _loop(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            if job_id is None or self._stopping.is_set():
+                return
+            run_job(job_id, self._stopping)
+
+
+worker = DeletionWorker()
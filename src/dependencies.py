@@ -1,10 +1,64 @@
 # src/dependencies.py
-from .database import SessionLocal
+import inspect
+from fastapi.concurrency import run_in_threadpool
+from .database import SessionLocal, ReadSessionLocal, AsyncSessionLocal, AsyncReadSessionLocal, IS_ASYNC
 from sqlalchemy.orm import Session
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
\ No newline at end of file
+# get_db: sessão de escrita. get_read_db: sessão do pool de leitura, para GETs.
+if IS_ASYNC:
+    async def get_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    async def get_read_db():
+        async with AsyncReadSessionLocal() as db:
+            yield db
+else:
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def get_read_db():
+        db = ReadSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+def run_db(db, func, *args, **kwargs):
+    """
+    Executa `func(session, *args, **kwargs)` sem bloquear o event loop e
+    retorna um awaitable. No modo assíncrono usa AsyncSession.run_sync (o I/O
+    acontece no driver assíncrono); no modo síncrono usa o threadpool.
+    """
+    if IS_ASYNC:
+        return db.run_sync(func, *args, **kwargs)
+    return run_in_threadpool(func, db, *args, **kwargs)
+
+
+def db_endpoint(func):
+    """
+    Decorador para rotas e dependências síncronas que recebem `db`.
+
+    No modo síncrono devolve a função intacta (o FastAPI a roda no threadpool).
+    No modo assíncrono devolve uma corrotina com a mesma assinatura, que recebe
+    a AsyncSession de `get_db` e executa o corpo original via `run_sync`.
+    Tudo o que a rota retorna já precisa estar carregado: após o `return`
+    não há lazy load no modo assíncrono.
+    """
+    if not IS_ASYNC:
+        return func
+
+    async def wrapper(*args, db, **kwargs):
+        return await db.run_sync(lambda session: func(*args, db=session, **kwargs))
+
+    wrapper.__name__ = func.__name__
+    wrapper.__qualname__ = func.__qualname__
+    wrapper.__doc__ = func.__doc__
+    wrapper.__module__ = func.__module__
+    wrapper.__signature__ = inspect.signature(func)
+    return wrapper
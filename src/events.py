@@ -0,0 +1,263 @@
+"""
+Eventos ao vivo para o frontend (Server-Sent Events).
+
+As rotas de escrita publicam eventos compactos (post/comentário criado,
+alterado ou excluído) depois do commit. O `Hub` entrega cada evento às
+conexões abertas dos membros do grupo, cada uma com uma fila limitada: se um
+cliente lento enche a fila, a conexão é encerrada e o navegador reconecta
+enviando `Last-Event-ID`, retomando a partir do buffer circular de eventos
+recentes. Se o ponto de retomada já saiu do buffer, o cliente recebe `reset`
+e deve recarregar a página.
+
+Com vários workers, `EVENTS_BROKER_URL=redis://...` faz todos os processos
+numerarem e receberem os mesmos eventos; `memory://` é o fake desse broker
+para testes dentro de um único processo.
+"""
+import asyncio
+import itertools
+import json
+import os
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional
+
+EVENTS_BUFFER_SIZE = int(os.getenv("EVENTS_BUFFER_SIZE", "1000"))
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))
+EVENTS_RETRY_MS = int(os.getenv("EVENTS_RETRY_MS", "3000"))
+EVENTS_BROKER_URL = os.getenv("EVENTS_BROKER_URL")
+
+
+@dataclass(frozen=True)
+class Event:
+    id: int
+    type: str
+    data: dict
+    group_id: Optional[int] = None
+    # Eventos com author_id vão só para as conexões desse usuário.
+    author_id: Optional[int] = None
+
+    def encode(self) -> bytes:
+        data = json.dumps(self.data, separators=(",", ":"), default=str)
+        return f"id: {self.id}\nevent: {self.type}\ndata: {data}\n\n".encode()
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), default=str)
+
+    @classmethod
+    def from_json(cls, raw) -> "Event":
+        return cls(**json.loads(raw))
+
+
+# --- Brokers ---
+
+class LocalBroker:
+    """Um único processo: numera e entrega os eventos diretamente."""
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._receivers: List[Callable[[Event], None]] = []
+
+    def attach(self, receiver: Callable[[Event], None]) -> None:
+        self._receivers.append(receiver)
+
+    def emit(self, type: str, data: dict, group_id: Optional[int] = None, author_id: Optional[int] = None) -> None:
+        # Numera e entrega sob o mesmo lock: com publicadores concorrentes, o
+        # buffer do Hub recebe os eventos na ordem dos ids e a retomada por
+        # Last-Event-ID não pula nenhum.
+        with self._lock:
+            self.publish(Event(next(self._ids), type, data, group_id, author_id))
+
+    def publish(self, event: Event) -> None:
+        for receiver in list(self._receivers):
+            receiver(event)
+
+    def close(self) -> None:
+        pass
+
+
+class InMemoryBroker(LocalBroker):
+    """Fake do broker compartilhado: serializa cada evento como o Redis faria."""
+
+    def publish(self, event: Event) -> None:
+        super().publish(Event.from_json(event.to_json()))
+
+
+class RedisBroker:
+    """Broker entre workers via Redis (INCR para os ids, PUBLISH para a entrega)."""
+
+    def __init__(self, url: str, channel: str = "forum:events"):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("O broker de eventos 'redis://' requer o pacote 'redis' instalado.") from exc
+        self._client = redis.Redis.from_url(url)
+        self._channel = channel
+        self._receivers: List[Callable[[Event], None]] = []
+        self._pubsub = None
+
+    def attach(self, receiver: Callable[[Event], None]) -> None:
+        self._receivers.append(receiver)
+        if self._pubsub is None:
+            self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+            self._pubsub.subscribe(**{self._channel: self._on_message})
+            self._pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def _on_message(self, message) -> None:
+        event = Event.from_json(message["data"])
+        for receiver in list(self._receivers):
+            receiver(event)
+
+    def emit(self, type: str, data: dict, group_id: Optional[int] = None, author_id: Optional[int] = None) -> None:
+        self.publish(Event(self.next_id(), type, data, group_id, author_id))
+
+    def next_id(self) -> int:
+        return int(self._client.incr(f"{self._channel}:seq"))
+
+    def publish(self, event: Event) -> None:
+        self._client.publish(self._channel, event.to_json())
+
+    def close(self) -> None:
+        if self._pubsub is not None:
+            self._pubsub.close()
+
+
+def broker_from_url(url: Optional[str]):
+    """Vazio = local, 'memory://' = fake compartilhado, 'redis://' = Redis."""
+    if not url:
+        return LocalBroker()
+    if url.startswith("memory://"):
+        return InMemoryBroker()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBroker(url)
+    raise ValueError(f"Broker de eventos desconhecido: {url}")
+
+
+# --- Hub ---
+
+class Subscription:
+    """Uma conexão aberta: os grupos que ela acompanha e sua fila limitada."""
+
+    def __init__(self, author_id: int, group_ids: Iterable[int], queue_size: int):
+        self.author_id = author_id
+        self.group_ids = set(group_ids)
+        self.queue: "asyncio.Queue[Event]" = asyncio.Queue(maxsize=queue_size)
+        self.loop = asyncio.get_running_loop()
+        self.overflowed = False
+
+    def wants(self, event: Event) -> bool:
+        if event.author_id is not None:
+            return event.author_id == self.author_id
+        return event.group_id in self.group_ids
+
+    def _follow(self, event: Event) -> None:
+        # Entrar/sair de um grupo muda o que esta conexão recebe dali em diante.
+        if event.type == "membership":
+            if event.data["joined"]:
+                self.group_ids.add(event.data["group_id"])
+            else:
+                self.group_ids.discard(event.data["group_id"])
+        elif event.type == "group.deleted":
+            self.group_ids.discard(event.group_id)
+
+    def offer(self, event: Event) -> None:
+        """Roda no event loop da conexão."""
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            return
+        self._follow(event)
+
+
+class Hub:
+    """Fan-out em processo dos eventos do broker para as conexões abertas."""
+
+    def __init__(self, broker=None, buffer_size: int = EVENTS_BUFFER_SIZE, queue_size: int = EVENTS_QUEUE_SIZE):
+        self.broker = broker or LocalBroker()
+        self.queue_size = queue_size
+        self._buffer: "deque[Event]" = deque(maxlen=buffer_size)
+        self._subscriptions: set = set()
+        self._lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+        self.overflows = 0
+        self.broker.attach(self._receive)
+
+    def publish(self, type: str, data: dict, group_id: Optional[int] = None, author_id: Optional[int] = None) -> None:
+        """Chamado pelas rotas (de qualquer thread), depois do commit."""
+        self.published += 1
+        self.broker.emit(type, data, group_id, author_id)
+
+    def _receive(self, event: Event) -> None:
+        with self._lock:
+            self._buffer.append(event)
+            targets = [subscription for subscription in self._subscriptions if subscription.wants(event)]
+        for subscription in targets:
+            self.delivered += 1
+            subscription.loop.call_soon_threadsafe(subscription.offer, event)
+
+    def subscribe(self, author_id: int, group_ids: Iterable[int], last_event_id: Optional[int] = None) -> Subscription:
+        """Abre uma conexão; com `last_event_id`, reenvia o que ela perdeu."""
+        subscription = Subscription(author_id, group_ids, self.queue_size)
+        with self._lock:
+            self._subscriptions.add(subscription)
+            buffered = list(self._buffer)
+        if last_event_id is None:
+            return subscription
+        if buffered and buffered[0].id > last_event_id + 1:
+            subscription.offer(Event(buffered[-1].id, "reset", {}))
+            return subscription
+        for event in buffered:
+            if event.id > last_event_id and subscription.wants(event):
+                subscription.offer(event)
+        if subscription.overflowed:
+            # Perdeu mais eventos do que cabem na fila: melhor recarregar.
+            subscription = self._restart(subscription, buffered[-1].id)
+        return subscription
+
+    def _restart(self, subscription: Subscription, last_id: int) -> Subscription:
+        self.unsubscribe(subscription)
+        fresh = self.subscribe(subscription.author_id, subscription.group_ids)
+        fresh.offer(Event(last_id, "reset", {}))
+        return fresh
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    async def stream(self, subscription: Subscription, heartbeat: float = EVENTS_HEARTBEAT) -> AsyncIterator[bytes]:
+        """Quadros SSE da conexão até o cliente sair ou a fila transbordar."""
+        try:
+            yield f"retry: {EVENTS_RETRY_MS}\n\n".encode()
+            while True:
+                if subscription.overflowed and subscription.queue.empty():
+                    self.overflows += 1
+                    return  # o cliente reconecta com Last-Event-ID
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+                    continue
+                yield event.encode()
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "connections": len(self._subscriptions),
+            "buffered": len(self._buffer),
+            "published": self.published,
+            "delivered": self.delivered,
+            "overflows": self.overflows,
+        }
+
+    def close(self) -> None:
+        self.broker.close()
+
+
+hub = Hub(broker_from_url(EVENTS_BROKER_URL))
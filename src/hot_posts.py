@@ -0,0 +1,247 @@
+"""
+Posts quentes por grupo: o feed montado em memória, sem SQL.
+
+Para cada grupo ficam em cache os HOT_POSTS_PER_GROUP posts visíveis mais
+novos, já serializados no formato de FeedPostRead (com os últimos
+comentários). A lista de um grupo é montada na primeira leitura e atualizada
+pelas rotas de escrita depois do commit (write-through): o post criado entra,
+o editado ou comentado é relido, o removido sai.
+
+O feed de um usuário é o merge em heap das listas dos grupos dele, por
+(data, id) decrescente, como a timeline. Uma lista incompleta (o grupo tem mais
+posts do que os guardados) só garante os posts até o último dela; se a página
+passa desse ponto, `read_feed` devolve None e a rota usa a timeline.
+
+Cada lista guarda a versão do grupo em que foi montada. Toda escrita
+incrementa a versão e só altera a lista que estava exatamente na versão
+anterior; qualquer outra é descartada. Assim uma leitura que remontou a lista
+durante uma escrita, ou duas escritas concorrentes no mesmo grupo, nunca
+deixam uma lista velha valendo: no pior caso ela é remontada.
+
+Listas e versões ficam no processo, a menos que HOT_POSTS_CACHE_URL aponte
+um backend compartilhado (`redis://...`; `memory://` é o fake dele). Como uma
+escrita em outro worker não alcançaria as listas locais, o cache só vem ligado
+por padrão com HOT_POSTS_CACHE_URL; sem ela, HOT_POSTS_ENABLED=true é uma
+escolha explícita, segura com um único processo.
+
+Os JSONs guardados seguem FAST_SERIALIZATION, como as respostas do cache HTTP:
+projeção + orjson no modo rápido, FeedPostRead do Pydantic no padrão.
+"""
+import datetime
+import heapq
+import os
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import Response
+from sqlalchemy.orm import Session
+
+from . import cache, http_cache, instrumentation, read_models, schemas, serializers, timeline
+
+HOT_POSTS_CACHE_URL = os.getenv("HOT_POSTS_CACHE_URL")
+HOT_POSTS_ENABLED = os.getenv("HOT_POSTS_ENABLED", "true" if HOT_POSTS_CACHE_URL else "false").lower() in ("1", "true", "yes")
+HOT_POSTS_PER_GROUP = int(os.getenv("HOT_POSTS_PER_GROUP", "50"))
+HOT_POSTS_MAX_GROUPS = int(os.getenv("HOT_POSTS_MAX_GROUPS", "1000"))
+HOT_POSTS_TTL = float(os.getenv("HOT_POSTS_TTL", "600"))
+
+# Lista de um grupo: {"version": [época, n], "complete": bool, "posts": [[data, id, json], ...]},
+# mais novos primeiro. Só tipos JSON, para o backend compartilhado.
+lists = cache.Cache(
+    "hot_posts",
+    cache.backend_from_url(HOT_POSTS_CACHE_URL, max_items=HOT_POSTS_MAX_GROUPS),
+    ttl=HOT_POSTS_TTL,
+)
+versions = http_cache.versions_from_url(HOT_POSTS_CACHE_URL, prefix="hot:")
+
+
+class FeedStats:
+    """Páginas do feed servidas pelas listas (hits) e pela timeline (misses)."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+feed_stats = FeedStats()
+cache.CACHES["hot_posts_feed"] = feed_stats
+
+_sort_key = itemgetter(0, 1)
+
+
+def _sort_date(date: datetime.datetime) -> str:
+    # Largura fixa: a ordem das strings é a ordem das datas.
+    return date.isoformat(timespec="microseconds")
+
+def _encode(post, comments) -> str:
+    """O JSON do post no feed, pelo mesmo caminho que a timeline usaria."""
+    if serializers.FAST_SERIALIZATION:
+        return serializers.dumps(serializers.dump_feed_post(post, comments)).decode()
+    return schemas.FeedPostRead(
+        id=post.id, title=post.title, text=post.text, date=post.date,
+        author_id=post.author_id, author=post.author, group=post.group,
+        comment_count=post.comment_count, comments=comments,
+    ).model_dump_json()
+
+def _item(post, comments) -> list:
+    return [_sort_date(post.date), post.id, _encode(post, comments)]
+
+def _version_key(group_id: int) -> str:
+    return f"group:{group_id}"
+
+
+# --- Leitura ---
+
+def _fill(db: Session, missing: Dict[int, list]) -> Dict[int, dict]:
+    """Monta as listas dos grupos em `missing` (grupo -> versão lida antes da consulta)."""
+    posts = read_models.latest_group_posts(db, missing, HOT_POSTS_PER_GROUP)
+    latest = read_models.latest_comments(
+        db, [post.id for group_posts in posts.values() for post in group_posts], timeline.FEED_LATEST_COMMENTS)
+    filled = {}
+    for group_id, version in missing.items():
+        group_posts = posts[group_id]
+        filled[group_id] = {
+            "version": version,
+            "complete": len(group_posts) < HOT_POSTS_PER_GROUP,
+            "posts": [_item(post, latest[post.id]) for post in group_posts],
+        }
+        lists.set(group_id, filled[group_id])
+    return filled
+
+def read_feed(db: Session, group_ids: Iterable[int], before: Optional[timeline.Cursor], limit: int) -> Optional[List[list]]:
+    """
+    A página do feed (itens [data, id, json]) montada das listas em cache,
+    remontando as que faltam ou estão velhas. None se a página não cabe nelas.
+    """
+    if not HOT_POSTS_ENABLED:
+        return None
+    entries = []
+    missing = {}
+    for group_id in group_ids:
+        # A versão vem antes da lista (e da consulta, se faltar): ver o docstring do módulo.
+        epoch, number, _ = versions.get(_version_key(group_id))
+        entry = lists.get(group_id)
+        if entry is not None and entry["version"] == [epoch, number]:
+            entries.append(entry)
+        else:
+            missing[group_id] = [epoch, number]
+    if missing:
+        entries.extend(_fill(db, missing).values())
+
+    # Abaixo do último post de uma lista incompleta pode faltar post daquele grupo.
+    boundary = max((_sort_key(entry["posts"][-1]) for entry in entries if not entry["complete"]), default=None)
+    before_key = (_sort_date(before[0]), before[1]) if before is not None else None
+    if boundary is not None and before_key is not None and before_key <= boundary:
+        feed_stats.misses += 1
+        return None
+    page = []
+    for item in heapq.merge(*(entry["posts"] for entry in entries), key=_sort_key, reverse=True):
+        key = _sort_key(item)
+        if before_key is not None and key >= before_key:
+            continue
+        if boundary is not None and key < boundary:
+            feed_stats.misses += 1
+            return None
+        page.append(item)
+        if len(page) == limit:
+            break
+    feed_stats.hits += 1
+    return page
+
+def next_cursor(item: list) -> str:
+    """O mesmo X-Next-Cursor que a timeline daria para este post."""
+    return timeline.encode_cursor(datetime.datetime.fromisoformat(item[0]), item[1])
+
+def feed_response(page: List[list], headers: Optional[dict] = None) -> Response:
+    """Os JSONs guardados lado a lado: nada é serializado de novo."""
+    with instrumentation.timed_serialization():
+        body = ("[" + ",".join(item[2] for item in page) + "]").encode()
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# --- Escrita (depois do commit) ---
+
+def _claim(group_id: int) -> Optional[Tuple[dict, int]]:
+    """
+    Incrementa a versão do grupo e devolve a lista com a nova versão se ela
+    estava na anterior; qualquer outra é descartada (None: nada a atualizar).
+    """
+    (number,) = versions.bump(_version_key(group_id))
+    entry = lists.get(group_id)
+    if entry is None:
+        return None
+    if entry["version"][1] != number - 1:
+        lists.delete(group_id)
+        return None
+    return entry, number
+
+def _store(group_id: int, claimed: Tuple[dict, int], posts: List[list]) -> None:
+    entry, number = claimed
+    complete = entry["complete"] and len(posts) <= HOT_POSTS_PER_GROUP
+    posts = posts[:HOT_POSTS_PER_GROUP]
+    if not posts and not complete:
+        lists.delete(group_id)
+        return
+    # Uma lista nova a cada escrita: leitores concorrentes podem estar iterando a anterior.
+    lists.set(group_id, {"version": [entry["version"][0], number], "complete": complete, "posts": posts})
+
+def _upsert(posts: List[list], item: list, complete: bool) -> List[list]:
+    posts = [existing for existing in posts if existing[1] != item[1]]
+    # Numa lista incompleta, um post mais antigo que o último fica fora dela.
+    if not complete and posts and _sort_key(item) < _sort_key(posts[-1]):
+        return posts
+    position = next((index for index, existing in enumerate(posts) if _sort_key(existing) < _sort_key(item)), len(posts))
+    posts.insert(position, item)
+    return posts
+
+def add_post(group_id: int, post, comments: Iterable = ()) -> None:
+    """Post recém-criado, com os dados que a rota já tem em memória (sem SQL)."""
+    if not HOT_POSTS_ENABLED:
+        return
+    claimed = _claim(group_id)
+    if claimed is not None:
+        entry = claimed[0]
+        _store(group_id, claimed, _upsert(entry["posts"], _item(post, list(comments)), entry["complete"]))
+
+def remove_post(group_id: int, post_id: int) -> None:
+    if not HOT_POSTS_ENABLED:
+        return
+    claimed = _claim(group_id)
+    if claimed is not None:
+        _store(group_id, claimed, [item for item in claimed[0]["posts"] if item[1] != post_id])
+
+def refresh_posts(db: Session, posts_by_group: Dict[int, Iterable[int]]) -> None:
+    """
+    Relê os posts (editados, comentados ou criados em lote) dos grupos com
+    lista em cache; os que sumiram saem da lista. Sem lista, nenhuma consulta.
+    """
+    if not HOT_POSTS_ENABLED or not posts_by_group:
+        return
+    claimed = {group_id: _claim(group_id) for group_id in posts_by_group}
+    claimed = {group_id: claim for group_id, claim in claimed.items() if claim is not None}
+    if not claimed:
+        return
+    post_ids = {post_id for group_id in claimed for post_id in posts_by_group[group_id]}
+    posts = {post.id: post for post in read_models.posts_by_ids(db, list(post_ids))}
+    latest = read_models.latest_comments(db, posts, timeline.FEED_LATEST_COMMENTS)
+    items = {post_id: _item(post, latest[post_id]) for post_id, post in posts.items()}
+    for group_id, claim in claimed.items():
+        current, complete = claim[0]["posts"], claim[0]["complete"]
+        for post_id in set(posts_by_group[group_id]):
+            if post_id in items:
+                current = _upsert(current, items[post_id], complete)
+            else:
+                current = [item for item in current if item[1] != post_id]
+        _store(group_id, claim, current)
+
+def invalidate(*group_ids: int) -> None:
+    """Descarta as listas (grupo ou autor em exclusão); a próxima leitura as remonta."""
+    if group_ids:
+        versions.bump(*map(_version_key, group_ids))
+        lists.delete(*group_ids)
@@ -0,0 +1,275 @@
+"""
+Cache HTTP das rotas de leitura: ETag, Last-Modified e respostas prontas.
+
+Cada recurso tem uma chave ("post:7", "group:3", "groups", "author_posts:2")
+com um contador de versão que as rotas de escrita incrementam depois do
+commit (`bump`). O ETag sai da versão, então um `If-None-Match` igual ao ETag
+atual vira 304 sem abrir transação nem montar objetos. Os bytes já
+serializados ficam num LRU limitado por tamanho total, indexado pela versão:
+uma versão nova nunca encontra a resposta antiga.
+
+Com vários workers os contadores precisam ser compartilhados
+(`HTTP_CACHE_URL=redis://...`); do contrário um worker que não viu a escrita
+confirmaria um ETag antigo. `memory://` é o fake desse backend para testes.
+"""
+import hashlib
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+
+from . import cache, instrumentation, serializers
+
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+HTTP_CACHE_URL = os.getenv("HTTP_CACHE_URL")
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+Version = Tuple[str, int, float]  # (época, versão, modificado em)
+
+
+# --- Contadores de versão ---
+
+class LocalVersions:
+    """Contadores do processo. A época muda a cada boot, invalidando ETags antigos."""
+
+    def __init__(self):
+        self.epoch = secrets.token_hex(4)
+        self.started_at = time.time()
+        self._versions: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Version:
+        version, modified_at = self._versions.get(key, (0, self.started_at))
+        return self.epoch, version, modified_at
+
+    def bump(self, *keys: str) -> List[int]:
+        """Incrementa as versões e devolve as novas, na ordem de `keys`."""
+        now = time.time()
+        bumped = []
+        with self._lock:
+            for key in keys:
+                version, _ = self._versions.get(key, (0, now))
+                self._versions[key] = (version + 1, now)
+                bumped.append(version + 1)
+        return bumped
+
+
+class InMemorySharedVersions(LocalVersions):
+    """Fake dos contadores compartilhados: mesma interface, época fixa."""
+
+    def __init__(self):
+        super().__init__()
+        self.epoch = "shared"
+
+
+class RedisVersions:
+    """Contadores compartilhados entre workers. Requer o pacote opcional `redis`."""
+
+    def __init__(self, url: str, prefix: str = "http:"):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("O cache HTTP 'redis://' requer o pacote 'redis' instalado.") from exc
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+        # A época vive no Redis: se ele for esvaziado, os ETags emitidos antes deixam de valer.
+        self._client.set(f"{prefix}epoch", f"{secrets.token_hex(4)}:{time.time()}", nx=True)
+
+    def get(self, key: str) -> Version:
+        pipeline = self._client.pipeline()
+        pipeline.get(f"{self._prefix}epoch")
+        pipeline.hmget(f"{self._prefix}v:{key}", "version", "at")
+        raw_epoch, (version, modified_at) = pipeline.execute()
+        if raw_epoch is None:
+            self._client.set(f"{self._prefix}epoch", f"{secrets.token_hex(4)}:{time.time()}", nx=True)
+            return self.get(key)
+        epoch, started_at = raw_epoch.decode().split(":")
+        return epoch, int(version or 0), float(modified_at or started_at)
+
+    def bump(self, *keys: str) -> List[int]:
+        now = time.time()
+        pipeline = self._client.pipeline()
+        for key in keys:
+            pipeline.hincrby(f"{self._prefix}v:{key}", "version", 1)
+            pipeline.hset(f"{self._prefix}v:{key}", "at", now)
+        return pipeline.execute()[::2]
+
+
+def versions_from_url(url: Optional[str], prefix: str = "http:"):
+    """Vazio = local, 'memory://' = fake compartilhado, 'redis://' = Redis."""
+    if not url:
+        return LocalVersions()
+    if url.startswith("memory://"):
+        return InMemorySharedVersions()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisVersions(url, prefix=prefix)
+    raise ValueError(f"Backend do cache HTTP desconhecido: {url}")
+
+
+# --- Respostas serializadas ---
+
+class ResponseCache:
+    """LRU de corpos JSON limitado pela soma dos tamanhos, com invalidação por chave."""
+
+    def __init__(self, max_bytes: int = HTTP_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        # (chave, variante) -> (versão, corpo, cabeçalhos extras como X-Next-Cursor)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Version, bytes, dict]]" = OrderedDict()
+        self._variants: Dict[str, set] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str, variant: str, version: Version) -> Optional[Tuple[bytes, dict]]:
+        with self._lock:
+            entry = self._entries.get((key, variant))
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((key, variant))
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def set(self, key: str, variant: str, version: Version, body: bytes, headers: dict) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            self._discard((key, variant))
+            self._entries[(key, variant)] = (version, body, headers)
+            self._variants.setdefault(key, set()).add(variant)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+
+    def invalidate(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                for variant in list(self._variants.get(key, ())):
+                    self._discard((key, variant))
+                    self.invalidations += 1
+
+    def _discard(self, entry_key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(entry_key, None)
+        if entry is None:
+            return
+        self.size -= len(entry[1])
+        key, variant = entry_key
+        variants = self._variants.get(key)
+        if variants is not None:
+            variants.discard(variant)
+            if not variants:
+                del self._variants[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(versions).__name__,
+            "size": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "not_modified": self.not_modified,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+versions = versions_from_url(HTTP_CACHE_URL)
+responses = ResponseCache()
+cache.CACHES["http"] = responses
+
+_adapters: Dict[Any, Tuple[TypeAdapter, str]] = {}
+
+
+def _adapter(response_type) -> Tuple[TypeAdapter, str]:
+    """TypeAdapter do schema e uma impressão digital dele (muda quando o schema muda)."""
+    if response_type not in _adapters:
+        adapter = TypeAdapter(response_type)
+        schema = json.dumps(adapter.json_schema(), sort_keys=True).encode()
+        _adapters[response_type] = (adapter, hashlib.sha1(schema).hexdigest()[:8])
+    return _adapters[response_type]
+
+
+# --- API usada pelas rotas ---
+
+class Conditional:
+    """Estado de uma leitura condicional: a versão lida antes de consultar o banco."""
+
+    def __init__(self, request: Request, key: str, response_type):
+        self.key = key
+        # Rotas diferentes podem usar a mesma chave (post:{id} serve o post e os comentários).
+        self.variant = f"{request.url.path}?{request.url.query}"
+        self.adapter, fingerprint = _adapter(response_type)
+        self.fast_encode = serializers.encoder_for(response_type)
+        self.version = versions.get(key)
+        epoch, number, modified_at = self.version
+        self.etag = f'"{epoch}-{fingerprint}-{number}"'
+        self.headers = {
+            "ETag": self.etag,
+            "Last-Modified": formatdate(modified_at, usegmt=True),
+            "Cache-Control": "no-cache",
+        }
+        self.if_none_match = request.headers.get("if-none-match")
+
+    def cached_response(self) -> Optional[Response]:
+        """304 se o cliente já tem esta versão, ou os bytes guardados dela."""
+        if not HTTP_CACHE_ENABLED:
+            return None
+        # Comparação fraca (RFC 9110): a compressão devolve o ETag como W/"...".
+        if self.if_none_match and self.etag in (tag.strip().removeprefix("W/") for tag in self.if_none_match.split(",")):
+            responses.not_modified += 1
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=self.headers)
+        cached = responses.get(self.key, self.variant, self.version)
+        if cached is not None:
+            body, extra_headers = cached
+            return Response(content=body, media_type="application/json", headers={**self.headers, **extra_headers})
+        return None
+
+    def respond(self, value: Any, headers: Optional[dict] = None) -> Response:
+        """Serializa `value` pelo schema da rota, guarda os bytes e responde com o ETag."""
+        with instrumentation.timed_serialization():
+            if self.fast_encode is not None:
+                body = self.fast_encode(value)
+            else:
+                body = self.adapter.dump_json(self.adapter.validate_python(value, from_attributes=True))
+        headers = headers or {}
+        if HTTP_CACHE_ENABLED:
+            responses.set(self.key, self.variant, self.version, body, headers)
+        return Response(content=body, media_type="application/json", headers={**self.headers, **headers})
+
+    def stream(self, chunks: Iterable[bytes]) -> StreamingResponse:
+        """Resposta em partes com o ETag desta versão. Não vai para o cache de bytes."""
+        return StreamingResponse(chunks, media_type="application/json", headers=self.headers)
+
+
+def conditional(request: Request, key: str, response_type) -> Conditional:
+    """
+    Deve ser chamada antes de qualquer consulta: assim a resposta montada em
+    seguida é pelo menos tão nova quanto a versão que vai no ETag.
+    """
+    return Conditional(request, key, response_type)
+
+
+def bump(*keys: str) -> None:
+    """Marca os recursos como alterados. Chamar depois do commit."""
+    versions.bump(*keys)
+    responses.invalidate(*keys)
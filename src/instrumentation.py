@@ -0,0 +1,334 @@
+"""
+Instrumentação das requisições: consultas SQL, tempos e perfil de amostragem.
+
+Cada requisição HTTP ganha um `RequestStats` num ContextVar (o threadpool e o
+`run_sync` do modo assíncrono herdam o contexto). Os eventos do engine em
+`database.py` somam nele o número de statements e o tempo de SQL; a rota
+(`InstrumentedRoute`) registra o template do caminho e o tempo de serialização
+da resposta; o middleware fecha a conta no início da resposta e alimenta os
+histogramas por rota de GET /metrics (formato Prometheus).
+
+- `SERVER_TIMING=true` devolve a mesma quebra no cabeçalho `Server-Timing`,
+  visível na aba Network do navegador.
+- O detector de N+1 avisa no log (e em `http_n_plus_one_total`) quando um
+  mesmo statement roda `N_PLUS_ONE_THRESHOLD` vezes ou mais numa requisição,
+  o padrão típico de um lazy load dentro de um laço.
+- `PROFILER_ENABLED=true` liga GET /debug/profile, que amostra as pilhas de
+  todas as threads por alguns segundos e devolve o formato "collapsed" dos
+  flame graphs (uma pilha por linha, seguida do número de amostras).
+
+Os números são por processo: com vários workers, cada um expõe os seus.
+"""
+import functools
+import inspect
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
+
+from . import cache
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() in ("1", "true", "yes")
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "30"))
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+# --- Estado da requisição ---
+
+@dataclass
+class RequestStats:
+    method: str
+    route: str = "unmatched"
+    status: int = 500
+    queries: int = 0
+    sql_seconds: float = 0.0
+    serialize_seconds: float = 0.0
+    total_seconds: Optional[float] = None
+    statements: Counter = field(default_factory=Counter)
+    endpoint_done_at: Optional[float] = None
+
+    def server_timing(self) -> str:
+        app_seconds = max(0.0, (self.total_seconds or 0.0) - self.sql_seconds - self.serialize_seconds)
+        return ", ".join((
+            f'db;dur={self.sql_seconds * 1000:.2f};desc="{self.queries} queries"',
+            f"serialize;dur={self.serialize_seconds * 1000:.2f}",
+            f"app;dur={app_seconds * 1000:.2f}",
+            f"total;dur={(self.total_seconds or 0.0) * 1000:.2f}",
+        ))
+
+    def repeated_statements(self) -> List[Tuple[str, int]]:
+        return [(statement, count) for statement, count in self.statements.items() if count >= N_PLUS_ONE_THRESHOLD]
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+def current() -> Optional[RequestStats]:
+    return _current.get()
+
+
+# --- Eventos do engine ---
+
+def instrument_engine(engine) -> None:
+    """Conta statements e tempo de SQL da requisição corrente (engine síncrono ou `sync_engine`)."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stats = _current.get()
+        if stats is None or not conn.info.get("query_started_at"):
+            return
+        stats.sql_seconds += time.perf_counter() - conn.info["query_started_at"].pop()
+        stats.queries += 1
+        stats.statements[statement] += 1
+
+
+# --- Serialização ---
+
+class timed_serialization:
+    """Context manager para serializações feitas dentro da rota (modo rápido, cache HTTP)."""
+
+    __slots__ = ("started",)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        stats = _current.get()
+        if stats is not None:
+            stats.serialize_seconds += time.perf_counter() - self.started
+        return False
+
+def _mark_endpoint_done() -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.endpoint_done_at = time.perf_counter()
+
+def _timed_endpoint(endpoint):
+    # functools.wraps preserva a assinatura (via __wrapped__) que o FastAPI inspeciona.
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _mark_endpoint_done()
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                _mark_endpoint_done()
+    return wrapper
+
+
+class InstrumentedRoute(APIRoute):
+    """
+    Rota que identifica a requisição pelo template do caminho ("/posts/{post_id}")
+    e mede a serialização do FastAPI: o tempo entre o fim da função da rota e a
+    resposta pronta (validação do response_model e JSON).
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint) if METRICS_ENABLED else endpoint, **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        if not METRICS_ENABLED:
+            return handler
+        route = self.path
+
+        async def instrumented_handler(request):
+            stats = _current.get()
+            if stats is not None:
+                stats.route = route
+            response = await handler(request)
+            if stats is not None and stats.endpoint_done_at is not None:
+                stats.serialize_seconds += time.perf_counter() - stats.endpoint_done_at
+                stats.endpoint_done_at = None
+            return response
+
+        return instrumented_handler
+
+
+# --- Métricas ---
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+
+
+class Registry:
+    """Histogramas por (método, rota) e contadores por status; render() gera o texto do Prometheus."""
+
+    HISTOGRAMS = {
+        "http_request_duration_seconds": ("Latência até o início da resposta.", LATENCY_BUCKETS),
+        "http_request_sql_duration_seconds": ("Tempo em statements SQL por requisição.", LATENCY_BUCKETS),
+        "http_request_serialization_seconds": ("Tempo serializando a resposta.", LATENCY_BUCKETS),
+        "http_request_sql_queries": ("Statements SQL por requisição.", QUERY_COUNT_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[Tuple[str, str], Histogram]] = {name: {} for name in self.HISTOGRAMS}
+        self._requests: Counter = Counter()
+        self._n_plus_one: Counter = Counter()
+
+    def observe(self, stats: RequestStats) -> None:
+        labels = (stats.method, stats.route)
+        values = {
+            "http_request_duration_seconds": stats.total_seconds or 0.0,
+            "http_request_sql_duration_seconds": stats.sql_seconds,
+            "http_request_serialization_seconds": stats.serialize_seconds,
+            "http_request_sql_queries": stats.queries,
+        }
+        repeated = stats.repeated_statements()
+        with self._lock:
+            for name, value in values.items():
+                histogram = self._histograms[name].get(labels)
+                if histogram is None:
+                    histogram = self._histograms[name][labels] = Histogram(self.HISTOGRAMS[name][1])
+                histogram.observe(value)
+            self._requests[(stats.method, stats.route, stats.status)] += 1
+            if repeated:
+                self._n_plus_one[labels] += 1
+        for statement, count in repeated:
+            logger.warning(
+                "Possível N+1 em %s %s: %d execuções de %s", stats.method, stats.route, count, " ".join(statement.split())[:200])
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, (help_text, _) in self.HISTOGRAMS.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for (method, route), histogram in sorted(self._histograms[name].items()):
+                    labels = f'method="{method}",route="{route}"'
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    cumulative += histogram.counts[-1]
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+                    lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+                    lines.append(f"{name}_count{{{labels}}} {cumulative}")
+            lines += ["# HELP http_requests_total Requisições por rota e status.", "# TYPE http_requests_total counter"]
+            for (method, route, status), count in sorted(self._requests.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+            lines += [
+                "# HELP http_n_plus_one_total Requisições com statements repetidos (possível N+1).",
+                "# TYPE http_n_plus_one_total counter",
+            ]
+            for (method, route), count in sorted(self._n_plus_one.items()):
+                lines.append(f'http_n_plus_one_total{{method="{method}",route="{route}"}} {count}')
+        # Acertos e erros dos caches em memória (o mesmo de /metrics/cache); a razão sai na consulta.
+        for field, help_text in (("hits", "Leituras atendidas pelo cache."), ("misses", "Leituras que o cache não atendeu.")):
+            lines += [f"# HELP cache_{field}_total {help_text}", f"# TYPE cache_{field}_total counter"]
+            for name, item in sorted(cache.CACHES.items()):
+                lines.append(f'cache_{field}_total{{cache="{name}"}} {item.stats()[field]}')
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+
+# --- Middleware ---
+
+class InstrumentationMiddleware:
+    """Middleware ASGI puro: não quebra streaming (SSE) nem a propagação do contexto."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats(method=scope["method"])
+        token = _current.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                stats.status = message["status"]
+                stats.total_seconds = time.perf_counter() - started
+                if SERVER_TIMING:
+                    MutableHeaders(scope=message).append("Server-Timing", stats.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if stats.total_seconds is None:
+                stats.total_seconds = time.perf_counter() - started
+            registry.observe(stats)
+            logger.debug(
+                "%s %s %d: %d queries, sql %.2f ms, serialização %.2f ms, total %.2f ms",
+                stats.method, stats.route, stats.status, stats.queries, stats.sql_seconds * 1000,
+                stats.serialize_seconds * 1000, stats.total_seconds * 1000,
+            )
+
+
+# --- Perfil de amostragem ---
+
+_profile_lock = threading.Lock()
+
+def _collapsed_stack(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+def sample_stacks(seconds: float, interval: float) -> Optional[str]:
+    """
+    Amostra as pilhas de todas as threads (menos a própria) a cada `interval`
+    segundos. Retorna o formato collapsed, mais frequentes primeiro, ou None se
+    já houver um perfil em andamento.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    try:
+        me = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        samples: Counter = Counter()
+        deadline = time.monotonic() + min(seconds, PROFILER_MAX_SECONDS)
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != me:
+                    samples[f"{names.get(thread_id, thread_id)};{_collapsed_stack(frame)}"] += 1
+            time.sleep(interval)
+        return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+    finally:
+        _profile_lock.release()
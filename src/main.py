@@ -1,17 +1,50 @@
-from fastapi import FastAPI, Depends, HTTPException, status
-from sqlalchemy.orm import Session, selectinload
-from typing import List, Any
-from .database import create_tables
-from . import models, schemas, auth, dependencies # Importa o novo arquivo
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, Header, HTTPException, Request, Response, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session, joinedload
+from typing import Iterator, List, Literal, Optional
+from . import (
+    models, schemas, auth, dependencies, timeline, cache, membership, migrations, events, http_cache,
+    serializers, read_models, bulk, search, deletion, instrumentation, compression, database, hot_posts,
+    rate_limit, write_batch,
+)
 from fastapi.middleware.cors import CORSMiddleware
 
-create_tables()
+GROUPS_DEFAULT_LIMIT = 50
+GROUPS_MAX_LIMIT = 200
+COMMENTS_DEFAULT_LIMIT = 20
+COMMENTS_MAX_LIMIT = 100
+# comments=all a partir deste tamanho de thread sai em partes, lida de um cursor no servidor.
+COMMENTS_STREAM_THRESHOLD = int(os.getenv("COMMENTS_STREAM_THRESHOLD", "1000"))
+COMMENTS_STREAM_BATCH = int(os.getenv("COMMENTS_STREAM_BATCH", "500"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Com vários workers o run.py aplica as migrações uma vez no processo mestre
+    # e desliga MIGRATE_ON_STARTUP, para que os workers não disputem o DDL.
+    if migrations.MIGRATE_ON_STARTUP:
+        migrations.upgrade()
+    # Exclusões interrompidas por um reinício continuam de onde pararam.
+    deletion.worker.resume()
+    yield
+    deletion.worker.stop()
+    write_batch.committer.stop()
+    auth.shutdown_hash_pool()
+    events.hub.close()
 
 app = FastAPI(
     title="Fórum API com Grupos",
     version="1.0.0",
-    description="Uma API para um fórum com sistema de grupos, autenticação e posts."
+    description="Uma API para um fórum com sistema de grupos, autenticação e posts.",
+    lifespan=lifespan
 )
+# Antes de qualquer rota: cada uma passa a registrar seu template e o tempo de serialização.
+app.router.route_class = instrumentation.InstrumentedRoute
+
+# Primeiro da lista, então o mais interno: os 503 também levam os cabeçalhos do CORS.
+app.add_middleware(rate_limit.AdmissionMiddleware)
 
 # --- Configuração do CORS ---
 origins = ["http://localhost:3000"]
@@ -21,7 +54,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing", "Retry-After"],
 )
+app.add_middleware(compression.CompressionMiddleware)
+# Adicionado por último para ser o mais externo: o tempo total inclui o CORS e a compressão.
+app.add_middleware(instrumentation.InstrumentationMiddleware)
 
 # A função get_db() foi movida para dependencies.py e não está mais aqui.
 
@@ -29,93 +66,219 @@ app.add_middleware(
 # ===                  ENDPOINTS DE AUTENTICAÇÃO                  ===
 # =================================================================
 
-@app.post("/register/", response_model=schemas.AuthorRead, status_code=status.HTTP_201_CREATED, tags=["Auth"])
-def register(author_create: schemas.AuthorCreate, db: Session = Depends(dependencies.get_db)):
+# register e login são assíncronas: o bcrypt roda no pool de processos de auth.py
+# e os acessos ao banco passam por dependencies.run_db (threadpool ou AsyncSession).
+# Nenhuma conexão fica presa durante o bcrypt: com SQLITE_TUNING o pool de escrita
+# tem uma só, e segurá-la por um hash enfileiraria todas as outras escritas.
+
+def _ensure_author_is_new(db: Session, author_create: schemas.AuthorCreate) -> None:
     existing_user = db.query(models.Author).filter(models.Author.username == author_create.username).first()
     if existing_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Usuário com este username já existe")
     existing_email = db.query(models.Author).filter(models.Author.email == author_create.email).first()
     if existing_email:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Usuário com este email já existe")
-    hashed_password = auth.hash_password(author_create.password)
+
+def _insert_author(db: Session, author_create: schemas.AuthorCreate, hashed_password: str) -> models.Author:
     db_author = models.Author(username=author_create.username, email=author_create.email, password=hashed_password)
     db.add(db_author)
     db.commit()
     db.refresh(db_author)
     return db_author
 
-@app.post("/login/", response_model=schemas.Token, tags=["Auth"])
-def login(form_data: schemas.UserLogin, db: Session = Depends(dependencies.get_db)):
-    db_user = db.query(models.Author).filter(models.Author.username == form_data.username).first()
-    if not db_user or not auth.verify_password(form_data.password, db_user.password):
+def _find_author_by_username(db: Session, username: str):
+    """Só as colunas do login, numa Row: continua legível depois do rollback que solta a conexão."""
+    return db.execute(
+        select(models.Author.id, models.Author.username, models.Author.password, models.Author.membership_version)
+        .where(models.Author.username == username, models.Author.deleted_at.is_(None))
+    ).first()
+
+def _update_password_hash(db: Session, author_id: int, hashed_password: str) -> None:
+    db.execute(update(models.Author).where(models.Author.id == author_id).values(password=hashed_password))
+    db.commit()
+
+@app.post("/register/", response_model=schemas.AuthorRead, status_code=status.HTTP_201_CREATED, tags=["Auth"], dependencies=[Depends(rate_limit.limit("register"))])
+async def register(author_create: schemas.AuthorCreate, db: Session = Depends(dependencies.get_db)):
+    await dependencies.run_db(db, _ensure_author_is_new, author_create)
+    # Encerra a transação da checagem: a conexão de escrita volta ao pool antes do bcrypt.
+    await dependencies.run_db(db, Session.rollback)
+    hashed_password = await auth.hash_password_async(author_create.password)
+    return await dependencies.run_db(db, _insert_author, author_create, hashed_password)
+
+@app.post("/login/", response_model=schemas.Token, tags=["Auth"], dependencies=[Depends(rate_limit.limit("login"))])
+async def login(form_data: schemas.UserLogin, db: Session = Depends(dependencies.get_read_db), write_db: Session = Depends(dependencies.get_db)):
+    db_user = await dependencies.run_db(db, _find_author_by_username, form_data.username)
+    await dependencies.run_db(db, Session.rollback)
+    if not db_user or not await auth.verify_password_async(form_data.password, db_user.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciais inválidas", headers={"WWW-Authenticate": "Bearer"})
-    access_token = auth.create_token(data={"sub": db_user.username})
+    if auth.password_needs_rehash(db_user.password):
+        # O custo configurado mudou: aproveita a senha em texto puro para atualizar o hash.
+        # Se o pool estiver saturado, tenta de novo no próximo login.
+        try:
+            new_hash = await auth.hash_password_async(form_data.password)
+            await dependencies.run_db(write_db, _update_password_hash, db_user.id, new_hash)
+        except HTTPException:
+            pass
+    access_token = auth.create_token(data={"sub": db_user.username, "uid": db_user.id, "mv": db_user.membership_version})
     return {"access_token": access_token, "token_type": "bearer"}
 
+@app.post("/logout/", tags=["Auth"])
+@dependencies.db_endpoint
+def logout(db: Session = Depends(dependencies.get_db), claims: auth.TokenClaims = Depends(auth.get_token_claims)):
+    """(PROTEGIDA) Revoga o token usado na requisição até a expiração dele."""
+    auth.revocations.revoke(db, claims)
+    db.commit()
+    return {"message": "Sessão encerrada"}
+
 @app.get("/users/me/", response_model=schemas.AuthorReadWithGroups, tags=["Auth"])
-async def read_users_me(current_user: models.Author = Depends(auth.get_current_active_user)):
+async def read_users_me(current_user: auth.Principal = Depends(auth.get_current_active_user)):
     return current_user
 
+@app.delete("/users/me/", response_model=schemas.DeletionJobRead, status_code=status.HTTP_202_ACCEPTED, tags=["Auth"])
+@dependencies.db_endpoint
+def delete_current_user(response: Response, db: Session = Depends(dependencies.get_db), current_user: auth.Principal = Depends(auth.get_current_active_user)):
+    """
+    (PROTEGIDA) Exclui a conta do usuário, com seus posts, comentários e os grupos
+    que ele criou. A conta deixa de autenticar e some das leituras na hora; as
+    linhas são removidas em segundo plano (acompanhe por GET /jobs/{id}).
+    """
+    job, group_ids = deletion.hide_author(db, current_user.id)
+    usernames = {current_user.username}
+    for group_id in group_ids:
+        usernames.update(membership.member_usernames(db, group_id))
+    hidden_posts = db.query(models.Post.id, models.Post.author_id, models.Post.group_id).filter(
+        (models.Post.author_id == current_user.id) | models.Post.group_id.in_(group_ids)).all()
+    commented_posts = db.query(models.Post.id, models.Post.author_id, models.Post.group_id).join(
+        models.Comment, models.Comment.post_id == models.Post.id).filter(models.Comment.commenter_id == current_user.id).distinct().all()
+    job_read = schemas.DeletionJobRead.from_job(job)
+    db.commit()
+    deletion.worker.submit(job_read.id)
+    auth.invalidate_principals(*usernames)
+    http_cache.bump(
+        "groups", *{f"group:{group_id}" for group_id in group_ids}, *{f"group:{group.id}" for group in current_user.groups},
+        *{f"post:{post.id}" for post in hidden_posts + commented_posts},
+        *{f"author_posts:{post.author_id}" for post in hidden_posts + commented_posts},
+    )
+    hot_posts.invalidate(*{*group_ids, *(post.group_id for post in hidden_posts + commented_posts)})
+    for group_id in group_ids:
+        events.hub.publish("group.deleted", {"id": group_id}, group_id=group_id)
+    response.headers["Location"] = f"/jobs/{job_read.id}"
+    return job_read
+
 # =================================================================
 # ===                 ENDPOINTS DE GRUPOS (FÓRUNS)                ===
 # =================================================================
 
 @app.get("/groups/", response_model=List[schemas.GroupRead], tags=["Groups"])
-def get_all_groups(db: Session = Depends(dependencies.get_db)):
-    groups = db.query(models.Group).options(selectinload(models.Group.creator)).all()
-    return groups
+@dependencies.db_endpoint
+def get_all_groups(
+    request: Request,
+    q: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = GROUPS_DEFAULT_LIMIT,
+    db: Session = Depends(dependencies.get_read_db)
+):
+    """
+    Lista os grupos em ordem de nome, paginada por cursor: `after` recebe o valor
+    de `X-Next-Cursor` da página anterior. `q` filtra pelo início do nome.
+    """
+    conditional = http_cache.conditional(request, "groups", List[schemas.GroupRead])
+    cached = conditional.cached_response()
+    if cached is not None:
+        return cached
+    limit = max(1, min(limit, GROUPS_MAX_LIMIT))
+    # Faixa de prefixo em vez de LIKE: usa o índice de `name` em qualquer banco.
+    groups = read_models.groups_page(db, q, after, limit)
+    headers = {"X-Next-Cursor": groups[-1].name} if len(groups) == limit else {}
+    return conditional.respond(groups, headers)
 
-@app.get("/groups/{group_id}/details", response_model=Any, tags=["Groups"])
-def get_group_details(group_id: int, db: Session = Depends(dependencies.get_db)):
-    group = db.query(models.Group).options(selectinload(models.Group.creator), selectinload(models.Group.members)).filter(models.Group.id == group_id).first()
+@app.get("/groups/{group_id}/details", response_model=schemas.GroupDetails, tags=["Groups"])
+@dependencies.db_endpoint
+def get_group_details(group_id: int, request: Request, db: Session = Depends(dependencies.get_read_db)):
+    conditional = http_cache.conditional(request, f"group:{group_id}", schemas.GroupDetails)
+    cached = conditional.cached_response()
+    if cached is not None:
+        return cached
+    group = read_models.group_detail(db, group_id)
     if not group:
         raise HTTPException(status_code=404, detail="Grupo não encontrado")
-    class GroupDetails(schemas.GroupRead):
-        members: List[schemas.AuthorRead] = []
-    return GroupDetails.from_orm(group)
+    return conditional.respond(group)
+
+@app.get("/groups/{group_id}/members", response_model=List[schemas.AuthorRead], tags=["Groups"])
+@dependencies.db_endpoint
+def get_group_members(
+    group_id: int,
+    response: Response,
+    after: Optional[int] = None,
+    limit: int = GROUPS_DEFAULT_LIMIT,
+    db: Session = Depends(dependencies.get_read_db)
+):
+    """Membros do grupo em ordem de id, paginados por cursor (`after` = último id recebido)."""
+    if db.query(models.Group.id).filter(models.Group.id == group_id, models.Group.deleted_at.is_(None)).first() is None:
+        raise HTTPException(status_code=404, detail="Grupo não encontrado")
+    limit = max(1, min(limit, GROUPS_MAX_LIMIT))
+    members = membership.list_members(db, group_id, after, limit)
+    if len(members) == limit:
+        response.headers["X-Next-Cursor"] = str(members[-1].id)
+    return members
 
 @app.post("/groups/", response_model=schemas.GroupRead, status_code=status.HTTP_201_CREATED, tags=["Groups"])
-def create_group(group_create: schemas.GroupCreate, db: Session = Depends(dependencies.get_db), current_user: models.Author = Depends(auth.get_current_active_user)):
+@dependencies.db_endpoint
+def create_group(group_create: schemas.GroupCreate, db: Session = Depends(dependencies.get_db), current_user: auth.Principal = Depends(auth.get_current_active_user)):
     db_group = models.Group(**group_create.model_dump(), creator_id=current_user.id)
-    db_group.members.append(current_user)
     db.add(db_group)
+    db.flush()
+    membership.add_member(db, current_user.id, db_group.id)
     db.commit()
-    db.refresh(db_group)
-    return db_group
+    auth.invalidate_principals(current_user.username)
+    http_cache.bump("groups")
+    events.hub.publish("membership", {"group_id": db_group.id, "joined": True}, author_id=current_user.id)
+    return schemas.GroupRead(id=db_group.id, name=db_group.name, description=db_group.description, creator=current_user, member_count=1)
 
 @app.post("/groups/{group_id}/join", status_code=status.HTTP_200_OK, tags=["Groups"])
-def join_group(group_id: int, db: Session = Depends(dependencies.get_db), current_user: models.Author = Depends(auth.get_current_active_user)):
-    group = db.query(models.Group).filter(models.Group.id == group_id).first()
+@dependencies.db_endpoint
+def join_group(group_id: int, db: Session = Depends(dependencies.get_db), current_user: auth.Principal = Depends(auth.get_current_active_user)):
+    group = db.query(models.Group.id, models.Group.name).filter(models.Group.id == group_id, models.Group.deleted_at.is_(None)).first()
     if not group:
         raise HTTPException(status_code=404, detail="Grupo não encontrado")
-    if current_user in group.members:
+    if not membership.add_member(db, current_user.id, group.id):
         raise HTTPException(status_code=400, detail="Você já é membro deste grupo")
-    group.members.append(current_user)
+    timeline.add_group_for_author(db, current_user.id, group.id)
     db.commit()
+    auth.invalidate_principals(current_user.username)
+    http_cache.bump("groups", f"group:{group.id}")
+    events.hub.publish("membership", {"group_id": group.id, "joined": True}, author_id=current_user.id)
     return {"message": f"Você entrou no grupo '{group.name}' com sucesso"}
 
 @app.post("/groups/{group_id}/leave", status_code=status.HTTP_200_OK, tags=["Groups"])
-def leave_group(group_id: int, db: Session = Depends(dependencies.get_db), current_user: models.Author = Depends(auth.get_current_active_user)):
-    group = db.query(models.Group).filter(models.Group.id == group_id).first()
+@dependencies.db_endpoint
+def leave_group(group_id: int, db: Session = Depends(dependencies.get_db), current_user: auth.Principal = Depends(auth.get_current_active_user)):
+    group = db.query(models.Group.id, models.Group.name).filter(models.Group.id == group_id, models.Group.deleted_at.is_(None)).first()
     if not group:
         raise HTTPException(status_code=404, detail="Grupo não encontrado")
-    if current_user not in group.members:
+    if not membership.remove_member(db, current_user.id, group.id):
         raise HTTPException(status_code=400, detail="Você não é membro deste grupo")
-    group.members.remove(current_user)
+    timeline.remove_group_for_author(db, current_user.id, group.id)
     db.commit()
+    auth.invalidate_principals(current_user.username)
+    http_cache.bump("groups", f"group:{group.id}")
+    events.hub.publish("membership", {"group_id": group.id, "joined": False}, author_id=current_user.id)
     return {"message": f"Você saiu do grupo '{group.name}' com sucesso"}
 
-@app.delete("/groups/{group_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Groups"])
+@app.delete("/groups/{group_id}", response_model=schemas.DeletionJobRead, status_code=status.HTTP_202_ACCEPTED, tags=["Groups"])
+@dependencies.db_endpoint
 def delete_group(
     group_id: int,
+    response: Response,
     db: Session = Depends(dependencies.get_db),
-    current_user: models.Author = Depends(auth.get_current_active_user)
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
 ):
     """
     (PROTEGIDA) Permite que o CRIADOR de um grupo o exclua.
-    Isso também excluirá todos os posts e comentários associados devido ao 'cascade' no modelo.
+    O grupo some das leituras na hora; posts, comentários e membros são removidos
+    em segundo plano por src/deletion.py. O andamento fica em GET /jobs/{id} (Location).
     """
-    group = db.query(models.Group).filter(models.Group.id == group_id).first()
+    group = db.query(models.Group.id, models.Group.creator_id).filter(models.Group.id == group_id, models.Group.deleted_at.is_(None)).first()
     
     if not group:
         raise HTTPException(status_code=404, detail="Grupo não encontrado")
@@ -123,52 +286,198 @@ def delete_group(
     if group.creator_id != current_user.id:
         raise HTTPException(status_code=403, detail="Você não tem permissão para excluir este grupo")
         
-    db.delete(group)
+    member_usernames = membership.member_usernames(db, group.id)
+    hidden_posts = db.query(models.Post.id, models.Post.author_id).filter(models.Post.group_id == group.id).all()
+    job = deletion.hide_group(db, group.id, current_user.id)
+    job_read = schemas.DeletionJobRead.from_job(job)
     db.commit()
-    return None
+    deletion.worker.submit(job_read.id)
+    auth.invalidate_principals(*member_usernames)
+    http_cache.bump(
+        "groups", f"group:{group_id}",
+        *{f"post:{post.id}" for post in hidden_posts},
+        *{f"author_posts:{post.author_id}" for post in hidden_posts},
+    )
+    hot_posts.invalidate(group_id)
+    events.hub.publish("group.deleted", {"id": group_id}, group_id=group_id)
+    response.headers["Location"] = f"/jobs/{job_read.id}"
+    return job_read
+
+@app.get("/jobs/{job_id}", response_model=schemas.DeletionJobRead, tags=["Groups"])
+@dependencies.db_endpoint
+def get_deletion_job(job_id: int, db: Session = Depends(dependencies.get_read_db), username: str = Depends(auth.get_token_username)):
+    """
+    (PROTEGIDA) Andamento de uma exclusão pedida pelo usuário. Aceita o token de
+    uma conta em exclusão; depois que a conta some de vez, o job responde 404.
+    """
+    requester = select(models.Author.id).where(models.Author.username == username).scalar_subquery()
+    job = db.query(models.DeletionJob).filter(models.DeletionJob.id == job_id, models.DeletionJob.requested_by == requester).first()
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return schemas.DeletionJobRead.from_job(job)
 
 # =================================================================
 # ===                  ENDPOINTS DE POSTS E COMENTÁRIOS           ===
 # =================================================================
 
-@app.get("/posts/", response_model=List[schemas.PostRead], tags=["Posts"])
-def get_user_feed(db: Session = Depends(dependencies.get_db), current_user: models.Author = Depends(auth.get_current_active_user)):
-    user_group_ids = [group.id for group in current_user.groups]
-    if not user_group_ids:
+def _change_post_count(db: Session, group_id: int, delta: int) -> None:
+    db.execute(update(models.Group).where(models.Group.id == group_id).values(post_count=models.Group.post_count + delta))
+
+def _change_comment_count(db: Session, post_id: int, delta: int) -> None:
+    db.execute(update(models.Post).where(models.Post.id == post_id).values(comment_count=models.Post.comment_count + delta))
+
+def _write_batched(kind: str, author: auth.Principal, item):
+    """Grava o item no próximo lote de write_batch; erros de validação viram o HTTPException da rota."""
+    result, record = write_batch.committer.submit(kind, author, item)
+    if record is None:
+        raise HTTPException(status_code=result.status, detail=result.detail)
+    return record
+
+def _comments_cursor(comments: list, limit: int) -> Optional[str]:
+    """Cursor da próxima página de comentários, se esta veio cheia."""
+    return timeline.encode_cursor(comments[-1].date, comments[-1].id) if len(comments) == limit else None
+
+@app.get("/posts/", response_model=List[schemas.FeedPostRead], tags=["Posts"])
+@dependencies.db_endpoint
+def get_user_feed(
+    response: Response,
+    before: Optional[str] = None,
+    limit: int = timeline.FEED_DEFAULT_LIMIT,
+    db: Session = Depends(dependencies.get_read_db),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
+):
+    """
+    (PROTEGIDA) Feed paginado por cursor. `before` recebe o valor do cabeçalho
+    `X-Next-Cursor` da página anterior ('<data ISO>,<id do post>').
+    """
+    try:
+        cursor = timeline.decode_cursor(before) if before else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    limit = max(1, min(limit, timeline.FEED_MAX_LIMIT))
+
+    # Com as listas dos grupos em cache, a página sai sem nenhuma consulta.
+    page = hot_posts.read_feed(db, current_user.group_ids, cursor, limit)
+    if page is not None:
+        headers = {"X-Next-Cursor": hot_posts.next_cursor(page[-1])} if len(page) == limit else None
+        return hot_posts.feed_response(page, headers)
+
+    posts = timeline.read_page(db, current_user.id, cursor, limit)
+    if not posts:
         return []
-    posts = (
-        db.query(models.Post).filter(models.Post.group_id.in_(user_group_ids))
-        .options(selectinload(models.Post.author), selectinload(models.Post.group), selectinload(models.Post.comments).options(selectinload(models.Comment.commenter)))
-        .order_by(models.Post.date.desc()).limit(100).all()
-    )
-    return posts
+    latest = read_models.latest_comments(db, [post.id for post in posts], timeline.FEED_LATEST_COMMENTS)
+
+    headers = {"X-Next-Cursor": timeline.encode_cursor(posts[-1].date, posts[-1].id)} if len(posts) == limit else {}
+    if serializers.FAST_SERIALIZATION:
+        return serializers.json_response(
+            [serializers.dump_feed_post(post, latest[post.id]) for post in posts],
+            headers=headers,
+        )
+    response.headers.update(headers)
+    return [
+        schemas.FeedPostRead(
+            id=post.id, title=post.title, text=post.text, date=post.date,
+            author_id=post.author_id, author=post.author, group=post.group,
+            comment_count=post.comment_count, comments=latest[post.id],
+        )
+        for post in posts
+    ]
 
-@app.post("/posts/", response_model=schemas.PostRead, status_code=status.HTTP_201_CREATED, tags=["Posts"])
-def create_post(post_create: schemas.PostCreate, db: Session = Depends(dependencies.get_db), current_user: models.Author = Depends(auth.get_current_active_user)):
-    group = db.query(models.Group).filter(models.Group.id == post_create.group_id).first()
+@app.post("/posts/", response_model=schemas.PostRead, status_code=status.HTTP_201_CREATED, tags=["Posts"], dependencies=[Depends(rate_limit.limit("create_post"))])
+@dependencies.db_endpoint
+def create_post(post_create: schemas.PostCreate, db: Session = Depends(dependencies.get_db), current_user: auth.Principal = Depends(auth.get_current_active_user)):
+    if write_batch.WRITE_BATCH_ENABLED:
+        return _write_batched("post", current_user, post_create)
+    # Uma única consulta traz o grupo e se o usuário é membro (EXISTS na PK de group_memberships).
+    group = db.query(models.Group.id, models.Group.name, membership.is_member_clause(models.Group.id, current_user.id)).filter(models.Group.id == post_create.group_id, models.Group.deleted_at.is_(None)).first()
     if not group:
         raise HTTPException(status_code=404, detail="Grupo não encontrado")
-    if current_user not in group.members:
+    if not group.is_member:
         raise HTTPException(status_code=403, detail="Você não tem permissão para postar neste grupo")
     db_post_obj = models.Post(**post_create.model_dump(), author_id=current_user.id)
     db.add(db_post_obj)
+    db.flush()
+    timeline.fan_out_post(db, db_post_obj)
+    _change_post_count(db, group.id, 1)
+    # A resposta é montada com o que já está em memória, sem recarregar o post.
+    response = schemas.PostRead(
+        id=db_post_obj.id, title=db_post_obj.title, text=db_post_obj.text, date=db_post_obj.date,
+        author_id=current_user.id, author=current_user,
+        group=schemas.GroupInDB(id=group.id, name=group.name), comments=[],
+    )
     db.commit()
-    db.refresh(db_post_obj)
-    reloaded_post = db.query(models.Post).options(selectinload(models.Post.author), selectinload(models.Post.group), selectinload(models.Post.comments).options(selectinload(models.Comment.commenter))).filter(models.Post.id == db_post_obj.id).first()
-    if not reloaded_post:
-        raise HTTPException(status_code=500, detail="Erro ao recarregar o post após a criação.")
-    return reloaded_post
+    http_cache.bump(f"group:{group.id}", f"author_posts:{current_user.id}")
+    hot_posts.add_post(group.id, response)
+    events.hub.publish("post.created", response.model_dump(mode="json", exclude={"comments"}), group_id=group.id)
+    return response
 
 @app.get("/posts/{post_id}", response_model=schemas.PostRead, tags=["Posts"])
-def get_post_by_id(post_id: int, db: Session = Depends(dependencies.get_db)):
-    db_post = db.query(models.Post).options(selectinload(models.Post.author), selectinload(models.Post.group), selectinload(models.Post.comments).options(selectinload(models.Comment.commenter))).filter(models.Post.id == post_id).first()
+@dependencies.db_endpoint
+def get_post_by_id(
+    post_id: int,
+    request: Request,
+    comments: Literal["page", "all"] = "page",
+    db: Session = Depends(dependencies.get_read_db)
+):
+    """
+    O post com `comment_count` e a primeira página de comentários; as seguintes
+    vêm de GET /posts/{id}/comments a partir de `comments_next_cursor`.
+    `comments=all` traz a thread inteira, como antes; a partir de
+    COMMENTS_STREAM_THRESHOLD comentários ela é codificada e enviada em partes.
+    """
+    conditional = http_cache.conditional(request, f"post:{post_id}", schemas.PostRead)
+    cached = conditional.cached_response()
+    if cached is not None:
+        return cached
+    limit = 0 if comments == "all" else COMMENTS_DEFAULT_LIMIT
+    db_post = read_models.post_detail(db, post_id, comments_limit=limit)
     if db_post is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post não encontrado")
-    return db_post
+    if comments == "all":
+        if db_post.comment_count >= COMMENTS_STREAM_THRESHOLD:
+            return conditional.stream(_stream_post(db_post))
+        read_models.attach_comments(db, [db_post])
+    else:
+        db_post.comments_next_cursor = _comments_cursor(db_post.comments, limit)
+    return conditional.respond(db_post)
+
+def _stream_post(post: read_models.PostView) -> Iterator[bytes]:
+    # Sessão própria: a da dependência não dura até o fim do envio.
+    with database.ReadSessionLocal() as db:
+        yield from serializers.stream_post(post, read_models.iter_comments(db, post.id, COMMENTS_STREAM_BATCH))
+
+@app.get("/posts/{post_id}/comments", response_model=List[schemas.CommentRead], tags=["Comments"])
+@dependencies.db_endpoint
+def get_post_comments(
+    post_id: int,
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = COMMENTS_DEFAULT_LIMIT,
+    db: Session = Depends(dependencies.get_read_db)
+):
+    """
+    Comentários do post em ordem cronológica, paginados por cursor: `cursor`
+    recebe o `X-Next-Cursor` da página anterior (ou o `comments_next_cursor` do post).
+    """
+    try:
+        after = timeline.decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    limit = max(1, min(limit, COMMENTS_MAX_LIMIT))
+    conditional = http_cache.conditional(request, f"post:{post_id}", List[schemas.CommentRead])
+    cached = conditional.cached_response()
+    if cached is not None:
+        return cached
+    if db.execute(select(models.Post.id).where(models.Post.id == post_id, read_models.is_visible_post())).first() is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post não encontrado")
+    page = read_models.comments_page(db, post_id, after, limit)
+    next_cursor = _comments_cursor(page, limit)
+    return conditional.respond(page, headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
 
 @app.put("/posts/{post_id}", response_model=schemas.PostRead, tags=["Posts"])
-def update_post(post_id: int, post_update: schemas.PostUpdate, db: Session = Depends(dependencies.get_db), current_user: models.Author = Depends(auth.get_current_active_user)):
-    db_post_to_update = db.query(models.Post).filter(models.Post.id == post_id).first()
+@dependencies.db_endpoint
+def update_post(post_id: int, post_update: schemas.PostUpdate, db: Session = Depends(dependencies.get_db), current_user: auth.Principal = Depends(auth.get_current_active_user)):
+    db_post_to_update = db.query(models.Post).options(joinedload(models.Post.group)).filter(models.Post.id == post_id, read_models.is_visible_post()).first()
     if db_post_to_update is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post não encontrado")
     if db_post_to_update.author_id != current_user.id:
@@ -176,62 +485,249 @@ def update_post(post_id: int, post_update: schemas.PostUpdate, db: Session = Dep
     update_data = post_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_post_to_update, key, value)
+    db.flush()
+    # O autor é o próprio usuário; a primeira página de comentários vem projetada, como no GET.
+    first_comments = read_models.comments_page(db, post_id, None, COMMENTS_DEFAULT_LIMIT)
+    post_view = read_models.PostView(
+        db_post_to_update.id, db_post_to_update.title, db_post_to_update.text, db_post_to_update.date,
+        current_user.id, read_models.AuthorView(current_user.id, current_user.username, current_user.email),
+        read_models.GroupRefView(db_post_to_update.group.id, db_post_to_update.group.name),
+        comments=first_comments, comment_count=db_post_to_update.comment_count,
+        comments_next_cursor=_comments_cursor(first_comments, COMMENTS_DEFAULT_LIMIT),
+    )
+    response = schemas.PostRead.model_validate(post_view)
     db.commit()
-    db.refresh(db_post_to_update)
-    reloaded_post = db.query(models.Post).options(selectinload(models.Post.author), selectinload(models.Post.group), selectinload(models.Post.comments).options(selectinload(models.Comment.commenter))).filter(models.Post.id == post_id).first()
-    if not reloaded_post:
-         raise HTTPException(status_code=500, detail="Erro ao recarregar o post após a atualização.")
-    return reloaded_post
+    http_cache.bump(f"post:{post_id}", f"author_posts:{current_user.id}")
+    hot_posts.refresh_posts(db, {response.group.id: [post_id]})
+    events.hub.publish("post.updated", {"id": response.id, "title": response.title, "text": response.text}, group_id=response.group.id)
+    return response
 
 @app.delete("/posts/{post_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Posts"])
-def delete_post(post_id: int, db: Session = Depends(dependencies.get_db), current_user: models.Author = Depends(auth.get_current_active_user)):
-    db_post = db.query(models.Post).filter(models.Post.id == post_id).first()
+@dependencies.db_endpoint
+def delete_post(post_id: int, db: Session = Depends(dependencies.get_db), current_user: auth.Principal = Depends(auth.get_current_active_user)):
+    db_post = db.query(models.Post).filter(models.Post.id == post_id, read_models.is_visible_post()).first()
     if db_post is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post não encontrado")
     if db_post.author_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Não autorizado a deletar este post")
+    group_id = db_post.group_id
+    timeline.remove_post(db, db_post.id)
+    _change_post_count(db, group_id, -1)
+    # Um DELETE só para os comentários, em vez de carregá-los para o cascade do ORM.
+    db.execute(delete(models.Comment).where(models.Comment.post_id == db_post.id))
     db.delete(db_post)
     db.commit()
+    http_cache.bump(f"post:{post_id}", f"group:{group_id}", f"author_posts:{current_user.id}")
+    hot_posts.remove_post(group_id, post_id)
+    events.hub.publish("post.deleted", {"id": post_id}, group_id=group_id)
     return None
 
-@app.post("/posts/{post_id}/comments/", response_model=schemas.CommentRead, status_code=status.HTTP_201_CREATED, tags=["Comments"])
-def create_comment_for_post(post_id: int, comment_create: schemas.CommentCreate, db: Session = Depends(dependencies.get_db), current_user: models.Author = Depends(auth.get_current_active_user)):
-    db_post_check = db.query(models.Post).filter(models.Post.id == post_id).first()
+@app.post("/posts/{post_id}/comments/", response_model=schemas.CommentRead, status_code=status.HTTP_201_CREATED, tags=["Comments"], dependencies=[Depends(rate_limit.limit("create_comment_for_post"))])
+@dependencies.db_endpoint
+def create_comment_for_post(post_id: int, comment_create: schemas.CommentCreate, db: Session = Depends(dependencies.get_db), current_user: auth.Principal = Depends(auth.get_current_active_user)):
+    if write_batch.WRITE_BATCH_ENABLED:
+        return _write_batched("comment", current_user, schemas.BulkCommentCreate(**comment_create.model_dump(), post_id=post_id))
+    db_post_check = db.query(models.Post.id, models.Post.group_id, models.Post.author_id, membership.is_member_clause(models.Post.group_id, current_user.id)).filter(models.Post.id == post_id, read_models.is_visible_post()).first()
     if not db_post_check:
         raise HTTPException(status_code=404, detail="Post não encontrado para adicionar comentário")
-    if current_user not in db_post_check.group.members:
+    if not db_post_check.is_member:
         raise HTTPException(status_code=403, detail="Você não pode comentar em posts de grupos dos quais não faz parte.")
     db_comment_obj = models.Comment(**comment_create.model_dump(), post_id=post_id, commenter_id=current_user.id)
     db.add(db_comment_obj)
+    db.flush()
+    _change_comment_count(db, post_id, 1)
+    response = schemas.CommentRead(
+        id=db_comment_obj.id, title=db_comment_obj.title, text=db_comment_obj.text, date=db_comment_obj.date,
+        post_id=post_id, commenter_id=current_user.id, commenter=current_user,
+    )
     db.commit()
-    db.refresh(db_comment_obj)
-    reloaded_comment = db.query(models.Comment).options(selectinload(models.Comment.commenter)).filter(models.Comment.id == db_comment_obj.id).first()
-    if not reloaded_comment:
-        raise HTTPException(status_code=500, detail="Erro ao recarregar o comentário após a criação.")
-    return reloaded_comment
+    http_cache.bump(f"post:{post_id}", f"author_posts:{db_post_check.author_id}")
+    hot_posts.refresh_posts(db, {db_post_check.group_id: [post_id]})
+    events.hub.publish("comment.created", response.model_dump(mode="json"), group_id=db_post_check.group_id)
+    return response
 
 @app.delete("/comments/{comment_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Comments"])
-def delete_comment(comment_id: int, db: Session = Depends(dependencies.get_db), current_user: models.Author = Depends(auth.get_current_active_user)):
-    db_comment = db.query(models.Comment).filter(models.Comment.id == comment_id).first()
-    if db_comment is None:
+@dependencies.db_endpoint
+def delete_comment(comment_id: int, db: Session = Depends(dependencies.get_db), current_user: auth.Principal = Depends(auth.get_current_active_user)):
+    row = db.query(models.Comment, models.Post.group_id, models.Post.author_id).join(models.Post, models.Comment.post_id == models.Post.id).filter(models.Comment.id == comment_id).first()
+    if row is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comentário não encontrado")
+    db_comment, group_id, post_author_id = row
     if db_comment.commenter_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Não autorizado a deletar este comentário")
+    post_id = db_comment.post_id
+    _change_comment_count(db, post_id, -1)
     db.delete(db_comment)
     db.commit()
+    http_cache.bump(f"post:{post_id}", f"author_posts:{post_author_id}")
+    hot_posts.refresh_posts(db, {group_id: [post_id]})
+    events.hub.publish("comment.deleted", {"id": comment_id, "post_id": post_id}, group_id=group_id)
     return None
 
 @app.get("/authors/{author_id}/posts/", response_model=List[schemas.PostRead], tags=["Authors"])
-def get_posts_by_author(author_id: int, db: Session = Depends(dependencies.get_db)):
+@dependencies.db_endpoint
+def get_posts_by_author(author_id: int, request: Request, db: Session = Depends(dependencies.get_read_db)):
     # ... Esta rota pode precisar de ajuste se a intenção for mostrar apenas posts
     # de grupos em comum, mas por enquanto, mantém a funcionalidade original.
-    author_check = db.query(models.Author.id).filter(models.Author.id == author_id).first()
+    conditional = http_cache.conditional(request, f"author_posts:{author_id}", List[schemas.PostRead])
+    cached = conditional.cached_response()
+    if cached is not None:
+        return cached
+    author_check = db.query(models.Author.id).filter(models.Author.id == author_id, models.Author.deleted_at.is_(None)).first()
     if not author_check:
         raise HTTPException(status_code=404, detail="Autor não encontrado")
 
-    posts = (
-        db.query(models.Post).filter(models.Post.author_id == author_id)
-        .options(selectinload(models.Post.author), selectinload(models.Post.group), selectinload(models.Post.comments).options(selectinload(models.Comment.commenter)))
-        .order_by(models.Post.date.desc()).limit(10).all()
+    posts = read_models.posts_by_author(db, author_id, limit=10)
+    return conditional.respond(posts)
+
+# =================================================================
+# ===                         BUSCA                               ===
+# =================================================================
+
+@app.get("/search", response_model=List[schemas.SearchResult], tags=["Search"])
+@dependencies.db_endpoint
+def search_posts_and_comments(
+    q: str,
+    limit: int = search.SEARCH_DEFAULT_LIMIT,
+    db: Session = Depends(dependencies.get_read_db),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
+):
+    """
+    (PROTEGIDA) Busca textual em posts e comentários dos grupos do usuário,
+    mais relevantes primeiro. Todos os termos precisam aparecer (acentos e
+    maiúsculas são ignorados).
+    """
+    if not search.terms(q):
+        raise HTTPException(status_code=400, detail="Informe ao menos uma palavra para buscar")
+    limit = max(1, min(limit, search.SEARCH_MAX_LIMIT))
+    return search.search(db, q, current_user.group_ids, limit)
+
+# =================================================================
+# ===                    ENDPOINTS EM LOTE                        ===
+# =================================================================
+
+def _check_batch_size(items: list) -> None:
+    if len(items) > bulk.BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"O lote tem {len(items)} itens; o limite é {bulk.BULK_MAX_ITEMS}",
+        )
+
+def _finish_bulk(db: Session, outcome: bulk.BulkOutcome) -> schemas.BulkResult:
+    db.commit()
+    if outcome.usernames:
+        auth.invalidate_principals(*outcome.usernames)
+    if outcome.cache_keys:
+        http_cache.bump(*outcome.cache_keys)
+    hot_posts.refresh_posts(db, outcome.hot_posts)
+    for event_type, data, target in outcome.events:
+        events.hub.publish(event_type, data, **target)
+    return outcome.response()
+
+@app.post("/posts/bulk", response_model=schemas.BulkResult, tags=["Bulk"])
+@dependencies.db_endpoint
+def create_posts_bulk(items: List[schemas.PostCreate], db: Session = Depends(dependencies.get_db), current_user: auth.Principal = Depends(auth.get_current_active_user)):
+    """
+    (PROTEGIDA) Cria vários posts numa única transação. Cada item recebe seu
+    resultado em `results`, na mesma ordem: 201 com o id, ou 403/404 com o motivo.
+    """
+    _check_batch_size(items)
+    if not items:
+        return schemas.BulkResult(created=0, failed=0, results=[])
+    return _finish_bulk(db, bulk.create_posts(db, current_user, items))
+
+@app.post("/comments/bulk", response_model=schemas.BulkResult, tags=["Bulk"])
+@dependencies.db_endpoint
+def create_comments_bulk(items: List[schemas.BulkCommentCreate], db: Session = Depends(dependencies.get_db), current_user: auth.Principal = Depends(auth.get_current_active_user)):
+    """(PROTEGIDA) Cria vários comentários, em um ou mais posts, numa única transação."""
+    _check_batch_size(items)
+    if not items:
+        return schemas.BulkResult(created=0, failed=0, results=[])
+    return _finish_bulk(db, bulk.create_comments(db, current_user, items))
+
+@app.post("/groups/{group_id}/members/bulk", response_model=schemas.BulkResult, tags=["Bulk"])
+@dependencies.db_endpoint
+def add_group_members_bulk(group_id: int, members: schemas.BulkMembersCreate, db: Session = Depends(dependencies.get_db), current_user: auth.Principal = Depends(auth.get_current_active_user)):
+    """(PROTEGIDA) O criador do grupo adiciona vários autores de uma vez, pelo username."""
+    _check_batch_size(members.usernames)
+    group = db.query(models.Group.id, models.Group.creator_id).filter(models.Group.id == group_id, models.Group.deleted_at.is_(None)).first()
+    if not group:
+        raise HTTPException(status_code=404, detail="Grupo não encontrado")
+    if group.creator_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Apenas o criador do grupo pode adicionar membros")
+    if not members.usernames:
+        return schemas.BulkResult(created=0, failed=0, results=[])
+    return _finish_bulk(db, bulk.add_members(db, group.id, members.usernames))
+
+# =================================================================
+# ===                    EVENTOS AO VIVO (SSE)                    ===
+# =================================================================
+
+@app.get("/events", tags=["Events"])
+async def stream_events(
+    last_event_id: Optional[str] = None,
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+    current_user: auth.Principal = Depends(auth.get_stream_user)
+):
+    """
+    (PROTEGIDA) Stream Server-Sent Events com os posts e comentários dos grupos
+    do usuário. Aceita `?token=` no lugar do cabeçalho Authorization. Ao
+    reconectar, o navegador envia `Last-Event-ID` e os eventos perdidos são
+    reenviados; `reset` indica que o cliente deve recarregar os dados.
+    """
+    resume_from = last_event_id_header or last_event_id
+    try:
+        resume_from = int(resume_from) if resume_from else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Last-Event-ID inválido")
+    subscription = events.hub.subscribe(current_user.id, current_user.group_ids, resume_from)
+    return StreamingResponse(
+        events.hub.stream(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    return posts
\ No newline at end of file
+
+# =================================================================
+# ===                         MÉTRICAS                            ===
+# =================================================================
+
+@app.get("/metrics/cache", tags=["Metrics"])
+def get_cache_metrics():
+    """Acertos, erros, tamanho e invalidações de cada cache em memória."""
+    return {name: item.stats() for name, item in cache.CACHES.items()}
+
+@app.get("/metrics/events", tags=["Metrics"])
+def get_event_metrics():
+    """Conexões abertas e eventos publicados, entregues e descartados por fila cheia."""
+    return events.hub.stats()
+
+@app.get("/metrics/limits", tags=["Metrics"])
+def get_limit_metrics():
+    """Recusas por limite de taxa (429) e por excesso de carga (503), vagas ocupadas e fila."""
+    return rate_limit.limit_stats.stats()
+
+@app.get("/metrics/writes", tags=["Metrics"])
+def get_write_metrics():
+    """Lotes gravados pela escrita agrupada, itens por lote e itens refeitos um a um."""
+    return write_batch.committer.stats()
+
+@app.get("/metrics", tags=["Metrics"], response_class=PlainTextResponse)
+def get_metrics():
+    """Histogramas por rota (latência, SQL, serialização) no formato texto do Prometheus."""
+    return PlainTextResponse(
+        instrumentation.registry.render() + rate_limit.limit_stats.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/profile", tags=["Metrics"], response_class=PlainTextResponse)
+def get_profile(seconds: float = 5.0, interval: float = 0.005):
+    """
+    Perfil de amostragem de todas as threads, no formato "collapsed" dos flame
+    graphs. Só existe com PROFILER_ENABLED=true; um perfil por vez.
+    """
+    if not instrumentation.PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler desabilitado")
+    if seconds <= 0 or interval <= 0:
+        raise HTTPException(status_code=400, detail="seconds e interval devem ser positivos")
+    stacks = instrumentation.sample_stacks(seconds, max(interval, 0.001))
+    if stacks is None:
+        raise HTTPException(status_code=409, detail="Já existe um perfil em andamento")
+    return PlainTextResponse(stacks)
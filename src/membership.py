@@ -0,0 +1,137 @@
+"""
+Serviço de participação em grupos.
+
+Tudo aqui trabalha direto na tabela `group_memberships`, por consultas pontuais
+na chave (author_id, group_id) ou no índice reverso (group_id, author_id), sem
+carregar a lista de membros de um grupo na sessão. `Group.member_count` e
+`Author.membership_version` são atualizados na mesma transação de cada
+INSERT/DELETE.
+"""
+from sqlalchemy import and_, delete, exists, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from . import models, read_models
+
+membership = models.group_membership_table.c
+
+
+def is_member_clause(group_id_column, author_id: int):
+    """Coluna booleana `is_member` para usar dentro de outra consulta."""
+    return exists().where(membership.group_id == group_id_column, membership.author_id == author_id).label("is_member")
+
+def members_among_clause(group_id_column, author_ids):
+    """
+    Condição de um LEFT JOIN com group_memberships: uma linha para cada autor de
+    `author_ids` que participa do grupo (NULL se nenhum). Vale para vários autores
+    numa consulta só, onde `is_member_clause` fixa um.
+    """
+    return and_(membership.group_id == group_id_column, membership.author_id.in_(author_ids))
+
+def is_member(db: Session, author_id: int, group_id: int) -> bool:
+    return db.execute(select(is_member_clause(group_id, author_id))).scalar()
+
+def _insert_ignoring_duplicates(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert(models.group_membership_table).on_conflict_do_nothing()
+
+def _change_member_count(db: Session, group_id: int, delta: int) -> None:
+    db.execute(
+        update(models.Group)
+        .where(models.Group.id == group_id)
+        .values(member_count=models.Group.member_count + delta)
+    )
+
+def _bump_membership_versions(db: Session, author_ids) -> None:
+    db.execute(
+        update(models.Author)
+        .where(models.Author.id.in_(author_ids))
+        .values(membership_version=models.Author.membership_version + 1)
+    )
+
+def add_member(db: Session, author_id: int, group_id: int) -> bool:
+    """Insere a participação. Retorna False se o autor já era membro."""
+    statement = _insert_ignoring_duplicates(db)
+    if statement is None:
+        if is_member(db, author_id, group_id):
+            return False
+        statement = insert(models.group_membership_table)
+    inserted = db.execute(statement.values(author_id=author_id, group_id=group_id)).rowcount
+    if inserted:
+        _change_member_count(db, group_id, inserted)
+        _bump_membership_versions(db, [author_id])
+    return bool(inserted)
+
+def existing_members(db: Session, group_id: int, author_ids) -> set:
+    """Quais de `author_ids` já participam do grupo (uma consulta na PK)."""
+    rows = db.execute(
+        select(membership.author_id).where(membership.group_id == group_id, membership.author_id.in_(author_ids))
+    )
+    return set(rows.scalars())
+
+def add_members(db: Session, group_id: int, author_ids: list) -> None:
+    """
+    Insere várias participações num único executemany e recalcula
+    `member_count` pela contagem real, já que duplicatas são ignoradas.
+    """
+    if not author_ids:
+        return
+    statement = _insert_ignoring_duplicates(db)
+    if statement is None:
+        existing = existing_members(db, group_id, author_ids)
+        author_ids = [author_id for author_id in author_ids if author_id not in existing]
+        if not author_ids:
+            return
+        statement = insert(models.group_membership_table)
+    db.execute(statement, [{"author_id": author_id, "group_id": group_id} for author_id in author_ids])
+    # Inclui quem já era membro: um incremento a mais só descarta um principal em cache.
+    _bump_membership_versions(db, author_ids)
+    count = select(func.count()).where(membership.group_id == group_id).scalar_subquery()
+    db.execute(update(models.Group).where(models.Group.id == group_id).values(member_count=count))
+
+def remove_member(db: Session, author_id: int, group_id: int) -> bool:
+    """Remove a participação. Retorna False se o autor não era membro."""
+    removed = db.execute(
+        delete(models.group_membership_table).where(
+            membership.author_id == author_id,
+            membership.group_id == group_id,
+        )
+    ).rowcount
+    if removed:
+        _change_member_count(db, group_id, -removed)
+        _bump_membership_versions(db, [author_id])
+    return bool(removed)
+
+def list_members(db: Session, group_id: int, after_author_id, limit: int) -> list:
+    """Uma página de membros (AuthorView), pelo índice (group_id, author_id)."""
+    query = (
+        select(*read_models.author_columns())
+        .join(models.group_membership_table, membership.author_id == models.Author.id)
+        .where(membership.group_id == group_id, models.Author.deleted_at.is_(None))
+    )
+    if after_author_id is not None:
+        query = query.where(membership.author_id > after_author_id)
+    rows = db.execute(query.order_by(membership.author_id).limit(limit))
+    return [read_models.AuthorView(*row) for row in rows]
+
+def member_usernames(db: Session, group_id: int) -> list:
+    rows = db.execute(
+        select(models.Author.username)
+        .join(models.group_membership_table, membership.author_id == models.Author.id)
+        .where(membership.group_id == group_id)
+    )
+    return list(rows.scalars())
+
+def backfill_member_counts(db: Session) -> None:
+    """Recalcula `member_count` de todos os grupos a partir da tabela de associação."""
+    count = (
+        select(func.count())
+        .where(membership.group_id == models.Group.id)
+        .scalar_subquery()
+    )
+    db.execute(update(models.Group).values(member_count=count))
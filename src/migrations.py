@@ -0,0 +1,208 @@
+"""
+Migrações de schema versionadas.
+
+Cada migração tem uma versão ("0001_...") e roda uma única vez; as versões já
+aplicadas ficam na tabela `schema_migrations`. Num banco novo o `create_all`
+já cria tudo no formato atual, então as migrações são apenas registradas.
+
+Índices são criados um por vez, cada um na sua transação curta. No Postgres
+usam `CREATE INDEX CONCURRENTLY`, que não bloqueia escritas na tabela; no
+SQLite o lock de escrita dura só a construção daquele índice.
+
+    python -m src.migrations           # aplica as pendentes
+    python -m src.migrations status    # lista aplicadas/pendentes
+
+O app aplica as pendentes no startup, a menos que `MIGRATE_ON_STARTUP=false`
+(o que o `run.py --prod` faz nos workers depois de migrar no processo mestre).
+"""
+import datetime
+import os
+import sys
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, func, inspect, insert, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateIndex
+
+from . import database, membership, models, search, timeline
+
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", String, primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+MIGRATIONS: List[Tuple[str, Callable]] = []
+
+
+def migration(version: str):
+    def register(func):
+        MIGRATIONS.append((version, func))
+        return func
+    return register
+
+
+# --- Operações auxiliares ---
+
+def add_column(engine, column) -> bool:
+    """ALTER TABLE ... ADD COLUMN, se a coluna ainda não existir."""
+    table = column.table
+    with engine.begin() as connection:
+        current_columns = {c["name"] for c in inspect(connection).get_columns(table.name)}
+        if column.name in current_columns:
+            return False
+        column_type = column.type.compile(dialect=engine.dialect)
+        default = f" DEFAULT {column.server_default.arg}" if column.server_default is not None else ""
+        not_null = " NOT NULL" if not column.nullable and default else ""
+        connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}{not_null}{default}")
+    return True
+
+def create_index_online(engine, index) -> None:
+    """Cria o índice sem segurar a tabela por uma transação longa."""
+    if engine.dialect.name == "postgresql":
+        sql = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+        sql = sql.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)
+        # CONCURRENTLY não pode rodar dentro de uma transação.
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.exec_driver_sql(sql)
+    else:
+        with engine.begin() as connection:
+            index.create(connection, checkfirst=True)
+
+
+# --- Migrações ---
+
+@migration("0001_group_member_count")
+def _group_member_count(engine) -> None:
+    add_column(engine, models.Group.__table__.c.member_count)
+    create_index_online(engine, _index(models.group_membership_table, "ix_group_memberships_group_author"))
+    with Session(engine) as db:
+        membership.backfill_member_counts(db)
+        db.commit()
+
+@migration("0002_group_post_count")
+def _group_post_count(engine) -> None:
+    add_column(engine, models.Group.__table__.c.post_count)
+    with Session(engine) as db:
+        post_count = select(func.count(models.Post.id)).where(models.Post.group_id == models.Group.id).scalar_subquery()
+        db.execute(update(models.Group).values(post_count=post_count))
+        db.commit()
+
+@migration("0003_feed_entries_backfill")
+def _feed_entries_backfill(engine) -> None:
+    with Session(engine) as db:
+        if db.query(models.FeedEntry.post_id).first() is None:
+            timeline.rebuild(db)
+            db.commit()
+
+@migration("0004_post_and_comment_indexes")
+def _post_and_comment_indexes(engine) -> None:
+    for table, name in (
+        (models.Post.__table__, "ix_posts_group_date_id"),
+        (models.Post.__table__, "ix_posts_author_date"),
+        (models.Comment.__table__, "ix_comments_post_date_id"),
+        (models.Comment.__table__, "ix_comments_commenter_id"),
+    ):
+        create_index_online(engine, _index(table, name))
+
+@migration("0005_search_index")
+def _search_index(engine) -> None:
+    if engine.dialect.name == "postgresql":
+        for index in search.POSTGRES_INDEXES:
+            create_index_online(engine, index)
+    else:
+        search.rebuild(engine)
+
+@migration("0006_deferred_deletion")
+def _deferred_deletion(engine) -> None:
+    add_column(engine, models.Group.__table__.c.deleted_at)
+    add_column(engine, models.Author.__table__.c.deleted_at)
+    create_index_online(engine, _index(models.Group.__table__, "ix_groups_creator_id"))
+    if engine.dialect.name == "postgresql":
+        _cascade_foreign_keys(engine)
+    # No SQLite as chaves antigas ficam sem CASCADE (mudar exigiria recriar as
+    # tabelas); o job de exclusão remove os filhos antes dos pais de qualquer forma.
+
+def _cascade_foreign_keys(engine) -> None:
+    """Recria as FKs existentes com ON DELETE CASCADE sem bloquear as tabelas na validação."""
+    inspector = inspect(engine)
+    for table in database.Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        for fk in inspector.get_foreign_keys(table.name):
+            if fk["options"].get("ondelete", "").upper() == "CASCADE" or not fk["name"]:
+                continue
+            columns = ", ".join(fk["constrained_columns"])
+            referred = ", ".join(fk["referred_columns"])
+            with engine.begin() as connection:
+                connection.exec_driver_sql(f"ALTER TABLE {table.name} DROP CONSTRAINT {fk['name']}")
+                connection.exec_driver_sql(
+                    f"ALTER TABLE {table.name} ADD CONSTRAINT {fk['name']} FOREIGN KEY ({columns}) "
+                    f"REFERENCES {fk['referred_table']} ({referred}) ON DELETE CASCADE NOT VALID"
+                )
+            # VALIDATE só pede um lock que não bloqueia leituras nem escritas.
+            with engine.begin() as connection:
+                connection.exec_driver_sql(f"ALTER TABLE {table.name} VALIDATE CONSTRAINT {fk['name']}")
+
+@migration("0007_post_comment_count")
+def _post_comment_count(engine) -> None:
+    add_column(engine, models.Post.__table__.c.comment_count)
+    with Session(engine) as db:
+        comment_count = select(func.count()).where(models.Comment.post_id == models.Post.id).scalar_subquery()
+        db.execute(update(models.Post).values(comment_count=comment_count))
+        db.commit()
+
+@migration("0008_author_membership_version")
+def _author_membership_version(engine) -> None:
+    add_column(engine, models.Author.__table__.c.membership_version)
+
+def _index(table, name):
+    return next(index for index in table.indexes if index.name == name)
+
+
+# --- Execução ---
+
+def applied_versions(engine) -> set:
+    schema_migrations.create(engine, checkfirst=True)
+    with engine.connect() as connection:
+        return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+def upgrade(engine=None) -> List[str]:
+    """
+    Cria as tabelas que faltam e aplica as migrações pendentes, em ordem.
+    Retorna as versões aplicadas nesta chamada.
+    """
+    engine = engine or database.engine
+    is_new_database = not inspect(engine).has_table(models.Author.__tablename__)
+    database.Base.metadata.create_all(bind=engine)
+    done = applied_versions(engine)
+    applied = []
+    for version, func in MIGRATIONS:
+        if version in done:
+            continue
+        if not is_new_database:
+            func(engine)
+        with engine.begin() as connection:
+            connection.execute(insert(schema_migrations).values(version=version, applied_at=datetime.datetime.now()))
+        applied.append(version)
+    return applied
+
+def status(engine=None) -> List[Tuple[str, bool]]:
+    engine = engine or database.engine
+    done = applied_versions(engine)
+    return [(version, version in done) for version, _ in MIGRATIONS]
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+    if command == "status":
+        for version, is_applied in status():
+            print(f"{'aplicada ' if is_applied else 'pendente '} {version}")
+    elif command == "upgrade":
+        for version in upgrade():
+            print(f"aplicada  {version}")
+    else:
+        sys.exit(f"comando desconhecido: {command} (use 'upgrade' ou 'status')")
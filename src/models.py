@@ -1,5 +1,5 @@
 from sqlalchemy import (Column, Integer, String, ForeignKey,
-                        Text, DateTime, Table)
+                        Text, DateTime, Table, Index)
 from sqlalchemy.orm import relationship
 import datetime
 from .database import Base
@@ -7,9 +7,12 @@ from .database import Base
 # --- Tabela de Associação (Muitos-para-Muitos) ---
 # Esta tabela especial liga Autores (Membros) a Grupos.
 # Não é um modelo de classe, mas uma definição de tabela direta para o SQLAlchemy.
+# A chave primária (author_id, group_id) atende "de quais grupos o autor participa";
+# o índice reverso (group_id, author_id) atende "quem participa do grupo".
 group_membership_table = Table('group_memberships', Base.metadata,
-    Column('author_id', Integer, ForeignKey('authors.id'), primary_key=True),
-    Column('group_id', Integer, ForeignKey('groups.id'), primary_key=True)
+    Column('author_id', Integer, ForeignKey('authors.id', ondelete='CASCADE'), primary_key=True),
+    Column('group_id', Integer, ForeignKey('groups.id', ondelete='CASCADE'), primary_key=True),
+    Index('ix_group_memberships_group_author', 'group_id', 'author_id')
 )
 
 
@@ -24,7 +27,14 @@ class Group(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True, nullable=False)
     description = Column(String)
-    creator_id = Column(Integer, ForeignKey("authors.id"), nullable=False)
+    creator_id = Column(Integer, ForeignKey("authors.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Contador desnormalizado, mantido pelo serviço de membership (src/membership.py).
+    member_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Mantido por create_post/delete_post.
+    post_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Preenchido quando a exclusão é pedida: o grupo some das leituras na hora e
+    # o job de src/deletion.py remove posts, comentários e membros aos poucos.
+    deleted_at = Column(DateTime, nullable=True)
 
     # Relações
     creator = relationship("Author") # Relação simples para saber quem criou o grupo.
@@ -37,7 +47,9 @@ class Group(Base):
     )
 
     # Relação um-para-muitos com os posts que pertencem a este grupo.
-    posts = relationship("Post", back_populates="group", cascade="all, delete-orphan")
+    # passive_deletes: a exclusão dos filhos fica com o banco (ON DELETE CASCADE)
+    # e com o job de exclusão, sem carregar cada linha na sessão.
+    posts = relationship("Post", back_populates="group", cascade="all, delete-orphan", passive_deletes=True)
 
 
 # --- Modelos Atualizados ---
@@ -52,13 +64,19 @@ class Author(Base):
     username = Column(String, unique=True, index=True)
     email = Column(String, unique=True, index=True)
     password = Column(String)
+    # Conta em exclusão: não autentica mais e some das leituras (ver Group.deleted_at).
+    deleted_at = Column(DateTime, nullable=True)
+    # Incrementado quando o autor entra ou sai de um grupo; vai no token (claim `mv`)
+    # para que um principal em cache anterior a essa mudança seja descartado.
+    membership_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Relações existentes
-    posts = relationship("Post", back_populates="author", cascade="all, delete-orphan")
+    posts = relationship("Post", back_populates="author", cascade="all, delete-orphan", passive_deletes=True)
     comments_made = relationship(
         "Comment",
         back_populates="commenter",
         cascade="all, delete-orphan",
+        passive_deletes=True,
         foreign_keys="[Comment.commenter_id]"
     )
     
@@ -80,19 +98,29 @@ class Post(Base):
     title = Column(String, index=True)
     text = Column(Text)
     date = Column(DateTime, default=datetime.datetime.now)
-    author_id = Column(Integer, ForeignKey("authors.id"), nullable=False)
+    author_id = Column(Integer, ForeignKey("authors.id", ondelete="CASCADE"), nullable=False)
     
     # Nova chave estrangeira para ligar o post a um grupo.
     # É `nullable=False` para garantir que todo post tenha um grupo.
-    group_id = Column(Integer, ForeignKey("groups.id"), nullable=False)
+    group_id = Column(Integer, ForeignKey("groups.id", ondelete="CASCADE"), nullable=False)
+    # Contador desnormalizado, mantido por create_comment_for_post/delete_comment
+    # (e pelo lote de comentários): o GET do post não conta a thread inteira.
+    comment_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Relações existentes
     author = relationship("Author", back_populates="posts")
-    comments = relationship("Comment", back_populates="post", cascade="all, delete-orphan")
+    comments = relationship("Comment", back_populates="post", cascade="all, delete-orphan", passive_deletes=True)
     
     # Nova relação um-para-um (do ponto de vista do Post) com o Grupo.
     group = relationship("Group", back_populates="posts")
 
+    __table_args__ = (
+        # Posts de um grupo, mais novos primeiro (fan-out da timeline, entrada em grupo).
+        Index("ix_posts_group_date_id", "group_id", date.desc(), "id"),
+        # Posts de um autor, mais novos primeiro (GET /authors/{id}/posts/).
+        Index("ix_posts_author_date", "author_id", date.desc()),
+    )
+
 
 # --- Modelo Inalterado ---
 
@@ -104,8 +132,8 @@ class Comment(Base):
     __tablename__ = "comments"
     
     id = Column(Integer, primary_key=True, index=True)
-    post_id = Column(Integer, ForeignKey("posts.id"), nullable=False)
-    commenter_id = Column(Integer, ForeignKey("authors.id"), nullable=False)
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), nullable=False)
+    commenter_id = Column(Integer, ForeignKey("authors.id", ondelete="CASCADE"), nullable=False)
     title = Column(String)
     text = Column(Text)
     date = Column(DateTime, default=datetime.datetime.now)
@@ -116,4 +144,65 @@ class Comment(Base):
         "Author",
         back_populates="comments_made",
         foreign_keys=[commenter_id]
-    )
\ No newline at end of file
+    )
+
+    __table_args__ = (
+        # Comentários de um post em ordem cronológica (contagem, últimos comentários).
+        Index("ix_comments_post_date_id", "post_id", "date", "id"),
+        Index("ix_comments_commenter_id", "commenter_id"),
+    )
+
+
+# --- Índice de Timeline (Fan-out na Escrita) ---
+
+class FeedEntry(Base):
+    """
+    Uma linha por (leitor, post) visível no feed do leitor. É mantida pelas rotas
+    de escrita (criar/excluir post, entrar/sair de grupo), de forma que o feed
+    vira uma leitura por faixa de índice em vez de um `IN (...)` sobre os grupos.
+    """
+    __tablename__ = "feed_entries"
+
+    author_id = Column(Integer, ForeignKey("authors.id", ondelete="CASCADE"), primary_key=True)
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True, index=True)
+    group_id = Column(Integer, ForeignKey("groups.id", ondelete="CASCADE"), nullable=False, index=True)
+    date = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # Serve a paginação por cursor: WHERE author_id = ? AND (date, post_id) < (?, ?)
+        Index("ix_feed_entries_author_date_post", "author_id", date.desc(), post_id.desc()),
+    )
+
+
+# --- Exclusão em Segundo Plano ---
+
+class DeletionJob(Base):
+    """
+    Um pedido de exclusão de grupo ou autor, processado em lotes pelo worker de
+    src/deletion.py. Sobrevive a reinícios: jobs pendentes (ou cujo worker parou
+    de dar sinal) são retomados de onde pararam.
+    """
+    __tablename__ = "deletion_jobs"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)  # "group" ou "author"
+    target_id = Column(Integer, nullable=False)
+    requested_by = Column(Integer, nullable=False)  # sem FK: o autor pode ser o próprio alvo
+    status = Column(String, nullable=False, default="pending")  # pending, running, done, failed
+    total = Column(Integer)  # linhas a remover, calculado quando o job começa
+    deleted = Column(Integer, nullable=False, default=0, server_default="0")
+    error = Column(Text)
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.now)
+    heartbeat_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+
+class RevokedToken(Base):
+    """
+    Tokens revogados (logout) até a expiração deles. Cada processo mantém a lista
+    em memória (auth.revocations) e a relê periodicamente.
+    """
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String, primary_key=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
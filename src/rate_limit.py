@@ -0,0 +1,357 @@
+"""
+Limites de taxa por rota e controle de admissão.
+
+Limites de taxa: token bucket por usuário e por IP, configurado por rota em
+RATE_LIMITS. Cada regra é `escopo:quantidade/segundos`: o balde comporta
+`quantidade` requisições e reabastece a `quantidade/segundos` por segundo.
+Sem token a rota responde 429 com `Retry-After`. O usuário é o `sub` do token
+(verificação em cache, ver auth.decode_token); o IP é o do cliente, já
+corrigido pelo uvicorn com `--proxy-headers`. Com vários workers os baldes
+precisam ser compartilhados (`RATE_LIMIT_URL=redis://...`); `memory://` é o
+fake desse backend.
+
+Controle de admissão: no máximo MAX_CONCURRENCY requisições em andamento por
+processo; as demais esperam numa fila. Se a espera estimada (fila x tempo médio
+de resposta / MAX_CONCURRENCY) passar de ADMISSION_TARGET_MS, ou se a espera
+real passar dele, a requisição recebe 503 com `Retry-After` na hora, em vez de
+aumentar a latência de todas. /events (conexões longas) e as métricas ficam de
+fora.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import jwt
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+from . import auth
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# rota=escopo:quantidade/segundos,...; rotas separadas por ';'. Escopos: user, ip.
+RATE_LIMITS = os.getenv(
+    "RATE_LIMITS",
+    "register=ip:5/60;"
+    "login=ip:10/60;"
+    "create_post=user:30/60,ip:120/60;"
+    "create_comment_for_post=user:60/60,ip:240/60",
+)
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", "64"))
+ADMISSION_TARGET_MS = float(os.getenv("ADMISSION_TARGET_MS", "500"))
+ADMISSION_EXEMPT = ("/events", "/metrics", "/debug/")
+
+
+@dataclass(frozen=True)
+class Rule:
+    scope: str
+    capacity: float
+    rate: float  # tokens por segundo
+
+def parse_limits(value: str) -> Dict[str, Tuple[Rule, ...]]:
+    limits = {}
+    for entry in filter(None, (part.strip() for part in value.split(";"))):
+        route, separator, rules = entry.partition("=")
+        parsed = []
+        for rule in filter(None, (part.strip() for part in rules.split(","))):
+            scope, _, amount = rule.partition(":")
+            count, _, seconds = amount.partition("/")
+            if not separator or scope not in ("user", "ip") or not count.isdigit() or not seconds.isdigit():
+                raise ValueError("RATE_LIMITS deve ter o formato 'rota=user:30/60,ip:120/60;rota=...'.")
+            parsed.append(Rule(scope, float(count), int(count) / int(seconds)))
+        limits[route.strip()] = tuple(parsed)
+    return limits
+
+LIMITS = parse_limits(RATE_LIMITS)
+
+
+# --- Baldes ---
+
+class LocalBuckets:
+    """Baldes do processo, num LRU: um balde despejado volta cheio."""
+
+    shared = False
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, checks: List[Tuple[str, Rule]]) -> float:
+        """
+        Consome um token de cada balde se todos têm; senão não consome nenhum
+        e devolve os segundos até todos terem (0 = permitido).
+        """
+        now = time.monotonic()
+        wait = 0.0
+        with self._lock:
+            buckets = []
+            for key, rule in checks:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = self._buckets[key] = [rule.capacity, now]
+                    if len(self._buckets) > self.max_keys:
+                        self._buckets.popitem(last=False)
+                else:
+                    self._buckets.move_to_end(key)
+                    bucket[0] = min(rule.capacity, bucket[0] + (now - bucket[1]) * rule.rate)
+                    bucket[1] = now
+                if bucket[0] < 1:
+                    wait = max(wait, (1 - bucket[0]) / rule.rate)
+                buckets.append(bucket)
+            if not wait:
+                for bucket in buckets:
+                    bucket[0] -= 1
+        return wait
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class InMemorySharedBuckets(LocalBuckets):
+    """Fake do backend compartilhado: mesma interface, sem limite de chaves."""
+
+    shared = True
+
+    def __init__(self):
+        super().__init__(max_keys=float("inf"))
+
+
+# O mesmo `take`, atômico no Redis. ARGV: agora, e capacidade e taxa de cada chave.
+# Cada chave expira quando o balde estaria cheio de novo.
+_TAKE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local tokens, wait = {}, 0
+for i, key in ipairs(KEYS) do
+    local capacity, rate = tonumber(ARGV[2 * i]), tonumber(ARGV[2 * i + 1])
+    local bucket = redis.call('HMGET', key, 'tokens', 'at')
+    tokens[i] = math.min(capacity, (tonumber(bucket[1]) or capacity) + (now - (tonumber(bucket[2]) or now)) * rate)
+    if tokens[i] < 1 then wait = math.max(wait, (1 - tokens[i]) / rate) end
+end
+for i, key in ipairs(KEYS) do
+    local capacity, rate = tonumber(ARGV[2 * i]), tonumber(ARGV[2 * i + 1])
+    if wait == 0 then tokens[i] = tokens[i] - 1 end
+    redis.call('HSET', key, 'tokens', tokens[i], 'at', now)
+    redis.call('PEXPIRE', key, math.ceil(capacity / rate * 1000))
+end
+return tostring(wait)
+"""
+
+class RedisBuckets:
+    """Baldes compartilhados entre workers. Requer o pacote opcional `redis`."""
+
+    shared = True
+
+    def __init__(self, url: str, prefix: str = "rl:"):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("O limite de taxa 'redis://' requer o pacote 'redis' instalado.") from exc
+        self._client = redis.Redis.from_url(url)
+        self._take = self._client.register_script(_TAKE_SCRIPT)
+        self._prefix = prefix
+
+    def take(self, checks: List[Tuple[str, Rule]]) -> float:
+        args = [time.time()]
+        for _, rule in checks:
+            args += [rule.capacity, rule.rate]
+        return float(self._take(keys=[self._prefix + key for key, _ in checks], args=args))
+
+    def clear(self) -> None:
+        for key in self._client.scan_iter(f"{self._prefix}*"):
+            self._client.delete(key)
+
+
+def buckets_from_url(url: Optional[str]):
+    """Vazio = local, 'memory://' = fake compartilhado, 'redis://' = Redis."""
+    if not url:
+        return LocalBuckets()
+    if url.startswith("memory://"):
+        return InMemorySharedBuckets()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBuckets(url)
+    raise ValueError(f"Backend de limite de taxa desconhecido: {url}")
+
+buckets = buckets_from_url(RATE_LIMIT_URL)
+
+
+# --- Limites por rota ---
+
+class LimitStats:
+    def __init__(self):
+        self.rejected: Counter = Counter()  # por rota
+        self.shed: Counter = Counter()  # motivo: "estimate" ou "timeout"
+
+    def stats(self) -> dict:
+        return {
+            "rate_limited": dict(self.rejected),
+            "shed": dict(self.shed),
+            "in_flight": admission.in_flight,
+            "queued": len(admission.waiters),
+            "avg_service_ms": round(admission.avg_service * 1000, 2),
+        }
+
+    def render(self) -> str:
+        """Contadores no formato texto do Prometheus, para o fim de /metrics."""
+        lines = [
+            "# HELP http_rate_limited_total Requisições recusadas com 429, por rota.",
+            "# TYPE http_rate_limited_total counter",
+        ]
+        for route, count in sorted(self.rejected.items()):
+            lines.append(f'http_rate_limited_total{{route="{route}"}} {count}')
+        lines += [
+            "# HELP http_load_shed_total Requisições recusadas com 503 pelo controle de admissão.",
+            "# TYPE http_load_shed_total counter",
+        ]
+        for reason, count in sorted(self.shed.items()):
+            lines.append(f'http_load_shed_total{{reason="{reason}"}} {count}')
+        lines += [
+            "# HELP http_in_flight Requisições em andamento neste processo.",
+            "# TYPE http_in_flight gauge",
+            f"http_in_flight {admission.in_flight}",
+            "# HELP http_admission_queue Requisições esperando vaga neste processo.",
+            "# TYPE http_admission_queue gauge",
+            f"http_admission_queue {len(admission.waiters)}",
+        ]
+        return "\n".join(lines) + "\n"
+
+limit_stats = LimitStats()
+
+
+def _user_of(request: Request) -> Optional[str]:
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return auth.decode_token(token).username
+    except (jwt.InvalidTokenError, KeyError):
+        return None  # token inválido: a dependência de autenticação responde 401
+
+def limit(route: str):
+    """
+    Dependência que aplica as regras de `route` em RATE_LIMITS. Vai em
+    `dependencies=[...]` da rota, para rodar antes do corpo (e do bcrypt).
+    """
+    rules = LIMITS.get(route, ())
+    # (prefixo da chave, regra), montados uma vez por rota.
+    keyed = [(f"{route}:{rule.scope}:", rule) for rule in rules]
+    by_user = any(rule.scope == "user" for rule in rules)
+
+    async def check(request: Request) -> None:
+        if not RATE_LIMIT_ENABLED or not keyed:
+            return
+        user = _user_of(request) if by_user else None
+        client = request.scope.get("client")
+        ip = client[0] if client else None
+        checks = [
+            (prefix + identity, rule)
+            for prefix, rule in keyed
+            if (identity := user if rule.scope == "user" else ip) is not None
+        ]
+        if not checks:
+            return
+        wait = await run_in_threadpool(buckets.take, checks) if buckets.shared else buckets.take(checks)
+        if wait:
+            limit_stats.rejected[route] += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Muitas requisições, tente novamente em instantes",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+    return check
+
+
+# --- Controle de admissão ---
+
+class AdmissionControl:
+    """Vagas, fila FIFO e a média móvel do tempo de resposta deste processo."""
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY, target: float = ADMISSION_TARGET_MS / 1000):
+        self.max_concurrency = max_concurrency
+        self.target = target
+        self.in_flight = 0
+        self.waiters: "deque[asyncio.Future]" = deque()
+        self.avg_service = 0.0
+
+    def retry_after(self) -> str:
+        return str(max(1, math.ceil(self.estimated_wait())))
+
+    def estimated_wait(self) -> float:
+        return (len(self.waiters) + 1) * self.avg_service / self.max_concurrency
+
+    async def acquire(self) -> Optional[str]:
+        """None ao conseguir a vaga; senão o motivo da recusa."""
+        if self.in_flight < self.max_concurrency and not self.waiters:
+            self.in_flight += 1
+            return None
+        if self.estimated_wait() > self.target:
+            return "estimate"
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            # asyncio.wait não cancela o waiter no timeout: o que decide é waiter.done(),
+            # e uma vaga repassada no mesmo passo do loop em que o prazo venceu não se perde.
+            await asyncio.wait((waiter,), timeout=self.target)
+        except asyncio.CancelledError:
+            # Cliente desconectou: se a vaga já tinha sido repassada, passa adiante.
+            if waiter.done() and not waiter.cancelled():
+                self.release(0.0)
+            raise
+        finally:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+        if not waiter.done():
+            waiter.cancel()
+            return "timeout"
+        return None  # a vaga foi repassada por release(), já contada em in_flight
+
+    def release(self, service_time: float) -> None:
+        if service_time:
+            # Média móvel exponencial; a primeira medida já vale inteira.
+            self.avg_service += (service_time - self.avg_service) * (0.05 if self.avg_service else 1.0)
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # repassa a vaga sem liberar in_flight
+                return
+        self.in_flight -= 1
+
+admission = AdmissionControl()
+
+
+class AdmissionMiddleware:
+    """Middleware ASGI puro; responde 503 sem chegar ao app quando a fila passa do alvo."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ADMISSION_ENABLED or scope["path"].startswith(ADMISSION_EXEMPT):
+            await self.app(scope, receive, send)
+            return
+        rejected = await admission.acquire()
+        if rejected is not None:
+            limit_stats.shed[rejected] += 1
+            response = JSONResponse(
+                {"detail": "Servidor ocupado, tente novamente em instantes"},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": admission.retry_after()},
+            )
+            await response(scope, receive, send)
+            return
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.release(time.perf_counter() - started)
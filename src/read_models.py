@@ -0,0 +1,264 @@
+"""
+Modelos de leitura das rotas GET.
+
+Em vez de hidratar entidades `Post`/`Author`/`Group`/`Comment` (que entram no
+identity map da sessão e trazem colunas como `Author.password`), as consultas
+daqui selecionam só as colunas que as respostas usam e montam objetos leves
+com `__slots__`. Os atributos têm os mesmos nomes dos schemas, então tanto o
+`response_model` quanto `serializers.py` os leem como leriam o ORM.
+"""
+import datetime
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, func, select, tuple_
+from sqlalchemy.orm import Session, aliased
+
+from . import models
+
+
+@dataclass(slots=True)
+class AuthorView:
+    id: int
+    username: str
+    email: str
+
+@dataclass(slots=True)
+class GroupRefView:
+    id: int
+    name: str
+
+@dataclass(slots=True)
+class GroupView:
+    id: int
+    name: str
+    description: Optional[str]
+    creator: AuthorView
+    member_count: int
+    post_count: int
+
+@dataclass(slots=True)
+class CommentView:
+    id: int
+    title: str
+    text: str
+    date: datetime.datetime
+    post_id: int
+    commenter_id: int
+    commenter: AuthorView
+
+@dataclass(slots=True)
+class PostView:
+    id: int
+    title: str
+    text: str
+    date: datetime.datetime
+    author_id: int
+    author: AuthorView
+    group: GroupRefView
+    comments: List[CommentView] = field(default_factory=list)
+    comment_count: int = 0
+    comments_next_cursor: Optional[str] = None
+
+
+# --- Colunas ---
+
+def author_columns(author=models.Author):
+    """As únicas colunas de Author que uma resposta pode conter (nunca `password`)."""
+    return author.id, author.username, author.email
+
+_POST_COLUMNS = (
+    models.Post.id, models.Post.title, models.Post.text, models.Post.date, models.Post.author_id,
+    *author_columns(), models.Group.id, models.Group.name, models.Post.comment_count,
+)
+
+def _post_query():
+    return (
+        select(*_POST_COLUMNS)
+        .join(models.Author, models.Author.id == models.Post.author_id)
+        .join(models.Group, models.Group.id == models.Post.group_id)
+        .where(models.Author.deleted_at.is_(None), models.Group.deleted_at.is_(None))
+    )
+
+def _post_from_row(row) -> PostView:
+    post_id, title, text, date, author_id, a_id, a_username, a_email, group_id, group_name, comment_count = row
+    return PostView(
+        post_id, title, text, date, author_id,
+        AuthorView(a_id, a_username, a_email), GroupRefView(group_id, group_name), comment_count=comment_count,
+    )
+
+_COMMENT_COLUMNS = (
+    models.Comment.id, models.Comment.title, models.Comment.text, models.Comment.date,
+    models.Comment.post_id, models.Comment.commenter_id, *author_columns(),
+)
+
+def _comment_from_row(row) -> CommentView:
+    comment_id, title, text, date, post_id, commenter_id, a_id, a_username, a_email = row
+    return CommentView(comment_id, title, text, date, post_id, commenter_id, AuthorView(a_id, a_username, a_email))
+
+def _comment_query():
+    return (
+        select(*_COMMENT_COLUMNS)
+        .join(models.Author, models.Author.id == models.Comment.commenter_id)
+        .where(models.Author.deleted_at.is_(None))
+    )
+
+
+# --- Posts ---
+
+def is_visible_post(post=models.Post):
+    """Condição para posts cujo grupo e autor não estão em exclusão (buscas pela PK)."""
+    return and_(
+        select(models.Group.deleted_at).where(models.Group.id == post.group_id).scalar_subquery().is_(None),
+        select(models.Author.deleted_at).where(models.Author.id == post.author_id).scalar_subquery().is_(None),
+    )
+
+
+def posts_by_ids(db: Session, post_ids: List[int]) -> List[PostView]:
+    """Os posts na ordem de `post_ids`, sem comentários."""
+    if not post_ids:
+        return []
+    rows = db.execute(_post_query().where(models.Post.id.in_(post_ids)))
+    by_id = {post.id: post for post in map(_post_from_row, rows)}
+    return [by_id[post_id] for post_id in post_ids if post_id in by_id]
+
+def attach_comments(db: Session, posts: List[PostView]) -> List[PostView]:
+    """Preenche `comments` de cada post com todos os seus comentários, em ordem cronológica."""
+    if not posts:
+        return posts
+    by_id = {post.id: post for post in posts}
+    rows = db.execute(
+        _comment_query()
+        .where(models.Comment.post_id.in_(by_id))
+        .order_by(models.Comment.post_id, models.Comment.date, models.Comment.id)
+    )
+    for comment in map(_comment_from_row, rows):
+        by_id[comment.post_id].comments.append(comment)
+    return posts
+
+def comments_page(
+    db: Session, post_id: int, after: Optional[Tuple[datetime.datetime, int]], limit: int
+) -> List[CommentView]:
+    """Até `limit` comentários do post em ordem cronológica, depois de `after` (data, id)."""
+    # Percorre o índice (post_id, date, id) a partir do cursor: o custo não depende do tamanho da thread.
+    query = _comment_query().where(models.Comment.post_id == post_id)
+    if after is not None:
+        query = query.where(tuple_(models.Comment.date, models.Comment.id) > tuple_(*after))
+    rows = db.execute(query.order_by(models.Comment.date, models.Comment.id).limit(limit))
+    return list(map(_comment_from_row, rows))
+
+def iter_comments(db: Session, post_id: int, batch_size: int) -> Iterator[List[CommentView]]:
+    """
+    Todos os comentários do post em ordem cronológica, em lotes de `batch_size`
+    lidos de um cursor no servidor (`yield_per`): a thread nunca fica inteira em memória.
+    """
+    rows = db.execute(
+        _comment_query()
+        .where(models.Comment.post_id == post_id)
+        .order_by(models.Comment.date, models.Comment.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for partition in rows.partitions():
+        yield list(map(_comment_from_row, partition))
+
+def post_detail(db: Session, post_id: int, comments_limit: Optional[int] = None) -> Optional[PostView]:
+    """O post com todos os comentários, ou só os `comments_limit` primeiros (0: nenhum)."""
+    row = db.execute(_post_query().where(models.Post.id == post_id)).first()
+    if row is None:
+        return None
+    post = _post_from_row(row)
+    if comments_limit is None:
+        return attach_comments(db, [post])[0]
+    if comments_limit == 0:
+        return post
+    post.comments = comments_page(db, post_id, None, comments_limit)
+    return post
+
+def posts_by_author(db: Session, author_id: int, limit: int) -> List[PostView]:
+    rows = db.execute(
+        _post_query()
+        .where(models.Post.author_id == author_id)
+        .order_by(models.Post.date.desc())
+        .limit(limit)
+    )
+    return attach_comments(db, list(map(_post_from_row, rows)))
+
+def latest_group_posts(db: Session, group_ids: Iterable[int], per_group: int) -> Dict[int, List[PostView]]:
+    """Os `per_group` posts visíveis mais recentes de cada grupo, mais novos primeiro, sem comentários."""
+    result: Dict[int, List[PostView]] = {group_id: [] for group_id in group_ids}
+    if per_group <= 0 or not result:
+        return result
+    row_number = func.row_number().over(
+        partition_by=models.Post.group_id,
+        order_by=(models.Post.date.desc(), models.Post.id.desc()),
+    ).label("rn")
+    # Posts de autores em exclusão saem antes da numeração, para não ocuparem vagas.
+    ranked = (
+        select(models.Post.id, row_number)
+        .join(models.Author, models.Author.id == models.Post.author_id)
+        .where(models.Post.group_id.in_(result), models.Author.deleted_at.is_(None))
+        .subquery()
+    )
+    rows = db.execute(
+        _post_query()
+        .join(ranked, ranked.c.id == models.Post.id)
+        .where(ranked.c.rn <= per_group)
+    )
+    for post in sorted(map(_post_from_row, rows), key=lambda post: (post.date, post.id), reverse=True):
+        result[post.group.id].append(post)
+    return result
+
+def latest_comments(db: Session, post_ids: Iterable[int], per_post: int) -> Dict[int, List[CommentView]]:
+    """Os `per_post` comentários mais recentes de cada post, em ordem cronológica."""
+    result: Dict[int, List[CommentView]] = {post_id: [] for post_id in post_ids}
+    if per_post <= 0 or not result:
+        return result
+    row_number = func.row_number().over(
+        partition_by=models.Comment.post_id,
+        order_by=(models.Comment.date.desc(), models.Comment.id.desc()),
+    ).label("rn")
+    # Comentários de autores em exclusão saem antes da numeração, como em latest_group_posts.
+    ranked = (
+        select(models.Comment.id, row_number)
+        .join(models.Author, models.Author.id == models.Comment.commenter_id)
+        .where(models.Comment.post_id.in_(result), models.Author.deleted_at.is_(None))
+        .subquery()
+    )
+    rows = db.execute(
+        _comment_query()
+        .join(ranked, ranked.c.id == models.Comment.id)
+        .where(ranked.c.rn <= per_post)
+    )
+    # No máximo `per_post` por post: ordenar aqui evita um sort temporário no banco.
+    for comment in sorted(map(_comment_from_row, rows), key=lambda comment: (comment.date, comment.id)):
+        result[comment.post_id].append(comment)
+    return result
+
+
+# --- Grupos ---
+
+_creator = aliased(models.Author)
+
+def _group_query():
+    return select(
+        models.Group.id, models.Group.name, models.Group.description,
+        *author_columns(_creator), models.Group.member_count, models.Group.post_count,
+    ).join(_creator, _creator.id == models.Group.creator_id).where(models.Group.deleted_at.is_(None))
+
+def _group_from_row(row) -> GroupView:
+    group_id, name, description, c_id, c_username, c_email, member_count, post_count = row
+    return GroupView(group_id, name, description, AuthorView(c_id, c_username, c_email), member_count, post_count)
+
+def groups_page(db: Session, prefix: Optional[str], after: Optional[str], limit: int) -> List[GroupView]:
+    """Grupos em ordem de nome. `prefix` usa a faixa [prefix, prefix + '\\uffff') do índice de `name`."""
+    query = _group_query()
+    if prefix:
+        query = query.where(models.Group.name >= prefix, models.Group.name < prefix + "\uffff")
+    if after is not None:
+        query = query.where(models.Group.name > after)
+    rows = db.execute(query.order_by(models.Group.name).limit(limit))
+    return list(map(_group_from_row, rows))
+
+def group_detail(db: Session, group_id: int) -> Optional[GroupView]:
+    row = db.execute(_group_query().where(models.Group.id == group_id)).first()
+    return _group_from_row(row) if row is not None else None
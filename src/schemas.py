@@ -45,9 +45,17 @@ class GroupRead(GroupBase):
     """
     id: int
     creator: AuthorRead
+    member_count: int = 0
     class Config:
         from_attributes = True
 
+class GroupDetails(GroupRead):
+    """
+    Detalhes de um grupo. Os membros não vêm embutidos: ficam no
+    sub-recurso paginado /groups/{id}/members.
+    """
+    post_count: int = 0
+
 # =================================================================
 # ===                SCHEMAS PARA DADOS ANINHADOS               ===
 # =================================================================
@@ -90,6 +98,10 @@ class PostRead(PostBase):
     author_id: int
     author: AuthorRead
     group: GroupInDB # Usa o schema de grupo simplificado
+    comment_count: int = 0
+    # Em GET /posts/{id} os comentários vêm paginados: se houver mais, este é o
+    # `cursor` de GET /posts/{id}/comments para a página seguinte.
+    comments_next_cursor: Optional[str] = None
     comments: List['CommentRead'] = []
     class Config:
         from_attributes = True
@@ -118,9 +130,102 @@ class CommentRead(CommentBase):
     class Config:
         from_attributes = True
 
+class FeedPostRead(PostBase):
+    """
+    Post como aparece no feed: em vez da árvore completa de comentários,
+    traz o total e apenas os comentários mais recentes.
+    """
+    id: int
+    date: datetime.datetime
+    author_id: int
+    author: AuthorRead
+    group: GroupInDB
+    comment_count: int = 0
+    comments: List['CommentRead'] = []
+    class Config:
+        from_attributes = True
+
 # Atualiza a referência de string no PostRead. Necessário quando um schema
 # referencia outro que é definido depois dele.
 PostRead.model_rebuild()
+FeedPostRead.model_rebuild()
+
+# =================================================================
+# ===                      SCHEMAS DE BUSCA                       ===
+# =================================================================
+
+class SearchResult(BaseModel):
+    """Um post ou comentário encontrado pela busca. `post_id` aponta para o post a abrir."""
+    kind: str
+    id: int
+    post_id: int
+    group_id: int
+    title: str
+    snippet: str
+    date: datetime.datetime
+    score: float
+    class Config:
+        from_attributes = True
+
+# =================================================================
+# ===                   SCHEMAS DE OPERAÇÕES EM LOTE              ===
+# =================================================================
+
+class BulkCommentCreate(CommentCreate):
+    """Comentário enviado em lote: cada item diz em qual post entra."""
+    post_id: int
+
+class BulkMembersCreate(BaseModel):
+    usernames: List[str]
+
+class BulkItemResult(BaseModel):
+    """
+    Resultado de um item do lote, na mesma posição (`index`) do pedido.
+    `status` segue os códigos HTTP da rota equivalente de um item só.
+    """
+    index: int
+    status: int
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+class BulkResult(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkItemResult]
+
+# =================================================================
+# ===                 SCHEMAS DE EXCLUSÃO EM SEGUNDO PLANO        ===
+# =================================================================
+
+class DeletionJobRead(BaseModel):
+    """
+    Andamento de uma exclusão de grupo ou conta. `total` fica nulo até o worker
+    começar; `progress` vai de 0 a 1.
+    """
+    id: int
+    kind: str
+    target_id: int
+    status: str
+    total: Optional[int] = None
+    deleted: int
+    progress: float
+    error: Optional[str] = None
+    created_at: datetime.datetime
+    finished_at: Optional[datetime.datetime] = None
+
+    @classmethod
+    def from_job(cls, job) -> "DeletionJobRead":
+        if job.status == "done":
+            progress = 1.0
+        elif job.total:
+            progress = round(min(job.deleted / job.total, 1.0), 4)
+        else:
+            progress = 0.0
+        return cls(
+            id=job.id, kind=job.kind, target_id=job.target_id, status=job.status, total=job.total,
+            deleted=job.deleted or 0, progress=progress, error=job.error,
+            created_at=job.created_at, finished_at=job.finished_at,
+        )
 
 # =================================================================
 # ===                   SCHEMAS DE AUTENTICAÇÃO                   ===
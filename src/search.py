@@ -0,0 +1,240 @@
+"""
+Busca textual em posts e comentários.
+
+SQLite: duas tabelas FTS5 de conteúdo externo (`posts_fts`, `comments_fts`)
+que indexam `title` e `text` sem duplicar o texto. Triggers nas tabelas de
+origem mantêm o índice em dia a cada INSERT/UPDATE/DELETE, então qualquer
+caminho de escrita (rotas de um item, lote, exclusão de grupo) já o atualiza.
+
+PostgreSQL: índices GIN sobre a expressão `to_tsvector(...)` de cada tabela,
+que o próprio banco mantém. As consultas usam exatamente a mesma expressão.
+
+Em ambos, o resultado é restrito aos grupos de quem busca e ordenado por
+relevância (título pesa mais que o texto) entre as `SEARCH_CANDIDATES`
+ocorrências mais recentes, o que mantém a latência estável para termos comuns.
+Conteúdo de autores em exclusão (`deleted_at`) fica de fora; o de grupos em
+exclusão já não entra porque eles saem dos grupos de quem busca.
+
+    python -m src.search rebuild    # reconstrói o índice a partir dos dados atuais
+"""
+import datetime
+import functools
+import os
+import re
+import sys
+from dataclasses import dataclass
+from typing import Iterable, List
+
+from sqlalchemy import DateTime, Float, Index, Integer, String, bindparam, event, func, literal_column, text
+from sqlalchemy.orm import Session
+
+from . import database, models
+
+SEARCH_DEFAULT_LIMIT = int(os.getenv("SEARCH_DEFAULT_LIMIT", "20"))
+SEARCH_MAX_LIMIT = int(os.getenv("SEARCH_MAX_LIMIT", "50"))
+# Configuração de idioma do PostgreSQL (stemming e stopwords).
+SEARCH_LANGUAGE = os.getenv("SEARCH_LANGUAGE", "portuguese")
+# Quantas ocorrências mais recentes de cada tabela entram no ranking.
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "1000"))
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+@dataclass(slots=True)
+class SearchHit:
+    kind: str  # "post" ou "comment"
+    id: int
+    post_id: int
+    group_id: int
+    title: str
+    snippet: str
+    date: datetime.datetime
+    score: float
+
+
+_RESULT_COLUMNS = dict(
+    kind=String, id=Integer, post_id=Integer, group_id=Integer, title=String,
+    snippet=String, date=DateTime, score=Float,
+)
+
+def terms(query: str) -> List[str]:
+    """Palavras da consulta; o resto (aspas, operadores) é descartado."""
+    return _TERM.findall(query)
+
+
+# --- SQLite (FTS5) ---
+
+def _sqlite_ddl(table: str, columns: str, new: str, old: str) -> List[str]:
+    fts = f"{table}_fts"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"title, text, content='{table}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {columns}) VALUES ({new}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', {old}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF title, text ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', {old}); "
+        f"INSERT INTO {fts}(rowid, {columns}) VALUES ({new}); END",
+    ]
+
+SQLITE_DDL = [
+    statement
+    for table in ("posts", "comments")
+    for statement in _sqlite_ddl(table, "title, text", "new.id, new.title, new.text", "old.id, old.title, old.text")
+]
+
+# Cada lado só ranqueia as `candidates` ocorrências mais recentes nos grupos
+# de quem busca: o FTS5 percorre a lista de documentos do termo por rowid
+# decrescente e a consulta principal recebe o menor rowid como limite inferior
+# (`rowid >= ...`), que ele aplica dentro do índice. Sem isso, um termo
+# presente em metade dos posts calcularia bm25 para todos eles.
+_SQLITE_QUERY = text("""
+    SELECT 'post' AS kind, posts.id, posts.id AS post_id, posts.group_id, posts.title,
+           snippet(posts_fts, 1, '', '', '…', 16) AS snippet, posts.date, -bm25(posts_fts, 2.0, 1.0) AS score
+    FROM posts_fts JOIN posts ON posts.id = posts_fts.rowid
+    WHERE posts_fts MATCH :match AND posts.group_id IN :group_ids AND NOT EXISTS (
+        SELECT 1 FROM authors WHERE authors.id = posts.author_id AND authors.deleted_at IS NOT NULL
+    ) AND posts_fts.rowid >= coalesce((
+        SELECT min(id) FROM (
+            SELECT posts_fts.rowid AS id FROM posts_fts JOIN posts ON posts.id = posts_fts.rowid
+            WHERE posts_fts MATCH :match AND posts.group_id IN :group_ids
+            ORDER BY posts_fts.rowid DESC LIMIT :candidates
+        )), 0)
+    UNION ALL
+    SELECT 'comment', comments.id, comments.post_id, posts.group_id, comments.title,
+           snippet(comments_fts, 1, '', '', '…', 16), comments.date, -bm25(comments_fts, 2.0, 1.0)
+    FROM comments_fts JOIN comments ON comments.id = comments_fts.rowid JOIN posts ON posts.id = comments.post_id
+    WHERE comments_fts MATCH :match AND posts.group_id IN :group_ids AND NOT EXISTS (
+        SELECT 1 FROM authors WHERE authors.id IN (comments.commenter_id, posts.author_id) AND authors.deleted_at IS NOT NULL
+    ) AND comments_fts.rowid >= coalesce((
+        SELECT min(id) FROM (
+            SELECT comments_fts.rowid AS id FROM comments_fts
+            JOIN comments ON comments.id = comments_fts.rowid JOIN posts ON posts.id = comments.post_id
+            WHERE comments_fts MATCH :match AND posts.group_id IN :group_ids
+            ORDER BY comments_fts.rowid DESC LIMIT :candidates
+        )), 0)
+    ORDER BY score DESC
+    LIMIT :limit
+""").bindparams(bindparam("group_ids", expanding=True)).columns(**_RESULT_COLUMNS)
+
+def _fts5_match(words: List[str]) -> str:
+    # Cada termo entre aspas: nenhuma sintaxe do FTS5 vem do usuário.
+    return " ".join(f'"{word}"' for word in words)
+
+
+# --- PostgreSQL (tsvector) ---
+
+def _document(table):
+    config = literal_column(f"'{SEARCH_LANGUAGE}'::regconfig")
+    return func.setweight(func.to_tsvector(config, func.coalesce(table.c.title, "")), literal_column("'A'")).op("||")(
+        func.setweight(func.to_tsvector(config, func.coalesce(table.c.text, "")), literal_column("'B'"))
+    )
+
+# Só criados no PostgreSQL; no SQLite o `create_all` os ignora.
+POSTGRES_INDEXES = []
+for _table, _name in ((models.Post.__table__, "ix_posts_search"), (models.Comment.__table__, "ix_comments_search")):
+    _search_index = Index(_name, _document(_table), postgresql_using="gin").ddl_if(dialect="postgresql")
+    _table.append_constraint(_search_index)
+    POSTGRES_INDEXES.append(_search_index)
+
+_POSTGRES_SQL = f"""
+    WITH q AS (SELECT to_tsquery('{SEARCH_LANGUAGE}'::regconfig, :match) AS query),
+    post_hits AS (
+        SELECT posts.id FROM posts, q
+        WHERE :posts_document @@ q.query AND posts.group_id IN :group_ids
+        ORDER BY posts.id DESC LIMIT :candidates
+    ),
+    comment_hits AS (
+        SELECT comments.id FROM comments JOIN posts ON posts.id = comments.post_id, q
+        WHERE :comments_document @@ q.query AND posts.group_id IN :group_ids
+        ORDER BY comments.id DESC LIMIT :candidates
+    )
+    SELECT 'post' AS kind, posts.id, posts.id AS post_id, posts.group_id, posts.title,
+           ts_headline('{SEARCH_LANGUAGE}'::regconfig, posts.text, q.query, 'StartSel="", StopSel="", MaxWords=16, MinWords=8') AS snippet,
+           posts.date, ts_rank(:posts_document, q.query) AS score
+    FROM post_hits JOIN posts ON posts.id = post_hits.id, q
+    WHERE NOT EXISTS (SELECT 1 FROM authors WHERE authors.id = posts.author_id AND authors.deleted_at IS NOT NULL)
+    UNION ALL
+    SELECT 'comment', comments.id, comments.post_id, posts.group_id, comments.title,
+           ts_headline('{SEARCH_LANGUAGE}'::regconfig, comments.text, q.query, 'StartSel="", StopSel="", MaxWords=16, MinWords=8'),
+           comments.date, ts_rank(:comments_document, q.query)
+    FROM comment_hits JOIN comments ON comments.id = comment_hits.id JOIN posts ON posts.id = comments.post_id, q
+    WHERE NOT EXISTS (
+        SELECT 1 FROM authors WHERE authors.id IN (comments.commenter_id, posts.author_id) AND authors.deleted_at IS NOT NULL
+    )
+    ORDER BY score DESC
+    LIMIT :limit
+"""
+
+@functools.lru_cache(maxsize=None)
+def _postgres_query():
+    # As expressões precisam sair idênticas às dos índices para que o GIN seja usado.
+    dialect = database.engine.dialect
+    documents = {
+        name: str(_document(table).compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+        for name, table in (("posts_document", models.Post.__table__), ("comments_document", models.Comment.__table__))
+    }
+    sql = _POSTGRES_SQL
+    for name, expression in documents.items():
+        sql = sql.replace(f":{name}", f"({expression})")
+    return text(sql).bindparams(bindparam("group_ids", expanding=True)).columns(**_RESULT_COLUMNS)
+
+def _tsquery(words: List[str]) -> str:
+    return " & ".join(words)
+
+
+# --- API usada pelas rotas ---
+
+def search(db: Session, query: str, group_ids: Iterable[int], limit: int) -> List[SearchHit]:
+    """Posts e comentários dos grupos `group_ids` que contêm os termos de `query`, mais relevantes primeiro."""
+    words, group_ids = terms(query), list(group_ids)
+    if not words or not group_ids:
+        return []
+    if db.get_bind().dialect.name == "postgresql":
+        statement, match = _postgres_query(), _tsquery(words)
+    else:
+        statement, match = _SQLITE_QUERY, _fts5_match(words)
+    rows = db.execute(statement, {
+        "match": match, "group_ids": group_ids, "limit": limit, "candidates": SEARCH_CANDIDATES,
+    })
+    return [
+        SearchHit(kind, hit_id, post_id, group_id, title, snippet, date, round(score, 6))
+        for kind, hit_id, post_id, group_id, title, snippet, date, score in rows
+    ]
+
+
+# --- Manutenção ---
+
+def install(connection) -> None:
+    """Cria as tabelas FTS5 e os triggers (SQLite). No PostgreSQL os índices vêm do `create_all`."""
+    if connection.dialect.name == "sqlite":
+        for statement in SQLITE_DDL:
+            connection.exec_driver_sql(statement)
+
+def rebuild(engine=None) -> None:
+    """Reconstrói o índice inteiro a partir de posts e comentários (ex.: `blog.db` antigo)."""
+    engine = engine or database.engine
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as connection:
+            install(connection)
+            for fts in ("posts_fts", "comments_fts"):
+                connection.exec_driver_sql(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+                connection.exec_driver_sql(f"INSERT INTO {fts}({fts}) VALUES ('optimize')")
+    elif engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            for index in POSTGRES_INDEXES:
+                connection.exec_driver_sql(f"REINDEX INDEX CONCURRENTLY {index.name}")
+
+@event.listens_for(models.Comment.__table__, "after_create")
+def _install_on_create(target, connection, **kw) -> None:
+    # Banco novo: o `create_all` cria `comments` depois de `posts`, e junto o índice.
+    install(connection)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "rebuild"
+    if command != "rebuild":
+        sys.exit(f"comando desconhecido: {command} (use 'rebuild')")
+    rebuild()
+    print("índice de busca reconstruído")
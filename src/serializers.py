@@ -0,0 +1,128 @@
+"""
+Serialização rápida das respostas (opcional, FAST_SERIALIZATION=true).
+
+O caminho padrão passa cada resposta pela validação do `response_model` com
+`from_attributes=True`, criando um modelo Pydantic para cada post, autor,
+grupo e comentário e revalidando os e-mails. Aqui os objetos carregados são
+projetados direto em dicionários com exatamente o mesmo formato JSON dos
+schemas e codificados uma única vez, com `orjson` quando instalado.
+
+Os `dump_*` espelham os schemas de `schemas.py`: um campo novo lá precisa
+aparecer aqui também (benchmarks/serialization.py compara os dois caminhos).
+"""
+import datetime
+import json
+import os
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from fastapi import Response
+
+from . import instrumentation, schemas
+
+try:
+    import orjson
+except ImportError:  # opcional: sem ele, json da biblioteca padrão
+    orjson = None
+
+FAST_SERIALIZATION = os.getenv("FAST_SERIALIZATION", "false").lower() in ("1", "true", "yes")
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+def dumps(content: Any) -> bytes:
+    """JSON compacto, igual ao que o FastAPI enviaria para o mesmo conteúdo."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode()
+
+def json_response(content: Any, headers: Optional[dict] = None) -> Response:
+    with instrumentation.timed_serialization():
+        body = dumps(content)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# --- Projeções (mesmo formato dos schemas) ---
+
+def dump_author(author) -> dict:
+    return {"username": author.username, "email": author.email, "id": author.id}
+
+def dump_group_ref(group) -> dict:
+    return {"id": group.id, "name": group.name}
+
+def dump_group(group) -> dict:
+    return {
+        "name": group.name, "description": group.description, "id": group.id,
+        "creator": dump_author(group.creator), "member_count": group.member_count,
+    }
+
+def dump_group_details(group) -> dict:
+    return {**dump_group(group), "post_count": group.post_count}
+
+def dump_comment(comment) -> dict:
+    return {
+        "title": comment.title, "text": comment.text, "id": comment.id, "date": comment.date,
+        "post_id": comment.post_id, "commenter_id": comment.commenter_id,
+        "commenter": dump_author(comment.commenter),
+    }
+
+def dump_post(post) -> dict:
+    return {
+        "title": post.title, "text": post.text, "id": post.id, "date": post.date,
+        "author_id": post.author_id, "author": dump_author(post.author),
+        "group": dump_group_ref(post.group), "comment_count": post.comment_count,
+        "comments_next_cursor": post.comments_next_cursor,
+        "comments": [dump_comment(comment) for comment in post.comments],
+    }
+
+def dump_feed_post(post, comments: List) -> dict:
+    return {
+        "title": post.title, "text": post.text, "id": post.id, "date": post.date,
+        "author_id": post.author_id, "author": dump_author(post.author),
+        "group": dump_group_ref(post.group), "comment_count": post.comment_count,
+        "comments": [dump_comment(comment) for comment in comments],
+    }
+
+def stream_post(post, comment_batches: Iterable[List]) -> Iterator[bytes]:
+    """
+    O mesmo JSON de `dump_post`, em partes: primeiro os campos do post, depois
+    um lote de comentários por parte. `comments` é o último campo do schema,
+    então a saída é idêntica à da resposta inteira.
+    """
+    head = dump_post(post)
+    del head["comments"]
+    yield dumps(head)[:-1] + b',"comments":['
+    separator = b""
+    for batch in comment_batches:
+        if batch:
+            yield separator + dumps([dump_comment(comment) for comment in batch])[1:-1]
+            separator = b","
+    yield b"]}"
+
+
+def _many(dump: Callable) -> Callable:
+    return lambda items: [dump(item) for item in items]
+
+# Schema da rota -> projeção equivalente. Usado pelo cache HTTP.
+PROJECTIONS: Dict[Any, Callable] = {
+    schemas.PostRead: dump_post,
+    List[schemas.PostRead]: _many(dump_post),
+    schemas.GroupRead: dump_group,
+    List[schemas.GroupRead]: _many(dump_group),
+    schemas.GroupDetails: dump_group_details,
+    schemas.CommentRead: dump_comment,
+    List[schemas.CommentRead]: _many(dump_comment),
+    schemas.AuthorRead: dump_author,
+    List[schemas.AuthorRead]: _many(dump_author),
+}
+
+def encoder_for(response_type) -> Optional[Callable[[Any], bytes]]:
+    """Codificador rápido para o schema, se o modo rápido estiver ligado e houver projeção."""
+    if not FAST_SERIALIZATION:
+        return None
+    project = PROJECTIONS.get(response_type)
+    if project is None:
+        return None
+    return lambda value: dumps(project(value))
@@ -0,0 +1,144 @@
+"""
+Timeline pré-computada do feed (fan-out na escrita).
+
+Cada post é copiado para `feed_entries` uma vez por membro do grupo no momento
+em que é criado. Assim o GET /posts/ lê apenas a faixa do índice
+(author_id, date DESC, post_id DESC) do usuário, independente de quantos grupos
+ele participa ou de quão movimentados eles são.
+"""
+import datetime
+import os
+from typing import List, Optional, Tuple
+
+from sqlalchemy import delete, insert, literal, select, tuple_
+from sqlalchemy.orm import Session
+
+from . import models, read_models
+
+FEED_DEFAULT_LIMIT = int(os.getenv("FEED_DEFAULT_LIMIT", "20"))
+FEED_MAX_LIMIT = int(os.getenv("FEED_MAX_LIMIT", "100"))
+FEED_LATEST_COMMENTS = int(os.getenv("FEED_LATEST_COMMENTS", "3"))
+
+Cursor = Tuple[datetime.datetime, int]
+
+
+# --- Cursor ---
+
+def encode_cursor(date: datetime.datetime, row_id: int) -> str:
+    """'<data ISO>,<id>'; também usado pela paginação dos comentários de um post."""
+    return f"{date.isoformat()},{row_id}"
+
+def decode_cursor(value: str) -> Cursor:
+    """Converte '<data ISO>,<id>' no par usado pela paginação. Levanta ValueError se inválido."""
+    date_str, _, id_str = value.rpartition(",")
+    return datetime.datetime.fromisoformat(date_str), int(id_str)
+
+
+# --- Manutenção do índice (chamadas dentro da transação da rota de escrita) ---
+
+def fan_out_post(db: Session, post: models.Post) -> None:
+    """Insere o post na timeline de todos os membros atuais do grupo."""
+    members = select(
+        models.group_membership_table.c.author_id,
+        literal(post.id),
+        literal(post.group_id),
+        literal(post.date, models.FeedEntry.date.type),
+    ).where(models.group_membership_table.c.group_id == post.group_id)
+    db.execute(
+        insert(models.FeedEntry).from_select(["author_id", "post_id", "group_id", "date"], members)
+    )
+
+def fan_out_posts(db: Session, post_ids: List[int]) -> None:
+    """Versão em lote de `fan_out_post`: um único INSERT ... SELECT para todos os posts."""
+    rows = select(
+        models.group_membership_table.c.author_id,
+        models.Post.id,
+        models.Post.group_id,
+        models.Post.date,
+    ).join(
+        models.group_membership_table,
+        models.group_membership_table.c.group_id == models.Post.group_id,
+    ).where(models.Post.id.in_(post_ids))
+    db.execute(
+        insert(models.FeedEntry).from_select(["author_id", "post_id", "group_id", "date"], rows)
+    )
+
+def remove_post(db: Session, post_id: int) -> None:
+    db.execute(delete(models.FeedEntry).where(models.FeedEntry.post_id == post_id))
+
+def add_group_for_author(db: Session, author_id: int, group_id: int) -> None:
+    """Copia os posts já existentes de um grupo para a timeline de quem acabou de entrar."""
+    posts = select(
+        literal(author_id),
+        models.Post.id,
+        models.Post.group_id,
+        models.Post.date,
+    ).where(models.Post.group_id == group_id)
+    db.execute(
+        insert(models.FeedEntry).from_select(["author_id", "post_id", "group_id", "date"], posts)
+    )
+
+def add_group_for_authors(db: Session, author_ids: List[int], group_id: int) -> None:
+    """Versão em lote de `add_group_for_author`, para quem acabou de ser adicionado (já membro)."""
+    rows = select(
+        models.group_membership_table.c.author_id,
+        models.Post.id,
+        models.Post.group_id,
+        models.Post.date,
+    ).join(
+        models.group_membership_table,
+        models.group_membership_table.c.group_id == models.Post.group_id,
+    ).where(
+        models.Post.group_id == group_id,
+        models.group_membership_table.c.author_id.in_(author_ids),
+    )
+    db.execute(
+        insert(models.FeedEntry).from_select(["author_id", "post_id", "group_id", "date"], rows)
+    )
+
+def remove_group_for_author(db: Session, author_id: int, group_id: int) -> None:
+    db.execute(
+        delete(models.FeedEntry).where(
+            models.FeedEntry.author_id == author_id,
+            models.FeedEntry.group_id == group_id,
+        )
+    )
+
+def rebuild(db: Session) -> None:
+    """Reconstrói a timeline inteira a partir de posts + memberships."""
+    db.execute(delete(models.FeedEntry))
+    rows = select(
+        models.group_membership_table.c.author_id,
+        models.Post.id,
+        models.Post.group_id,
+        models.Post.date,
+    ).join(
+        models.group_membership_table,
+        models.group_membership_table.c.group_id == models.Post.group_id,
+    )
+    db.execute(
+        insert(models.FeedEntry).from_select(["author_id", "post_id", "group_id", "date"], rows)
+    )
+
+# --- Leitura do feed ---
+
+def read_page(db: Session, author_id: int, before: Optional[Cursor], limit: int) -> List[read_models.PostView]:
+    """Retorna até `limit` posts da timeline do usuário, mais novos primeiro."""
+    # Grupos e autores em exclusão somem da página já aqui, para que o `limit`
+    # conte só posts visíveis (o cursor continua sendo a última entrada devolvida).
+    page = (
+        select(models.FeedEntry.post_id)
+        .join(models.Group, models.Group.id == models.FeedEntry.group_id)
+        .join(models.Post, models.Post.id == models.FeedEntry.post_id)
+        .join(models.Author, models.Author.id == models.Post.author_id)
+        .where(
+            models.FeedEntry.author_id == author_id,
+            models.Group.deleted_at.is_(None),
+            models.Author.deleted_at.is_(None),
+        )
+    )
+    if before is not None:
+        page = page.where(tuple_(models.FeedEntry.date, models.FeedEntry.post_id) < tuple_(*before))
+    page = page.order_by(models.FeedEntry.date.desc(), models.FeedEntry.post_id.desc()).limit(limit)
+    post_ids = db.execute(page).scalars().all()
+    return read_models.posts_by_ids(db, post_ids)
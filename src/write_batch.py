@@ -0,0 +1,174 @@
+"""
+Escrita agrupada (group commit) de posts e comentários.
+
+Com WRITE_BATCH_ENABLED, POST /posts/ e POST /posts/{id}/comments/ não abrem
+a própria transação: o item entra numa fila do processo e uma thread
+escritora grava juntos os que chegarem em até WRITE_BATCH_MAX_DELAY_MS depois
+do primeiro (ou WRITE_BATCH_MAX_ITEMS itens), com um único commit. No SQLite
+cada commit passa pelo único lock de escrita (e, com synchronous=FULL, por um
+fsync); um commit por lote divide esse custo entre todos os itens.
+
+A rota espera o commit do lote e só então responde, com o id atribuído: uma
+resposta 201 continua significando que o item está gravado. Validação e
+INSERTs são os de bulk.py, com as mesmas consultas para o lote inteiro, de
+qualquer número de autores; os efeitos depois do commit (cache HTTP,
+hot_posts, eventos) rodam uma vez por lote. Se o lote falha
+antes do commit, cada item é refeito na sua própria transação, para que um
+item ruim não derrube os outros.
+
+Só no modo síncrono: no assíncrono a rota roda no event loop, e esperar o
+lote ali pararia todas as outras requisições.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from sqlalchemy.orm import Session
+
+from . import bulk, database, events, hot_posts, http_cache, schemas
+
+WRITE_BATCH_ENABLED = os.getenv("WRITE_BATCH_ENABLED", "false").lower() in ("1", "true", "yes")
+WRITE_BATCH_MAX_ITEMS = int(os.getenv("WRITE_BATCH_MAX_ITEMS", "64"))
+WRITE_BATCH_MAX_DELAY_MS = float(os.getenv("WRITE_BATCH_MAX_DELAY_MS", "2"))
+
+if WRITE_BATCH_ENABLED and database.IS_ASYNC:
+    raise RuntimeError("WRITE_BATCH_ENABLED requer o modo síncrono (DATABASE_URL sem driver assíncrono).")
+
+logger = logging.getLogger(__name__)
+
+_CREATE = {"post": bulk.create_posts_by_authors, "comment": bulk.create_comments_by_authors}
+
+Record = Union[schemas.PostRead, schemas.CommentRead]
+
+
+@dataclass
+class Pending:
+    kind: str  # "post" ou "comment"
+    author: object  # o Principal da rota
+    item: Union[schemas.PostCreate, schemas.BulkCommentCreate]
+    # Resolvido depois do commit: (resultado do item, registro criado ou None)
+    future: Future = field(default_factory=Future)
+
+
+class GroupCommitter:
+    """Uma thread escritora por processo; as rotas esperam o lote do seu item."""
+
+    def __init__(self, max_items: int = WRITE_BATCH_MAX_ITEMS, max_delay: float = WRITE_BATCH_MAX_DELAY_MS / 1000):
+        self.max_items = max_items
+        self.max_delay = max_delay
+        self._queue: "queue.Queue[Optional[Pending]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.retried = 0
+
+    def submit(self, kind: str, author, item) -> Tuple[schemas.BulkItemResult, Optional[Record]]:
+        """Enfileira o item e bloqueia até o commit do lote em que ele entrou."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="write-batch", daemon=True)
+                self._thread.start()
+        pending = Pending(kind, author, item)
+        self._queue.put(pending)
+        return pending.future.result()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Grava o que já está na fila e encerra a thread."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                return
+            self._queue.put(None)
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": WRITE_BATCH_ENABLED,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "retried": self.retried,
+            "queued": self._queue.qsize(),
+        }
+
+    def _loop(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.max_delay
+            stopping = False
+            while len(batch) < self.max_items:
+                remaining = deadline - time.monotonic()
+                try:
+                    pending = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if pending is None:
+                    stopping = True
+                    break
+                batch.append(pending)
+            self._flush(batch)
+            if stopping:
+                return
+
+    def _flush(self, batch: List[Pending]) -> None:
+        written = None
+        try:
+            with database.SessionLocal() as db:
+                written = _write(db, batch)
+                self.batches += 1
+                self.items += len(batch)
+                _after_commit(db, [outcome for _, outcome in written])
+        except Exception as exc:
+            if written is not None:
+                # Os itens já estão gravados: a falha fica no log e a resposta continua 201.
+                logger.exception("Falha depois do commit de um lote de escritas")
+            elif len(batch) == 1:
+                batch[0].future.set_exception(exc)
+                return
+            else:
+                logger.warning("Lote de %s escritas falhou; refazendo item a item", len(batch), exc_info=True)
+                self.retried += len(batch)
+                for pending in batch:
+                    self._flush([pending])
+                return
+        for entries, outcome in written:
+            for index, pending in enumerate(entries):
+                pending.future.set_result((outcome.results[index], outcome.records.get(index)))
+
+
+def _write(db: Session, batch: List[Pending]) -> List[Tuple[List[Pending], bulk.BulkOutcome]]:
+    """Os itens do lote separados por tipo, cada tipo num chamado de bulk.py; um commit no fim."""
+    by_kind: Dict[str, List[Pending]] = {}
+    for pending in batch:
+        by_kind.setdefault(pending.kind, []).append(pending)
+    written = [
+        (entries, _CREATE[kind](db, [(pending.author, pending.item) for pending in entries]))
+        for kind, entries in by_kind.items()
+    ]
+    db.commit()
+    return written
+
+def _after_commit(db: Session, outcomes: List[bulk.BulkOutcome]) -> None:
+    cache_keys: Set[str] = set()
+    refresh: Dict[int, Set[int]] = {}
+    for outcome in outcomes:
+        cache_keys |= outcome.cache_keys
+        for group_id, post_ids in outcome.hot_posts.items():
+            refresh.setdefault(group_id, set()).update(post_ids)
+    if cache_keys:
+        http_cache.bump(*cache_keys)
+    hot_posts.refresh_posts(db, refresh)
+    for outcome in outcomes:
+        for event_type, data, target in outcome.events:
+            events.hub.publish(event_type, data, **target)
+
+
+committer = GroupCommitter()